@@ -0,0 +1,373 @@
+# -*- coding: utf-8 -*-
+# Copyright 2012 Mandla Web Studio
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+__author__ = 'Jose Maria Zambrana Arze'
+__email__ = 'contact@josezambrana.com'
+__version__ = '0.1'
+__copyright__ = 'Copyright 2012, Mandla Web Studio'
+
+
+import timeit
+import datetime
+import decimal
+
+from django.utils.translation import ugettext_lazy as _
+
+from common import encoders
+
+
+#: Benchmarks registrados por nombre.
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    """
+    Registra la función decorada como el benchmark *name*.
+    """
+
+    def decorator(func):
+        BENCHMARKS[name] = func
+        return func
+    return decorator
+
+
+def measure(func, number, repeat=3):
+    """
+    Retorna el mejor tiempo por llamada de *func*, en segundos.
+    """
+
+    timer = timeit.Timer(func)
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def action_payloads():
+    """
+    Retorna contextos típicos de las respuestas de ActionResponseMixin y
+    BaseFormMixin.
+    """
+
+    now = datetime.datetime.now()
+    form = u'<form method="post">%s</form>' % (
+        u'<p><label>Campo</label><input type="text" name="field"/></p>' * 10)
+
+    return [
+        {
+            'success': True,
+            'message': _(u'La acción se realizo exitosamente'),
+            'redirect': False,
+            'confirm_message': _(u'Deseas continuar con esta acción?'),
+            'confirm': True,
+        },
+        {
+            'success': False,
+            'message': _(u'La acción no pudo realizarse'),
+            'redirect': True,
+            'redirect_url': '/error',
+            'form': form,
+        },
+        {
+            'success': True,
+            'message': u'Guardado',
+            'redirect': False,
+            'form': form,
+            'object': u'<div class="content"><h2>Nombre</h2></div>',
+            'pk': 42,
+            'created_at': now,
+            'price': decimal.Decimal('10.50'),
+        },
+    ]
+
+
+@benchmark('json')
+def bench_json_encoders(number=5000):
+    """
+    Compara los backends de json instalados con respuestas de acciones.
+    """
+
+    payloads = action_payloads()
+    results = []
+
+    for name in encoders.available_backends():
+        encoder = encoders.get_encoder(name)
+
+        def run():
+            for payload in payloads:
+                encoder(payload)
+
+        results.append((name, measure(run, number)))
+
+    return results
+
+
+@benchmark('dispatch')
+def bench_view_dispatch(number=2000):
+    """
+    Compara el costo por petición de una BaseView trivial con la
+    configuración resuelta en as_view y resolviéndola en cada petición.
+    """
+
+    from django.contrib.auth.models import AnonymousUser
+    from django.test.client import RequestFactory
+
+    from common.views import BaseView
+
+    class TrivialView(BaseView):
+        view_name = 'trivial'
+        app_name = 'common'
+
+    request = RequestFactory().get('/')
+    request.user = AnonymousUser()
+
+    results = []
+    for label, precompute in (('per-request config', False),
+                              ('precomputed config', True)):
+        view = TrivialView.as_view(precompute_config=precompute)
+        results.append((label, measure(lambda: view(request, format='json'), number)))
+
+    return results
+
+
+@benchmark('serializer')
+def bench_model_serializer(number=1, rows=10000):
+    """
+    Compara la serialización ingenua (``model_to_dict`` por fila) con el
+    serializador compilado al leer *rows* usuarios de la base de datos, y
+    con el camino de ``values_list`` que no crea instancias. Los usuarios se
+    insertan en una transacción que se revierte al terminar.
+    """
+
+    from django.contrib.auth.models import User
+    from django.db import transaction, DEFAULT_DB_ALIAS
+    from django.forms.models import model_to_dict
+
+    from common.models import insert_rows
+    from common.serializers import get_serializer
+
+    now = datetime.datetime.now()
+    serializer = get_serializer(User)
+
+    transaction.enter_transaction_management()
+    transaction.managed(True)
+    try:
+        insert_rows(User, (User(username='bench-user%s' % i,
+                                email='user%s@example.com' % i, password='!',
+                                date_joined=now, last_login=now)
+                           for i in xrange(rows)), DEFAULT_DB_ALIAS)
+        queryset = User.objects.filter(username__startswith='bench-user')
+
+        def naive():
+            for user in queryset.iterator():
+                data = model_to_dict(user)
+                data['url'] = user.get_absolute_url()
+
+        def compiled():
+            for user in queryset.iterator():
+                serializer.serialize(user)
+
+        def compiled_values():
+            for row in serializer.iter_values(queryset, chunk_size=rows):
+                pass
+
+        return [('naive model_to_dict', measure(naive, number)),
+                ('compiled serializer', measure(compiled, number)),
+                ('compiled values rows', measure(compiled_values, number))]
+    finally:
+        transaction.rollback()
+        transaction.leave_transaction_management()
+
+
+def list_context(rows=500):
+    """
+    Retorna el contexto de una lista típica de contenidos.
+    """
+
+    now = datetime.datetime.now()
+    object_list = [{
+        'id': i,
+        'name': u'Contenido de ejemplo número %s' % i,
+        'slug': 'contenido-de-ejemplo-numero-%s' % i,
+        'user_id': i % 20,
+        'created_at': now,
+        'updated_at': now,
+        'published_at': now,
+        'url': '/content/contenido-de-ejemplo-numero-%s' % i,
+    } for i in xrange(rows)]
+
+    return {'object_list': object_list, 'next': 2, 'prev': None}
+
+
+def list_payload(rows=500):
+    """
+    Retorna el json de una lista típica de contenidos.
+    """
+
+    return encoders.dumps(list_context(rows))
+
+
+@benchmark('compression')
+def bench_compression(number=50):
+    """
+    Compara el tiempo y el tamaño de la compresión gzip y deflate por nivel
+    sobre el json de una lista.
+    """
+
+    from common.compression import compress_string
+
+    payload = list_payload()
+    results = [('identity (%s bytes)' % len(payload), 0.0)]
+
+    for encoding in ('gzip', 'deflate'):
+        for level in (1, 6, 9):
+            size = len(compress_string(payload, encoding, level))
+            label = '%s level %s (%s bytes)' % (encoding, level, size)
+            results.append((label, measure(
+                lambda: compress_string(payload, encoding, level), number)))
+
+    return results
+
+
+@benchmark('msgpack')
+def bench_msgpack(number=20):
+    """
+    Compara el tamaño y el tiempo de codificación y decodificación de json y
+    msgpack sobre el contexto de una lista.
+    """
+
+    import json
+
+    from common import packing
+
+    context = list_context()
+    json_data = encoders.dumps(context)
+    msgpack_data = packing.packb(context)
+
+    return [
+        ('json encode (%s bytes)' % len(json_data),
+         measure(lambda: encoders.dumps(context), number)),
+        ('json decode', measure(lambda: json.loads(json_data), number)),
+        ('msgpack encode (%s bytes)' % len(msgpack_data),
+         measure(lambda: packing.packb(context), number)),
+        ('msgpack decode', measure(lambda: packing.unpackb(msgpack_data), number)),
+    ]
+
+
+@benchmark('modelform')
+def bench_modelform_views(number=500):
+    """
+    Compara el costo por petición de una CreateView y una UpdateView con el
+    formulario generado en cada petición y reutilizado. Se usan respuestas
+    lean y un POST inválido para no medir templates ni escrituras.
+    """
+
+    from django.contrib.auth.models import AnonymousUser, User
+    from django.test.client import RequestFactory
+
+    from common.views import CreateView, UpdateView
+
+    class UserCreateView(CreateView):
+        view_name = 'user-create'
+        app_name = 'common'
+        model = User
+        lean = True
+
+    class UserUpdateView(UpdateView):
+        view_name = 'user-update'
+        app_name = 'common'
+        model = User
+        lean = True
+
+        def get_object(self, queryset=None):
+            return User(id=1, username='user')
+
+    factory = RequestFactory()
+    requests = [factory.get('/'), factory.post('/', {})]
+    for request in requests:
+        request.user = AnonymousUser()
+
+    results = []
+    for view_class in (UserCreateView, UserUpdateView):
+        for label, cache_form_class in (('generated', False), ('cached', True)):
+            view = view_class.as_view(cache_form_class=cache_form_class)
+
+            def run():
+                for request in requests:
+                    view(request, format='json')
+
+            results.append(('%s %s form' % (view_class.view_name, label),
+                            measure(run, number)))
+
+    return results
+
+
+@benchmark('indexes')
+def bench_content_indexes(sizes=(10000, 100000, 1000000), number=200):
+    """
+    Mide las consultas frecuentes de los contenidos sobre tablas de sqlite
+    en memoria de *sizes* filas con los índices de ``common.indexes``, y sin
+    ellos en la tabla más pequeña como referencia. Con los índices el tiempo
+    por consulta debe mantenerse casi constante al crecer la tabla; para
+    probar con 10M de filas se pasa ``sizes=(10000, 10000000)``.
+    """
+
+    import sqlite3
+    import random
+
+    from common.indexes import index_definitions
+
+    queries = [
+        ('slug lookup', 'SELECT id FROM content WHERE slug = ?',
+         lambda rows: ('content-%s' % random.randrange(rows),)),
+        ('owner list', 'SELECT id FROM content WHERE user_id = ? '
+                       'ORDER BY published_at DESC LIMIT 20',
+         lambda rows: (random.randrange(1000),)),
+        ('recent list', 'SELECT id FROM content '
+                        'ORDER BY published_at DESC, id DESC LIMIT 20',
+         lambda rows: ()),
+        ('last modified', 'SELECT MAX(updated_at) FROM content',
+         lambda rows: ()),
+    ]
+
+    def build(rows, indexed):
+        db = sqlite3.connect(':memory:')
+        db.execute('CREATE TABLE content (id INTEGER PRIMARY KEY, '
+                   'slug VARCHAR(50), user_id INTEGER, published_at DATETIME, '
+                   'updated_at DATETIME)')
+        start = datetime.datetime(2012, 1, 1)
+        db.executemany('INSERT INTO content VALUES (?, ?, ?, ?, ?)', (
+            (i, 'content-%s' % i, i % 1000,
+             start + datetime.timedelta(seconds=random.randrange(10 ** 8)),
+             start + datetime.timedelta(seconds=i))
+            for i in xrange(rows)))
+
+        if indexed:
+            for i, (columns, unique) in enumerate(index_definitions()):
+                db.execute('CREATE %sINDEX index_%s ON content (%s)' % (
+                           'UNIQUE ' if unique else '', i, ', '.join(columns)))
+        return db
+
+    results = []
+    for rows, indexed in [(sizes[0], False)] + [(size, True) for size in sizes]:
+        db = build(rows, indexed)
+        for label, sql, params in queries:
+            def run():
+                db.execute(sql, params(rows)).fetchall()
+
+            results.append(('%s rows %s %s' % (rows, label,
+                            'indexed' if indexed else 'no index'),
+                            measure(run, number)))
+        db.close()
+
+    return results
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+# Copyright 2012 Mandla Web Studio
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+__author__ = 'Jose Maria Zambrana Arze'
+__email__ = 'contact@josezambrana.com'
+__version__ = '0.1'
+__copyright__ = 'Copyright 2012, Mandla Web Studio'
+
+
+import hashlib
+
+from time import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+
+
+#: Prefijo de todas las llaves de cache de la app.
+CACHE_PREFIX = getattr(settings, 'COMMON_CACHE_PREFIX', 'common')
+
+#: Segundos que se guardan los contadores de versión de los modelos.
+VERSION_TIMEOUT = getattr(settings, 'COMMON_CACHE_VERSION_TIMEOUT',
+                          60 * 60 * 24 * 30)
+
+
+def _new_version():
+    """
+    Retorna una versión inicial que no coincide con versiones anteriores
+    aunque el contador haya sido eliminado del cache.
+    """
+
+    return int(time() * 1000)
+
+
+def version_key(model):
+    """
+    Retorna la llave del contador de versión del modelo *model*.
+    """
+
+    opts = model._meta
+    return '%s:version:%s.%s' % (CACHE_PREFIX, opts.app_label,
+                                 opts.object_name.lower())
+
+
+def get_versions(models):
+    """
+    Retorna un diccionario con la versión actual de cada modelo de *models*
+    usando una sola consulta al cache.
+    """
+
+    keys = dict((version_key(model), model) for model in models)
+    versions = cache.get_many(keys.keys())
+
+    for key in keys:
+        if key not in versions:
+            version = _new_version()
+            cache.add(key, version, VERSION_TIMEOUT)
+            versions[key] = cache.get(key, version)
+
+    return versions
+
+
+def bump_version(model):
+    """
+    Incrementa la versión de *model* y con ello invalida todas las respuestas
+    guardadas que dependen de él, sin necesidad de buscar las llaves.
+    """
+
+    key = version_key(model)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        version = _new_version()
+        cache.set(key, version, VERSION_TIMEOUT)
+        return version
+
+
+def response_key(app_name, view_name, format, *parts):
+    """
+    Retorna la llave para guardar la respuesta de una vista.
+    """
+
+    digest = hashlib.md5(repr(parts)).hexdigest()
+    return '%s:response:%s:%s:%s:%s' % (CACHE_PREFIX, app_name, view_name,
+                                        format, digest)
+
+
+def get_response(key):
+    """
+    Retorna la respuesta guardada en *key* o None.
+    """
+
+    cached = cache.get(key)
+    if cached is None:
+        return None
+
+    # Las respuestas guardadas antes de que se guardaran las cabeceras
+    # tienen el content type en lugar de la lista de cabeceras, y las que
+    # guardaban cookies las traen en un tercer elemento que se ignora.
+    content, headers = cached[:2]
+    if isinstance(headers, basestring):
+        return HttpResponse(content, content_type=headers)
+
+    response = HttpResponse(content)
+    for header, value in headers:
+        response[header] = value
+
+    return response
+
+
+def set_response(key, response, timeout):
+    """
+    Guarda en *key* el contenido de *response* con sus cabeceras. Las
+    cookies no se guardan: son de quien hizo la petición y la respuesta
+    guardada se entrega a otros usuarios.
+    """
+
+    headers = [(header, value) for header, value in response.items()
+               if header.lower() != 'set-cookie']
+    cache.set(key, (response.content, headers), timeout)
+
+
+def object_version(obj, field='updated_at'):
+    """
+    Retorna la versión de *obj*: su fecha de modificación o, si no la tiene,
+    la versión de su modelo.
+    """
+
+    version = getattr(obj, field, None)
+    if version is not None:
+        return version
+
+    return get_versions([obj.__class__]).get(version_key(obj.__class__))
+
+
+def time_bucket(seconds):
+    """
+    Retorna el número del intervalo de *seconds* segundos en el que estamos.
+    Sirve para que una llave cambie periódicamente aunque el objeto no lo
+    haga.
+    """
+
+    return int(time() // seconds)
+
+
+def fragment_key(template_name, *parts):
+    """
+    Retorna la llave de un fragmento html renderizado con *template_name*.
+    """
+
+    template = hashlib.md5(template_name).hexdigest()
+    digest = hashlib.md5(repr(parts)).hexdigest()
+    return '%s:fragment:%s:%s' % (CACHE_PREFIX, template, digest)
+
+
+def render_fragment(template_name, context, key=None, timeout=None):
+    """
+    Renderiza *template_name* o retorna el fragmento guardado en *key*. Si
+    *key* es None se renderiza sin usar el cache.
+    """
+
+    if key is None:
+        return render_to_string(template_name, context)
+
+    content = cache.get(key)
+    if content is None:
+        content = render_to_string(template_name, context)
+        cache.set(key, content, timeout)
+
+    return content
+
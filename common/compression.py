@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+# Copyright 2012 Mandla Web Studio
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+__author__ = 'Jose Maria Zambrana Arze'
+__email__ = 'contact@josezambrana.com'
+__version__ = '0.1'
+__copyright__ = 'Copyright 2012, Mandla Web Studio'
+
+
+import re
+import zlib
+
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+
+#: Codificaciones soportadas en orden de preferencia.
+ENCODINGS = ('gzip', 'deflate')
+
+_ACCEPT_ENCODING = re.compile(r'^\s*([^\s;]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?\s*$')
+
+
+def negotiate_encoding(request):
+    """
+    Retorna la codificación que acepta el cliente según ``Accept-Encoding``
+    o None si no acepta ninguna de las soportadas.
+    """
+
+    header = request.META.get('HTTP_ACCEPT_ENCODING', '')
+    accepted = {}
+
+    for item in header.split(','):
+        match = _ACCEPT_ENCODING.match(item)
+        if match is None:
+            continue
+
+        name, quality = match.group(1).lower(), match.group(2)
+        try:
+            accepted[name] = float(quality) if quality is not None else 1.0
+        except ValueError:
+            continue
+
+    best, best_quality = None, 0
+    for encoding in ENCODINGS:
+        quality = accepted.get(encoding, accepted.get('*', 0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+
+    return best
+
+
+def _compressor(encoding, level):
+    wbits = zlib.MAX_WBITS | 16 if encoding == 'gzip' else zlib.MAX_WBITS
+    return zlib.compressobj(level, zlib.DEFLATED, wbits)
+
+
+def compress_string(data, encoding, level=6):
+    """
+    Comprime *data* con *encoding*.
+    """
+
+    compressor = _compressor(encoding, level)
+    return compressor.compress(data) + compressor.flush()
+
+
+def compress_sequence(sequence, encoding, level=6):
+    """
+    Comprime los bloques de *sequence* a medida que se generan, enviando lo
+    comprimido de cada bloque sin esperar al final.
+    """
+
+    compressor = _compressor(encoding, level)
+    for chunk in sequence:
+        if isinstance(chunk, unicode):
+            chunk = chunk.encode('utf-8')
+
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+
+    yield compressor.flush()
+
+
+def compress_response(request, response, streaming=False, min_size=1024,
+                      level=6):
+    """
+    Comprime *response* si el cliente lo acepta y el contenido es mayor que
+    *min_size*. Las respuestas en streaming se comprimen bloque a bloque.
+
+    El etag de la respuesta comprimida se marca como débil, ya que el cuerpo
+    no es el mismo byte a byte que el de la respuesta sin comprimir.
+    """
+
+    if response.status_code != 200 or response.has_header('Content-Encoding'):
+        return response
+
+    patch_vary_headers(response, ('Accept-Encoding',))
+
+    encoding = negotiate_encoding(request)
+    if encoding is None:
+        return response
+
+    if streaming:
+        # Se crea una respuesta nueva sobre el contenedor original: asignar
+        # el generador a ``content`` lo convierte en una cadena en algunas
+        # versiones de Django, e iterar la respuesta misma sería recursivo.
+        compressed = HttpResponse(compress_sequence(response._container,
+                                                    encoding, level))
+        compressed.status_code = response.status_code
+        for header, value in response.items():
+            compressed[header] = value
+        compressed.cookies = response.cookies
+        if compressed.has_header('Content-Length'):
+            del compressed['Content-Length']
+        response = compressed
+    else:
+        content = response.content
+        if len(content) < min_size:
+            return response
+
+        compressed = compress_string(content, encoding, level)
+        if len(compressed) >= len(content):
+            return response
+
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+
+    if response.has_header('ETag') and not response['ETag'].startswith('W/'):
+        response['ETag'] = 'W/' + response['ETag']
+
+    response['Content-Encoding'] = encoding
+    return response
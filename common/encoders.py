@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+# Copyright 2012 Mandla Web Studio
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+__author__ = 'Jose Maria Zambrana Arze'
+__email__ = 'contact@josezambrana.com'
+__version__ = '0.1'
+__copyright__ = 'Copyright 2012, Mandla Web Studio'
+
+
+import datetime
+import decimal
+import logging
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import models
+from django.db.models.query import QuerySet
+from django.utils.encoding import force_unicode
+from django.utils.functional import Promise
+
+from common.serializers import get_serializer
+
+
+#: Backends soportados, del más rápido al más lento.
+BACKENDS = ('ujson', 'cjson', 'simplejson', 'json')
+
+#: Backend configurado por el proyecto. Si es None se usa el más rápido
+#: instalado.
+JSON_BACKEND = getattr(settings, 'COMMON_JSON_BACKEND', None)
+
+_SIMPLE_TYPES = (basestring, bool, int, long, float, type(None))
+
+
+def serialize_model(obj):
+    """
+    Retorna un diccionario con los valores de los campos de *obj*, sin los
+    campos excluidos de los serializadores. La url absoluta solo se incluye
+    en los modelos que lo piden con ``json_url``.
+    """
+
+    return get_serializer(obj.__class__).serialize(obj)
+
+
+def default(value):
+    """
+    Convierte a un tipo nativo de json los valores que los codificadores no
+    manejan: cadenas de traducción lazy, fechas, decimales, modelos y
+    querysets.
+    """
+
+    if isinstance(value, Promise):
+        return force_unicode(value)
+
+    if isinstance(value, datetime.datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+
+    if isinstance(value, datetime.date):
+        return value.strftime('%Y-%m-%d')
+
+    if isinstance(value, datetime.time):
+        return value.strftime('%H:%M:%S')
+
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+
+    if isinstance(value, models.Model):
+        return serialize_model(value)
+
+    if isinstance(value, QuerySet):
+        return list(value)
+
+    raise TypeError('%r is not JSON serializable' % value)
+
+
+def prepare(value):
+    """
+    Convierte recursivamente *value* a tipos nativos de json. Lo utilizan los
+    backends que no aceptan una función ``default``.
+    """
+
+    if isinstance(value, _SIMPLE_TYPES):
+        return value
+
+    if isinstance(value, dict):
+        return dict((force_unicode(key), prepare(item))
+                    for key, item in value.iteritems())
+
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return [prepare(item) for item in value]
+
+    return prepare(default(value))
+
+
+def _load(name):
+    """
+    Retorna la función para codificar del backend *name* o lanza ImportError
+    si no está instalado.
+    """
+
+    if name == 'ujson':
+        import ujson
+        return lambda value: ujson.dumps(prepare(value))
+
+    if name == 'cjson':
+        import cjson
+        return lambda value: cjson.encode(prepare(value))
+
+    if name == 'simplejson':
+        import simplejson
+        return lambda value: simplejson.dumps(value, default=default)
+
+    if name == 'json':
+        import json
+        return lambda value: json.dumps(value, default=default)
+
+    raise ImproperlyConfigured(u'JSON backend not supported: %s' % name)
+
+
+def available_backends():
+    """
+    Retorna los nombres de los backends instalados.
+    """
+
+    names = []
+    for name in BACKENDS:
+        try:
+            _load(name)
+        except ImportError:
+            continue
+        names.append(name)
+
+    return names
+
+
+_backends = {}
+
+
+def get_encoder(name=None):
+    """
+    Retorna la función de codificación del backend *name*. Si no se define
+    se utiliza el backend configurado en ``COMMON_JSON_BACKEND`` o el más
+    rápido instalado.
+    """
+
+    name = name or JSON_BACKEND
+
+    if name in _backends:
+        return _backends[name]
+
+    if name is not None:
+        try:
+            encoder = _load(name)
+        except ImportError:
+            raise ImproperlyConfigured(u'JSON backend %s is not installed'
+                                       % name)
+    else:
+        encoder = None
+        for candidate in BACKENDS:
+            try:
+                encoder = _load(candidate)
+            except ImportError:
+                continue
+            logging.debug('json backend: %s' % candidate)
+            break
+
+    _backends[name] = encoder
+    return encoder
+
+
+def dumps(value, backend=None):
+    """
+    Codifica *value* en json con el backend apropiado.
+    """
+
+    return get_encoder(backend)(value)
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+# Copyright 2012 Mandla Web Studio
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+__author__ = 'Jose Maria Zambrana Arze'
+__email__ = 'contact@josezambrana.com'
+__version__ = '0.1'
+__copyright__ = 'Copyright 2012, Mandla Web Studio'
+
+
+import hashlib
+
+from calendar import timegm
+
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from common.cache import CACHE_PREFIX
+from common.util import chunked_iterator
+
+
+#: Marca que se reemplaza por las entradas al generar el feed.
+ENTRIES_MARKER = '<!--common:feed-entries-->'
+
+#: Segundos que se guarda cada entrada renderizada.
+ENTRY_TIMEOUT = 60 * 60 * 24
+
+
+def entry_cache_key(template_name, obj, field='updated_at'):
+    """
+    Retorna la llave de la entrada de *obj* renderizada con *template_name*.
+    La llave cambia con la fecha de modificación del objeto, incluidos los
+    microsegundos, por lo que una entrada nunca se invalida explícitamente.
+    """
+
+    opts = obj._meta
+    updated_at = getattr(obj, field, None)
+    version = 0
+    if updated_at:
+        version = '%s.%06d' % (timegm(updated_at.utctimetuple()),
+                               updated_at.microsecond)
+    template = hashlib.md5(template_name).hexdigest()
+
+    return '%s:feed-entry:%s:%s.%s:%s:%s' % (CACHE_PREFIX, template,
+            opts.app_label, opts.object_name.lower(), obj.pk, version)
+
+
+def render_entries(template_name, object_list, context=None, field='updated_at',
+                   chunk_size=50, timeout=ENTRY_TIMEOUT):
+    """
+    Genera las entradas del feed por bloques, renderizando solo las que no
+    están guardadas en cache.
+    """
+
+    context = context or {}
+    chunk = []
+
+    for obj in chunked_iterator(object_list, chunk_size):
+        chunk.append(obj)
+        if len(chunk) == chunk_size:
+            for entry in _render_chunk(template_name, chunk, context, field, timeout):
+                yield entry
+            chunk = []
+
+    for entry in _render_chunk(template_name, chunk, context, field, timeout):
+        yield entry
+
+
+def _render_chunk(template_name, objects, context, field, timeout):
+    if not objects:
+        return []
+
+    keys = [entry_cache_key(template_name, obj, field) for obj in objects]
+    cached = cache.get_many(keys)
+    rendered = {}
+    entries = []
+
+    for key, obj in zip(keys, objects):
+        entry = cached.get(key)
+        if entry is None:
+            entry_context = dict(context, object=obj)
+            entry = render_to_string(template_name, entry_context)
+            rendered[key] = entry
+        entries.append(entry)
+
+    if rendered:
+        cache.set_many(rendered, timeout)
+
+    return entries
+
+
+def split_feed(template_name, context):
+    """
+    Renderiza el documento del feed y retorna la parte anterior y la
+    posterior a las entradas.
+    """
+
+    context = dict(context, entries=mark_safe(ENTRIES_MARKER))
+    document = render_to_string(template_name, context)
+    head, tail = document.split(ENTRIES_MARKER, 1)
+    return head, tail
+
+
+def stream_feed(template_name, entry_template_name, object_list, context,
+                field='updated_at'):
+    """
+    Genera el feed completo: primero la cabecera, luego las entradas a medida
+    que se leen y renderizan, y al final el cierre del documento.
+    """
+
+    head, tail = split_feed(template_name, context)
+
+    yield head
+    for entry in render_entries(entry_template_name, object_list, context, field):
+        yield entry
+    yield tail
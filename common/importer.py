@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+# Copyright 2012 Mandla Web Studio
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+__author__ = 'Jose Maria Zambrana Arze'
+__email__ = 'contact@josezambrana.com'
+__version__ = '0.1'
+__copyright__ = 'Copyright 2012, Mandla Web Studio'
+
+
+import csv
+import itertools
+
+from time import time
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.db import models
+from django.utils import simplejson
+
+
+#: Filas que se validan e insertan en cada transacción.
+BATCH_SIZE = 1000
+
+#: Número de errores que se guardan en el resultado de la importación.
+MAX_ERRORS = 100
+
+
+def read_csv(stream):
+    """
+    Recorre las filas de un archivo csv con encabezado como diccionarios.
+    """
+
+    for row in csv.DictReader(stream):
+        yield dict((key.decode('utf-8').strip(), value.decode('utf-8'))
+                   for key, value in row.items()
+                   if key is not None and value is not None)
+
+
+class InvalidRow(object):
+    """
+    Fila que el lector no pudo leer. Se reporta como fila inválida sin
+    interrumpir la importación.
+    """
+
+    def __init__(self, message):
+        self.message = message
+
+
+def read_jsonl(stream):
+    """
+    Recorre los objetos de un archivo con un objeto json por línea. Las
+    líneas que no son json válido se retornan como ``InvalidRow``.
+    """
+
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+
+        try:
+            yield simplejson.loads(line)
+        except ValueError, e:
+            yield InvalidRow(u'Json inválido: %s' % e)
+
+
+#: Lectores por formato de archivo.
+READERS = {
+    'csv': read_csv,
+    'jsonl': read_jsonl,
+}
+
+
+def import_fields(model):
+    """
+    Retorna los campos de *model* que se leen de las filas: todos menos la
+    llave primaria, el slug, el usuario y las fechas de modificación
+    (``auto_now``).
+    """
+
+    fields = []
+    for field in model._meta.local_fields:
+        if isinstance(field, models.AutoField) or field.name in ('slug', 'user'):
+            continue
+        if getattr(field, 'auto_now', False):
+            continue
+        fields.append(field)
+    return fields
+
+
+class ContentImporter(object):
+    """
+    Importa filas a un modelo subclase de ``Content`` por lotes: valida cada
+    lote, verifica los usuarios con una consulta, asigna los slugs en lote y
+    los inserta en una transacción. La memoria solo depende del tamaño del
+    lote.
+
+    Las fechas ``created_at`` y ``published_at`` se leen de la fila y toman
+    la fecha de la importación si no están; ``updated_at`` siempre toma la
+    fecha de la importación.
+    """
+
+    def __init__(self, model, user=None, batch_size=BATCH_SIZE, progress=None):
+        #: Modelo en el que se crean los contenidos.
+        self.model = model
+        #: Usuario de las filas que no lo definen.
+        self.user = user
+        #: Filas por lote y por transacción.
+        self.batch_size = batch_size
+        #: Función que recibe el resultado parcial después de cada lote.
+        self.progress = progress
+
+        self.fields = import_fields(model)
+        self.result = {
+            'rows': 0,
+            'created': 0,
+            'invalid': 0,
+            'errors': [],
+            'seconds': 0.0,
+        }
+
+    def add_error(self, line, errors):
+        self.result['invalid'] += 1
+        if len(self.result['errors']) < MAX_ERRORS:
+            self.result['errors'].append((line, errors))
+
+    def get_user_id(self, row):
+        """
+        Retorna el id del usuario de la fila o del usuario por defecto.
+        """
+
+        value = row.get('user_id') or row.get('user')
+        if value not in (None, ''):
+            return int(value)
+
+        if self.user is not None:
+            return self.user.pk
+
+        raise ValidationError(u'La fila no tiene usuario')
+
+    def build(self, row):
+        """
+        Retorna el contenido de la fila *row* validado, sin guardar.
+        """
+
+        if isinstance(row, InvalidRow):
+            raise ValidationError(row.message)
+        if not isinstance(row, dict):
+            raise ValidationError(u'La fila no es un objeto')
+
+        obj = self.model()
+        errors = {}
+
+        for field in self.fields:
+            value = row.get(field.name, row.get(field.attname))
+            if value in (None, '') and getattr(field, 'auto_now_add', False):
+                # Se asigna al insertar la fila.
+                continue
+            if value is None:
+                value = field.get_default()
+            try:
+                setattr(obj, field.attname, field.clean(value, obj))
+            except ValidationError, e:
+                errors[field.name] = e.messages
+
+        try:
+            obj.user_id = self.get_user_id(row)
+        except (ValidationError, ValueError), e:
+            errors['user'] = getattr(e, 'messages', [unicode(e)])
+
+        if errors:
+            raise ValidationError(errors)
+
+        return obj
+
+    def import_batch(self, rows, first_line):
+        """
+        Valida e inserta un lote de filas.
+        """
+
+        objects = []
+        for line, row in enumerate(rows, first_line):
+            try:
+                objects.append((line, self.build(row)))
+            except ValidationError, e:
+                self.add_error(line, e.message_dict if hasattr(e, 'message_dict')
+                                     else e.messages)
+
+        user_ids = set(obj.user_id for line, obj in objects)
+        existing = set(User.objects.filter(pk__in=user_ids)
+                                   .values_list('pk', flat=True))
+
+        valid = []
+        for line, obj in objects:
+            if obj.user_id in existing:
+                valid.append(obj)
+            else:
+                self.add_error(line, {'user': [u'El usuario %s no existe'
+                                               % obj.user_id]})
+
+        if valid:
+            self.model.create_in_bulk(valid, self.batch_size, keep_dates=True)
+
+        self.result['rows'] += len(rows)
+        self.result['created'] += len(valid)
+
+    def run(self, rows):
+        """
+        Importa las filas del iterador *rows* y retorna el resultado.
+        """
+
+        start = time()
+        rows = iter(rows)
+        line = 1
+
+        while True:
+            batch = list(itertools.islice(rows, self.batch_size))
+            if not batch:
+                break
+
+            self.import_batch(batch, line)
+            line += len(batch)
+
+            self.result['seconds'] = time() - start
+            if self.progress is not None:
+                self.progress(self.result)
+
+        self.result['seconds'] = time() - start
+        return self.result
+
+
+def import_contents(model, rows, user=None, batch_size=BATCH_SIZE,
+                    progress=None):
+    """
+    Importa las filas *rows* (diccionarios) al modelo *model* y retorna un
+    diccionario con las filas leídas, creadas, inválidas, los primeros
+    errores y la duración.
+    """
+
+    importer = ContentImporter(model, user=user, batch_size=batch_size,
+                               progress=progress)
+    return importer.run(rows)
+
+
+def import_file(model, stream, format='csv', **kwargs):
+    """
+    Importa el archivo *stream* en formato ``csv`` o ``jsonl``.
+    """
+
+    return import_contents(model, READERS[format](stream), **kwargs)
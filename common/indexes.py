@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+# Copyright 2012 Mandla Web Studio
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+__author__ = 'Jose Maria Zambrana Arze'
+__email__ = 'contact@josezambrana.com'
+__version__ = '0.1'
+__copyright__ = 'Copyright 2012, Mandla Web Studio'
+
+
+from django.conf import settings
+from django.db import connections, transaction, DEFAULT_DB_ALIAS
+from django.db.backends.util import truncate_name
+
+
+#: Si el slug de los contenidos es único por propietario en lugar de en
+#: toda la tabla.
+SLUG_PER_OWNER = getattr(settings, 'COMMON_CONTENT_SLUG_PER_OWNER', False)
+
+
+def index_definitions(user_column='user_id', pk_column='id',
+                      slug_per_owner=None):
+    """
+    Retorna los índices de las consultas frecuentes de los contenidos como
+    una lista de ``(columnas, unique)``:
+
+    * el slug único, para ``save`` y ``DetailView``, opcionalmente por
+      propietario;
+    * ``(user, published_at)`` para las listas del propietario;
+    * ``(published_at, id)`` para las listas y feeds ordenados por fecha;
+    * ``updated_at`` para los validadores de las listas.
+    """
+
+    if slug_per_owner is None:
+        slug_per_owner = SLUG_PER_OWNER
+
+    slug = [user_column, 'slug'] if slug_per_owner else ['slug']
+    return [
+        (slug, True),
+        ([user_column, 'published_at'], False),
+        (['published_at', pk_column], False),
+        (['updated_at'], False),
+    ]
+
+
+def content_indexes(model, slug_per_owner=None):
+    """
+    Retorna las definiciones de ``index_definitions`` con las columnas de
+    *model*.
+    """
+
+    opts = model._meta
+    return index_definitions(opts.get_field('user').column, opts.pk.column,
+                             slug_per_owner)
+
+
+def index_sql(model, connection, slug_per_owner=None):
+    """
+    Retorna las sentencias ``CREATE INDEX`` de los índices de *model*.
+    """
+
+    qn = connection.ops.quote_name
+    table = model._meta.db_table
+    statements = []
+
+    for columns, unique in content_indexes(model, slug_per_owner):
+        name = truncate_name('%s_%s' % (table, '_'.join(columns)),
+                             connection.ops.max_name_length())
+        statements.append('CREATE %sINDEX %s ON %s (%s)' % (
+                'UNIQUE ' if unique else '', qn(name), qn(table),
+                ', '.join(qn(column) for column in columns)))
+
+    return statements
+
+
+def create_indexes(model, using=DEFAULT_DB_ALIAS, slug_per_owner=None):
+    """
+    Crea los índices de *model* en la base de datos *using*.
+    """
+
+    connection = connections[using]
+    cursor = connection.cursor()
+    for statement in index_sql(model, connection, slug_per_owner):
+        cursor.execute(statement)
+    transaction.commit_unless_managed(using=using)
+
+
+def add_content_indexes(db, model, slug_per_owner=None):
+    """
+    Crea los índices de *model* desde una migración de South::
+
+        from south.db import db
+        from common.indexes import add_content_indexes
+
+        def forwards(self, orm):
+            add_content_indexes(db, orm['blog.Post'])
+    """
+
+    table = model._meta.db_table
+    for columns, unique in content_indexes(model, slug_per_owner):
+        if unique:
+            db.create_unique(table, columns)
+        else:
+            db.create_index(table, columns)
+
+
+def remove_content_indexes(db, model, slug_per_owner=None):
+    """
+    Elimina desde una migración de South los índices creados con
+    ``add_content_indexes``.
+    """
+
+    table = model._meta.db_table
+    for columns, unique in content_indexes(model, slug_per_owner):
+        if unique:
+            db.delete_unique(table, columns)
+        else:
+            db.delete_index(table, columns)
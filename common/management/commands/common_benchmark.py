@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+# Copyright 2012 Mandla Web Studio
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+__author__ = 'Jose Maria Zambrana Arze'
+__email__ = 'contact@josezambrana.com'
+__version__ = '0.1'
+__copyright__ = 'Copyright 2012, Mandla Web Studio'
+
+
+from django.core.management.base import BaseCommand, CommandError
+
+from common.benchmarks import BENCHMARKS
+
+
+class Command(BaseCommand):
+    """
+    Ejecuta los micro-benchmarks de la app y muestra el tiempo por operación.
+
+        python manage.py common_benchmark json
+    """
+
+    args = '<benchmark benchmark ...>'
+    help = 'Runs the common app micro-benchmarks.'
+
+    def handle(self, *names, **options):
+        names = names or sorted(BENCHMARKS.keys())
+
+        for name in names:
+            if name not in BENCHMARKS:
+                raise CommandError('Unknown benchmark: %s' % name)
+
+            self.stdout.write('%s\n' % name)
+            for label, seconds in BENCHMARKS[name]():
+                self.stdout.write('  %-30s %12.2f us\n' % (label, seconds * 1e6))
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+# Copyright 2012 Mandla Web Studio
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+__author__ = 'Jose Maria Zambrana Arze'
+__email__ = 'contact@josezambrana.com'
+__version__ = '0.1'
+__copyright__ = 'Copyright 2012, Mandla Web Studio'
+
+
+import os
+
+from optparse import make_option
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import get_model
+
+from common.importer import BATCH_SIZE, READERS, import_file
+from common.models import Content
+
+
+class Command(BaseCommand):
+    """
+    Importa contenidos desde un archivo csv o jsonl.
+
+        python manage.py common_import blog.Post posts.csv --user=admin
+    """
+
+    args = '<app_label.Model> <file>'
+    help = 'Imports Content rows from a csv or jsonl file in batches.'
+
+    option_list = BaseCommand.option_list + (
+        make_option('--format', dest='format', default=None,
+                    help='csv or jsonl, by default the file extension.'),
+        make_option('--user', dest='user', default=None,
+                    help='Username of the owner of rows without user.'),
+        make_option('--batch-size', dest='batch_size', type='int',
+                    default=BATCH_SIZE,
+                    help='Rows validated and inserted per transaction.'),
+    )
+
+    def handle(self, model_name=None, path=None, **options):
+        if model_name is None or path is None:
+            raise CommandError('Usage: common_import %s' % self.args)
+
+        try:
+            app_label, name = model_name.split('.')
+        except ValueError:
+            raise CommandError('Model must be app_label.Model: %s' % model_name)
+
+        model = get_model(app_label, name)
+        if model is None or not issubclass(model, Content):
+            raise CommandError('%s is not a Content model' % model_name)
+
+        format = options.get('format') or os.path.splitext(path)[1][1:]
+        if format not in READERS:
+            raise CommandError('Unknown format: %s' % format)
+
+        user = None
+        if options.get('user'):
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError('Unknown user: %s' % options['user'])
+
+        with open(path, 'rb') as stream:
+            result = import_file(model, stream, format=format, user=user,
+                                 batch_size=options['batch_size'],
+                                 progress=self.write_progress)
+
+        for line, errors in result['errors']:
+            self.stdout.write('row %s: %s\n' % (line, errors))
+
+    def write_progress(self, result):
+        seconds = result['seconds'] or 1e-6
+        self.stdout.write('%d rows, %d created, %d invalid, %.0f rows/s\n'
+                          % (result['rows'], result['created'],
+                             result['invalid'], result['rows'] / seconds))
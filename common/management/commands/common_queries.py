@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+# Copyright 2012 Mandla Web Studio
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+__author__ = 'Jose Maria Zambrana Arze'
+__email__ = 'contact@josezambrana.com'
+__version__ = '0.1'
+__copyright__ = 'Copyright 2012, Mandla Web Studio'
+
+
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from common import encoders
+from common import profiling
+
+
+class Command(BaseCommand):
+    """
+    Muestra las estadísticas de consultas sql por vista registradas con
+    ``COMMON_PROFILE_QUERIES``.
+
+        python manage.py common_queries
+        python manage.py common_queries --json
+    """
+
+    help = 'Shows the sql queries profiled per view.'
+
+    option_list = BaseCommand.option_list + (
+        make_option('--json', action='store_true', dest='json', default=False,
+                    help='Print the statistics as json.'),
+        make_option('--reset', action='store_true', dest='reset', default=False,
+                    help='Delete the statistics after printing them.'),
+    )
+
+    def handle(self, *args, **options):
+        stats = profiling.get_stats()
+
+        if options.get('json'):
+            self.stdout.write('%s\n' % encoders.dumps(stats))
+        else:
+            for view in stats:
+                self.write_view(view)
+
+        if options.get('reset'):
+            profiling.reset_stats()
+
+    def write_view(self, view):
+        requests = view['requests'] or 1
+        self.stdout.write('%s:%s\n' % (view['app_name'], view['view_name']))
+        self.stdout.write('  requests %d, queries %.1f/request (max %d), '
+                          'sql %.2f ms/request\n' % (view['requests'],
+                          float(view['queries']) / requests,
+                          view['max_queries'], view['time'] * 1000 / requests))
+
+        for duration, sql in view['slowest']:
+            self.stdout.write('  %8.2f ms  %s\n' % (duration * 1000, sql))
+
+        repeated = sorted(view['repeated'].items(),
+                          key=lambda item: item[1]['max_count'], reverse=True)
+        for shape, counts in repeated:
+            self.stdout.write('  N+1? x%d in %d requests  %s\n'
+                              % (counts['max_count'], counts['requests'], shape))
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+# Copyright 2012 Mandla Web Studio
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+__author__ = 'Jose Maria Zambrana Arze'
+__email__ = 'contact@josezambrana.com'
+__version__ = '0.1'
+__copyright__ = 'Copyright 2012, Mandla Web Studio'
+
+
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import router
+from django.db.models import get_model
+
+from common import search
+from common.util import chunked_iterator
+
+
+class Command(BaseCommand):
+    """
+    Crea las tablas de búsqueda de un modelo registrado en ``common.search``
+    y reconstruye su índice.
+
+        python manage.py common_search_index blog.Post
+    """
+
+    args = '<app_label.Model app_label.Model ...>'
+    help = 'Creates the search tables of registered models and rebuilds their index.'
+
+    option_list = BaseCommand.option_list + (
+        make_option('--batch-size', dest='batch_size', type='int', default=500,
+                    help='Objects indexed per batch.'),
+    )
+
+    def handle(self, *model_names, **options):
+        if not model_names:
+            raise CommandError('Usage: common_search_index %s' % self.args)
+
+        for model_name in model_names:
+            try:
+                app_label, name = model_name.split('.')
+            except ValueError:
+                raise CommandError('Model must be app_label.Model: %s'
+                                   % model_name)
+
+            model = get_model(app_label, name)
+            if model is None or not search.is_registered(model):
+                raise CommandError('%s is not registered for search'
+                                   % model_name)
+
+            self.rebuild(model, options['batch_size'])
+
+    def rebuild(self, model, batch_size):
+        using = router.db_for_write(model)
+        backend = search.get_backend(using)
+        backend.setup(model)
+        backend.clear(model)
+
+        count = 0
+        batch = []
+        for obj in chunked_iterator(model._default_manager.using(using).all(),
+                                    batch_size):
+            batch.append(obj)
+            if len(batch) == batch_size:
+                backend.index_many(batch)
+                count += len(batch)
+                batch = []
+                self.stdout.write('%s: %d indexed\n' % (model.__name__, count))
+
+        backend.index_many(batch)
+        count += len(batch)
+        self.stdout.write('%s: %d indexed\n' % (model.__name__, count))
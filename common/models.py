@@ -20,13 +20,131 @@ __version__ = '0.1'
 __copyright__ = 'Copyright 2012, Mandla Web Studio'
 
 
-from time import time
+import logging
 
 from django.db import models
+from django.db import connections, router, transaction, IntegrityError
+from django.db import DatabaseError
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Q
+from django.db.models.signals import post_save, post_delete, post_syncdb
 from django.contrib.auth.models import User
 from django.template.defaultfilters import slugify
 from django.utils.translation import ugettext_lazy as _
 
+from common import search
+from common.cache import bump_version
+from common.indexes import create_indexes
+
+
+#: Caracteres que se reservan al final del slug para el sufijo numérico.
+SLUG_SUFFIX_LENGTH = 6
+
+#: Intentos para guardar un contenido cuando otro toma su slug al mismo
+#: tiempo. Los reintentos dependen del índice único del slug que crea
+#: ``common.indexes`` (con syncdb o ``add_content_indexes`` en South); sin
+#: él dos guardados simultáneos pueden terminar con el mismo slug.
+SLUG_RETRIES = 5
+
+#: Slugs base que se buscan en una sola consulta al asignar slugs en lote.
+SLUG_BATCH_SIZE = 200
+
+
+def slug_base(model, name):
+    """
+    Retorna el slug de *name* recortado para que quepa un sufijo numérico en
+    el campo slug de *model*.
+    """
+
+    max_length = model._meta.get_field('slug').max_length
+    return slugify(name)[:max_length - SLUG_SUFFIX_LENGTH].rstrip('-')
+
+
+def make_slug(base, number):
+    """
+    Retorna el slug número *number* de *base*: ``base``, ``base-2``, ...
+    """
+
+    return base if number == 1 else '%s-%s' % (base, number)
+
+
+def slug_number(slug, base):
+    """
+    Retorna el número de *slug* como slug de *base* o None si no lo es.
+    """
+
+    if slug == base:
+        return 1
+
+    prefix = '%s-' % base
+    if slug.startswith(prefix) and slug[len(prefix):].isdigit():
+        return int(slug[len(prefix):])
+
+    return None
+
+
+def used_slug_numbers(model, bases, exclude_pk=None):
+    """
+    Retorna un diccionario con los números de slug usados por cada slug base
+    de *bases*, con una sola consulta por prefijo sobre el índice del slug.
+    Solo se leen los slugs con sufijo numérico: el prefijo recorre el índice
+    y la expresión regular descarta en la base de datos los slugs que solo
+    comienzan igual (``post-de-ejemplo`` para ``post``).
+    """
+
+    # Los slugs solo tienen [-a-z0-9_], que no son especiales en la
+    # expresión regular.
+    query = Q(slug__in=bases)
+    for base in bases:
+        query |= Q(slug__startswith='%s-' % base,
+                   slug__regex=r'^%s-[0-9]+$' % base)
+
+    queryset = model._default_manager.filter(query)
+    if exclude_pk is not None:
+        queryset = queryset.exclude(pk=exclude_pk)
+
+    used = dict((base, set()) for base in bases)
+    for slug in queryset.values_list('slug', flat=True):
+        if slug in used:
+            used[slug].add(1)
+
+        base, _, suffix = slug.rpartition('-')
+        if base in used and suffix.isdigit():
+            used[base].add(int(suffix))
+
+    return used
+
+
+def insert_rows(model, objects, using, keep_dates=False):
+    """
+    Inserta *objects* con una sola sentencia ``executemany``, como
+    ``bulk_create`` en las versiones de Django que no lo tienen: se aplica el
+    ``pre_save`` de cada campo, no se envían señales y no se asignan las
+    llaves primarias a los objetos. Con *keep_dates* las fechas
+    ``auto_now_add`` que ya tienen valor se conservan.
+    """
+
+    connection = connections[using]
+    qn = connection.ops.quote_name
+    fields = [field for field in model._meta.local_fields
+              if not isinstance(field, models.AutoField)]
+
+    def value(field, obj):
+        if keep_dates and getattr(field, 'auto_now_add', False):
+            current = getattr(obj, field.attname)
+            if current is not None:
+                return current
+        return field.pre_save(obj, True)
+
+    sql = 'INSERT INTO %s (%s) VALUES (%s)' % (qn(model._meta.db_table),
+            ', '.join(qn(field.column) for field in fields),
+            ', '.join(['%s'] * len(fields)))
+    params = [[field.get_db_prep_save(value(field, obj), connection=connection)
+               for field in fields] for obj in objects]
+
+    connection.cursor().executemany(sql, params)
+    transaction.commit_unless_managed(using=using)
+
 
 class Content(models.Model):
     """
@@ -54,25 +172,245 @@ class Content(models.Model):
     published_at = models.DateTimeField(_(u'Fecha Publicación'), 
             auto_now_add=True)
 
+    #: Si la url absoluta se incluye al serializar el contenido en json.
+    json_url = True
+
     class Meta:
         abstract = True
 
     def __unicode__(self):
         return self.name
 
+    def allocate_slug(self):
+        """
+        Asigna al contenido el siguiente slug libre para su nombre.
+        """
+
+        base = slug_base(self.__class__, self.name)
+        used = used_slug_numbers(self.__class__, [base], exclude_pk=self.pk)[base]
+        self.slug = make_slug(base, max(used) + 1 if used else 1)
+
+    def has_name_slug(self):
+        """
+        Retorna True si el slug actual ya corresponde al nombre.
+        """
+
+        base = slug_base(self.__class__, self.name)
+        return bool(self.slug) and slug_number(self.slug, base) is not None
+
     def save(self, *args, **kwargs):
-        slug = slugify(self.name)
-        model = self.__class__
-
-        query = model.objects.filter(slug=slug)
-        if not query.exists():
-            self.slug = slug
-        else:
-            content = query.get()
-            if self.id is None:
-                self.slug = "%s-%s" % (slug, int(time()))
-            elif self.id == content.id:
-                self.slug = slug
+        """
+        Guarda el contenido asignándole un slug único si es nuevo o si cambió
+        su nombre. Si otro contenido toma el mismo slug al mismo tiempo, la
+        restricción de unicidad rechaza el guardado y se busca otro slug; la
+        restricción es el índice único de ``common.indexes``, ver
+        ``SLUG_RETRIES``.
+        """
+
+        # Los slugs asignados con allocate_slugs ya están libres.
+        allocated = self.__dict__.pop('_allocated_slug', None)
+        if not self.has_name_slug() or \
+                (self.pk is None and allocated != self.slug):
+            self.allocate_slug()
+
+        using = kwargs.get('using') or router.db_for_write(self.__class__,
+                                                           instance=self)
+
+        for attempt in xrange(SLUG_RETRIES):
+            sid = transaction.savepoint(using=using)
+            try:
+                result = super(Content, self).save(*args, **kwargs)
+            except IntegrityError:
+                transaction.savepoint_rollback(sid, using=using)
+
+                taken = self.__class__._default_manager.using(using) \
+                        .filter(slug=self.slug).exclude(pk=self.pk).exists()
+                if not taken or attempt == SLUG_RETRIES - 1:
+                    raise
+
+                self.allocate_slug()
             else:
-                self.slug = "%s-%s" % (self.slug, self.id)
-        return super(Content, self).save(*args, **kwargs)
+                transaction.savepoint_commit(sid, using=using)
+                return result
+
+    @classmethod
+    def allocate_slugs(cls, objects, batch_size=SLUG_BATCH_SIZE):
+        """
+        Asigna un slug libre a cada contenido nuevo de *objects* sin
+        guardarlos. Se ejecuta una consulta por cada *batch_size* nombres
+        distintos y los contenidos con el mismo nombre reciben números
+        consecutivos. Se saltan los slugs ya asignados en el lote a otra
+        base, como ``x-3`` de "X" y de "X 3".
+        """
+
+        by_base = {}
+        for obj in objects:
+            by_base.setdefault(slug_base(cls, obj.name), []).append(obj)
+
+        assigned = set()
+        bases = by_base.keys()
+        for start in xrange(0, len(bases), batch_size):
+            chunk = bases[start:start + batch_size]
+            used = used_slug_numbers(cls, chunk)
+
+            for base in chunk:
+                number = max(used[base]) + 1 if used[base] else 1
+                for obj in by_base[base]:
+                    while make_slug(base, number) in assigned:
+                        number += 1
+
+                    obj.slug = obj._allocated_slug = make_slug(base, number)
+                    assigned.add(obj.slug)
+                    number += 1
+
+        return objects
+
+    @classmethod
+    def create_in_bulk(cls, objects, batch_size=SLUG_BATCH_SIZE, keep_dates=False):
+        """
+        Crea los contenidos nuevos de *objects* asignando sus slugs en lote,
+        en una transacción y con un INSERT por cada *batch_size* contenidos.
+        Usa ``bulk_create`` si la versión de Django lo tiene y si no
+        ``insert_rows``. Si otro proceso toma alguno de los slugs se asignan
+        otros y se reintenta.
+
+        Con *keep_dates* se conservan las fechas de creación y publicación
+        que ya tienen los objetos, por ejemplo al importar contenidos; como
+        ``bulk_create`` las reemplaza, en ese caso siempre se usa
+        ``insert_rows``.
+        """
+
+        objects = list(objects)
+        manager = cls._default_manager
+        using = router.db_for_write(cls)
+
+        for attempt in xrange(SLUG_RETRIES):
+            cls.allocate_slugs(objects, batch_size)
+            try:
+                with transaction.commit_on_success(using=using):
+                    for start in xrange(0, len(objects), batch_size):
+                        chunk = objects[start:start + batch_size]
+                        if hasattr(manager, 'bulk_create') and not keep_dates:
+                            manager.db_manager(using).bulk_create(chunk)
+                        else:
+                            insert_rows(cls, chunk, using, keep_dates)
+            except IntegrityError:
+                if attempt == SLUG_RETRIES - 1:
+                    raise
+                continue
+
+            # Las inserciones en lote no envían post_save.
+            bump_version(cls)
+            if search.is_registered(cls):
+                cls.index_created(objects)
+            return objects
+
+    @classmethod
+    def index_created(cls, objects):
+        """
+        Indexa para la búsqueda los contenidos creados en lote, que no tienen
+        llave primaria asignada, buscándolos por su slug.
+        """
+
+        slugs = [obj.slug for obj in objects]
+        for start in xrange(0, len(slugs), SLUG_BATCH_SIZE):
+            search.index_many(cls._default_manager.filter(
+                    slug__in=slugs[start:start + SLUG_BATCH_SIZE]))
+
+
+class SearchTerm(models.Model):
+    """
+    Término del índice invertido de búsqueda que se usa cuando la base de
+    datos no tiene búsqueda de texto completo.
+    """
+
+    #: Modelo del objeto como ``app_label.modelo``.
+    model = models.CharField(max_length=100)
+    #: Llave primaria del objeto.
+    object_id = models.PositiveIntegerField(db_index=True)
+    #: Palabra normalizada.
+    term = models.CharField(max_length=64)
+    #: Veces que la palabra aparece en el objeto.
+    weight = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        unique_together = (('model', 'term', 'object_id'),)
+
+
+def invalidate_content_cache(sender, **kwargs):
+    """
+    Invalida las respuestas guardadas en cache de los contenidos de tipo
+    *sender* incrementando su versión.
+    """
+
+    if issubclass(sender, Content):
+        bump_version(sender)
+
+post_save.connect(invalidate_content_cache,
+                  dispatch_uid='common.models.invalidate_content_cache_save')
+post_delete.connect(invalidate_content_cache,
+                    dispatch_uid='common.models.invalidate_content_cache_delete')
+
+
+def update_search_index_safely(update, instance, using=None):
+    """
+    Ejecuta *update* en un savepoint para que un error del índice, por
+    ejemplo cuando aún no se creó su tabla, no haga fallar el guardado de
+    *instance*. El error queda en el log.
+    """
+
+    using = using or router.db_for_write(instance.__class__, instance=instance)
+    sid = transaction.savepoint(using=using)
+    try:
+        update(instance, using=using)
+    except DatabaseError:
+        transaction.savepoint_rollback(sid, using=using)
+        logging.exception('No se pudo actualizar el índice de búsqueda de %s %s'
+                          % (instance.__class__.__name__, instance.pk))
+    else:
+        transaction.savepoint_commit(sid, using=using)
+
+
+def update_search_index(sender, instance, **kwargs):
+    """
+    Actualiza el índice de búsqueda de los modelos registrados en
+    ``common.search``.
+    """
+
+    if search.is_registered(sender):
+        update_search_index_safely(search.index_object, instance,
+                                   using=kwargs.get('using'))
+
+
+def remove_from_search_index(sender, instance, **kwargs):
+    if search.is_registered(sender):
+        update_search_index_safely(search.remove_object, instance,
+                                   using=kwargs.get('using'))
+
+post_save.connect(update_search_index,
+                  dispatch_uid='common.models.update_search_index')
+post_delete.connect(remove_from_search_index,
+                    dispatch_uid='common.models.remove_from_search_index')
+
+
+def create_content_indexes(sender, created_models=(), **kwargs):
+    """
+    Crea los índices de ``common.indexes`` en las tablas de contenidos que
+    syncdb acaba de crear, y las tablas de búsqueda de los modelos
+    registrados. Las apps migradas con South los crean con
+    ``add_content_indexes`` y ``common_search_index``.
+    """
+
+    # La señal se envía por cada app con todos los modelos creados.
+    app_label = sender.__name__.split('.')[-2]
+    using = kwargs.get('db', DEFAULT_DB_ALIAS)
+    for model in created_models:
+        if model._meta.app_label != app_label:
+            continue
+        if issubclass(model, Content):
+            create_indexes(model, using=using)
+        if search.is_registered(model):
+            search.get_backend(using).setup(model)
+
+post_syncdb.connect(create_content_indexes,
+                    dispatch_uid='common.models.create_content_indexes')
@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+# Copyright 2012 Mandla Web Studio
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+__author__ = 'Jose Maria Zambrana Arze'
+__email__ = 'contact@josezambrana.com'
+__version__ = '0.1'
+__copyright__ = 'Copyright 2012, Mandla Web Studio'
+
+
+import struct
+
+from common.encoders import default
+
+
+#: Tipo de contenido de las respuestas en formato msgpack.
+MIMETYPE = 'application/x-msgpack'
+
+
+class UnpackError(ValueError):
+    """
+    Los datos no son un documento msgpack válido.
+    """
+    pass
+
+
+_uint8 = struct.Struct('>BB').pack
+_uint16 = struct.Struct('>BH').pack
+_uint32 = struct.Struct('>BI').pack
+_uint64 = struct.Struct('>BQ').pack
+_int8 = struct.Struct('>Bb').pack
+_int16 = struct.Struct('>Bh').pack
+_int32 = struct.Struct('>Bi').pack
+_int64 = struct.Struct('>Bq').pack
+_float64 = struct.Struct('>Bd').pack
+
+#: Encabezados de un byte, precalculados.
+_FIXINT = [chr(i) for i in xrange(0x80)]
+_NEGATIVE_FIXINT = dict((i, chr(i & 0xff)) for i in xrange(-32, 0))
+_FIXSTR = [chr(0xa0 | i) for i in xrange(32)]
+_FIXARRAY = [chr(0x90 | i) for i in xrange(16)]
+_FIXMAP = [chr(0x80 | i) for i in xrange(16)]
+
+
+def _pack_int(value, append):
+    if 0 <= value < 0x80:
+        append(_FIXINT[value])
+    elif -32 <= value < 0:
+        append(_NEGATIVE_FIXINT[value])
+    elif 0 <= value <= 0xff:
+        append(_uint8(0xcc, value))
+    elif 0 <= value <= 0xffff:
+        append(_uint16(0xcd, value))
+    elif 0 <= value <= 0xffffffff:
+        append(_uint32(0xce, value))
+    elif 0 <= value <= 0xffffffffffffffff:
+        append(_uint64(0xcf, value))
+    elif -0x80 <= value < 0:
+        append(_int8(0xd0, value))
+    elif -0x8000 <= value < 0:
+        append(_int16(0xd1, value))
+    elif -0x80000000 <= value < 0:
+        append(_int32(0xd2, value))
+    elif -0x8000000000000000 <= value < 0:
+        append(_int64(0xd3, value))
+    else:
+        raise ValueError('Integer out of range: %s' % value)
+
+
+def _pack_str(value, append):
+    length = len(value)
+    if length < 32:
+        append(_FIXSTR[length])
+    elif length <= 0xff:
+        append(_uint8(0xd9, length))
+    elif length <= 0xffff:
+        append(_uint16(0xda, length))
+    else:
+        append(_uint32(0xdb, length))
+    append(value)
+
+
+def _pack_unicode(value, append):
+    _pack_str(value.encode('utf-8'), append)
+
+
+def _pack_float(value, append):
+    append(_float64(0xcb, value))
+
+
+def _pack_none(value, append):
+    append('\xc0')
+
+
+def _pack_bool(value, append):
+    append('\xc3' if value else '\xc2')
+
+
+def _pack_array(value, append):
+    length = len(value)
+    if length < 16:
+        append(_FIXARRAY[length])
+    elif length <= 0xffff:
+        append(_uint16(0xdc, length))
+    else:
+        append(_uint32(0xdd, length))
+    for item in value:
+        _pack(item, append)
+
+
+def _pack_map(value, append):
+    length = len(value)
+    if length < 16:
+        append(_FIXMAP[length])
+    elif length <= 0xffff:
+        append(_uint16(0xde, length))
+    else:
+        append(_uint32(0xdf, length))
+    for key, item in value.iteritems():
+        _pack(key, append)
+        _pack(item, append)
+
+
+#: Codificadores por tipo exacto. Las subclases se resuelven en _pack.
+_PACKERS = {
+    type(None): _pack_none,
+    bool: _pack_bool,
+    int: _pack_int,
+    long: _pack_int,
+    float: _pack_float,
+    str: _pack_str,
+    unicode: _pack_unicode,
+    list: _pack_array,
+    tuple: _pack_array,
+    set: _pack_array,
+    frozenset: _pack_array,
+    dict: _pack_map,
+}
+
+#: Orden en el que se prueban las clases base para las subclases.
+_BASES = (bool, int, long, float, str, unicode, list, tuple, set,
+          frozenset, dict)
+
+
+def _pack(value, append):
+    packer = _PACKERS.get(type(value))
+    if packer is not None:
+        return packer(value, append)
+
+    for base in _BASES:
+        if isinstance(value, base):
+            return _PACKERS[base](value, append)
+
+    _pack(default(value), append)
+
+
+def packb(value):
+    """
+    Codifica *value* en msgpack. Los valores que json no maneja directamente
+    (cadenas lazy, fechas, decimales, modelos) se convierten igual que en
+    ``common.encoders``.
+    """
+
+    buffer = []
+    _pack(value, buffer.append)
+    return ''.join(buffer)
+
+
+def _unpack_fixed(fmt):
+    unpack_from = struct.Struct(fmt).unpack_from
+    size = struct.calcsize(fmt)
+
+    def unpack(data, offset):
+        if offset + size > len(data):
+            raise UnpackError('Unexpected end of data')
+        return unpack_from(data, offset)[0], offset + size
+    return unpack
+
+
+def _unpack_constant(value):
+    def unpack(data, offset):
+        return value, offset
+    return unpack
+
+
+def _unpack_str(length, data, offset):
+    end = offset + length
+    if end > len(data):
+        raise UnpackError('Unexpected end of data')
+    return data[offset:end].decode('utf-8'), end
+
+
+def _unpack_bin(length, data, offset):
+    end = offset + length
+    if end > len(data):
+        raise UnpackError('Unexpected end of data')
+    return data[offset:end], end
+
+
+def _unpack_array(length, data, offset):
+    items = []
+    append = items.append
+    for _ in xrange(length):
+        item, offset = _unpack(data, offset)
+        append(item)
+    return items, offset
+
+
+def _unpack_map(length, data, offset):
+    result = {}
+    for _ in xrange(length):
+        key, offset = _unpack(data, offset)
+        result[key], offset = _unpack(data, offset)
+    return result, offset
+
+
+def _unpack_fixlength(container, length):
+    def unpack(data, offset):
+        return container(length, data, offset)
+    return unpack
+
+
+def _unpack_length(container, fmt):
+    read_length = _unpack_fixed(fmt)
+
+    def unpack(data, offset):
+        length, offset = read_length(data, offset)
+        return container(length, data, offset)
+    return unpack
+
+
+def _unsupported(code):
+    def unpack(data, offset):
+        raise UnpackError('Unsupported type 0x%x' % code)
+    return unpack
+
+
+#: Decodificadores por el primer byte de cada valor.
+_UNPACKERS = [_unsupported(code) for code in xrange(0x100)]
+
+for _code in xrange(0x80):
+    _UNPACKERS[_code] = _unpack_constant(_code)
+for _code in xrange(0xe0, 0x100):
+    _UNPACKERS[_code] = _unpack_constant(_code - 0x100)
+for _code in xrange(16):
+    _UNPACKERS[0x80 | _code] = _unpack_fixlength(_unpack_map, _code)
+    _UNPACKERS[0x90 | _code] = _unpack_fixlength(_unpack_array, _code)
+for _code in xrange(32):
+    _UNPACKERS[0xa0 | _code] = _unpack_fixlength(_unpack_str, _code)
+
+_UNPACKERS[0xc0] = _unpack_constant(None)
+_UNPACKERS[0xc2] = _unpack_constant(False)
+_UNPACKERS[0xc3] = _unpack_constant(True)
+
+for _code, _fmt in ((0xcc, '>B'), (0xcd, '>H'), (0xce, '>I'), (0xcf, '>Q'),
+                    (0xd0, '>b'), (0xd1, '>h'), (0xd2, '>i'), (0xd3, '>q'),
+                    (0xca, '>f'), (0xcb, '>d')):
+    _UNPACKERS[_code] = _unpack_fixed(_fmt)
+
+for _code, _fmt, _container in (
+        (0xd9, '>B', _unpack_str), (0xda, '>H', _unpack_str),
+        (0xdb, '>I', _unpack_str), (0xc4, '>B', _unpack_bin),
+        (0xc5, '>H', _unpack_bin), (0xc6, '>I', _unpack_bin),
+        (0xdc, '>H', _unpack_array), (0xdd, '>I', _unpack_array),
+        (0xde, '>H', _unpack_map), (0xdf, '>I', _unpack_map)):
+    _UNPACKERS[_code] = _unpack_length(_container, _fmt)
+
+
+def _unpack(data, offset):
+    if offset >= len(data):
+        raise UnpackError('Unexpected end of data')
+    return _UNPACKERS[ord(data[offset])](data, offset + 1)
+
+
+def unpackb(data):
+    """
+    Decodifica un documento msgpack. Las cadenas se retornan como unicode.
+    """
+
+    value, offset = _unpack(data, 0)
+    if offset != len(data):
+        raise UnpackError('Extra data after document')
+    return value
@@ -0,0 +1,423 @@
+# -*- coding: utf-8 -*-
+# Copyright 2012 Mandla Web Studio
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+__author__ = 'Jose Maria Zambrana Arze'
+__email__ = 'contact@josezambrana.com'
+__version__ = '0.1'
+__copyright__ = 'Copyright 2012, Mandla Web Studio'
+
+
+import re
+import base64
+
+from django.core.paginator import Paginator, Page, EmptyPage
+from django.core.paginator import PageNotAnInteger
+from django.db import connections
+from django.db.models import Q
+from django.db.models.sql.constants import LOOKUP_SEP
+from django.utils import simplejson as json
+from django.utils.encoding import force_unicode
+
+
+class InvalidCursor(Exception):
+    """
+    El cursor de la página no es válido.
+    """
+    pass
+
+
+class CursorPage(object):
+    """
+    Página de una paginación por cursor.
+    """
+
+    def __init__(self, object_list, paginator, next_cursor=None,
+                 previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return '<CursorPage %s>' % len(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+def supports_row_values(connection):
+    """
+    Retorna True si el motor de *connection* compara valores de fila
+    (``(a, b) < (x, y)``) usando un índice compuesto.
+    """
+
+    vendor = getattr(connection, 'vendor', None)
+
+    if vendor == 'postgresql':
+        return True
+
+    if vendor == 'sqlite':
+        from django.db.backends.sqlite3.base import Database
+        return Database.sqlite_version_info >= (3, 15, 0)
+
+    return False
+
+
+def seek_condition(ordering, values, reverse=False):
+    """
+    Retorna el filtro ``Q`` de las filas que están después de *values* en el
+    orden *ordering*, o antes si *reverse* es verdadero, como una cadena de
+    ``OR`` que funciona en cualquier motor.
+    """
+
+    fields = [name.lstrip('-') for name in ordering]
+
+    condition = None
+    for index, name in enumerate(ordering):
+        descending = name.startswith('-')
+        if reverse:
+            descending = not descending
+
+        lookup = '%s__%s' % (fields[index], 'lt' if descending else 'gt')
+        term = Q(**{lookup: values[index]})
+        for previous, value in zip(fields[:index], values[:index]):
+            term &= Q(**{previous: value})
+
+        condition = term if condition is None else condition | term
+
+    return condition
+
+
+def seek(queryset, ordering, values, reverse=False):
+    """
+    Retorna *queryset* filtrado a las filas que están después de *values* en
+    el orden *ordering* (o antes si *reverse* es verdadero).
+
+    Si todos los campos se ordenan en la misma dirección y el motor lo
+    soporta se usa una comparación de valores de fila
+    (``(published_at, id) < (%s, %s)``) que se resuelve con el índice
+    compuesto; en otro caso se usa la cadena de ``OR`` de
+    :func:`seek_condition`.
+    """
+
+    directions = set(name.startswith('-') for name in ordering)
+    connection = connections[queryset.db]
+
+    if len(directions) != 1 or not supports_row_values(connection):
+        return queryset.filter(seek_condition(ordering, values, reverse))
+
+    descending = directions.pop()
+    if reverse:
+        descending = not descending
+
+    opts = queryset.model._meta
+    qn = connection.ops.quote_name
+
+    columns, params = [], []
+    for name, value in zip(ordering, values):
+        name = name.lstrip('-')
+        field = opts.pk if name == 'pk' else opts.get_field(name)
+        if field.model._meta.db_table != opts.db_table:
+            # El campo está en la tabla de un modelo padre.
+            return queryset.filter(seek_condition(ordering, values, reverse))
+        columns.append('%s.%s' % (qn(opts.db_table), qn(field.column)))
+        params.append(field.get_db_prep_value(value, connection=connection))
+
+    where = '(%s) %s (%s)' % (', '.join(columns), '<' if descending else '>',
+                              ', '.join(['%s'] * len(params)))
+    return queryset.extra(where=[where], params=params)
+
+
+def keyset_ordering(queryset):
+    """
+    Retorna el orden de *queryset* terminado en la llave primaria para
+    recorrerlo por llave, o None si el orden incluye relaciones, expresiones
+    o campos que aceptan NULL.
+    """
+
+    query = queryset.query
+    if query.extra_order_by:
+        return None
+
+    opts = queryset.model._meta
+    ordering = list(query.order_by)
+    if not ordering and query.default_ordering:
+        ordering = list(opts.ordering)
+
+    result = []
+    for name in ordering:
+        prefix = '-' if name.startswith('-') else ''
+        name = name.lstrip('-')
+        if name == 'pk':
+            name = opts.pk.name
+
+        if name == '?' or LOOKUP_SEP in name or '.' in name:
+            return None
+
+        try:
+            field = opts.get_field(name)
+        except Exception:
+            return None
+
+        if field.null or field.rel is not None:
+            return None
+
+        result.append(prefix + name)
+        if field.primary_key:
+            return result
+
+    prefix = '-' if result and result[-1].startswith('-') else ''
+    return result + [prefix + opts.pk.name]
+
+
+class CursorPaginator(object):
+    """
+    Paginador que busca la página a partir de los valores de la última fila
+    vista (``WHERE (published_at, id) < (...)``) en lugar de usar OFFSET, así
+    el costo de cualquier página es el mismo que el de la primera. La
+    comparación de valores de fila solo se usa en los motores que la
+    resuelven con el índice compuesto, ver :func:`seek`.
+
+    Los cursores son cadenas opacas que codifican la dirección y los valores
+    de *ordering* de la fila límite.
+    """
+
+    def __init__(self, object_list, per_page, ordering=('-published_at', '-id')):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+        self.fields = [name.lstrip('-') for name in self.ordering]
+
+    def encode_cursor(self, direction, obj):
+        """
+        Retorna el cursor para continuar desde *obj* en la dirección
+        *direction* (``'n'`` siguiente, ``'p'`` anterior).
+        """
+
+        values = [force_unicode(getattr(obj, name)) for name in self.fields]
+        data = json.dumps([direction] + values)
+        return base64.urlsafe_b64encode(data).rstrip('=')
+
+    def decode_cursor(self, cursor):
+        """
+        Retorna la dirección y los valores codificados en *cursor*.
+        """
+
+        try:
+            cursor = str(cursor)
+            data = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            data = json.loads(data)
+        except (TypeError, ValueError, UnicodeEncodeError):
+            raise InvalidCursor(cursor)
+
+        if not isinstance(data, list) or len(data) != len(self.fields) + 1 \
+                or data[0] not in ('n', 'p'):
+            raise InvalidCursor(cursor)
+
+        opts = self.object_list.model._meta
+        try:
+            values = [opts.get_field(name).to_python(value)
+                      for name, value in zip(self.fields, data[1:])]
+        except Exception:
+            raise InvalidCursor(cursor)
+
+        return data[0], values
+
+    def reverse_ordering(self):
+        return [name[1:] if name.startswith('-') else '-' + name
+                for name in self.ordering]
+
+    def page(self, cursor=None):
+        """
+        Retorna la página que comienza en *cursor* o la primera página.
+        """
+
+        direction, values = 'n', None
+        if cursor:
+            direction, values = self.decode_cursor(cursor)
+
+        queryset = self.object_list
+        if direction == 'n':
+            queryset = queryset.order_by(*self.ordering)
+            if values is not None:
+                queryset = seek(queryset, self.ordering, values)
+        else:
+            queryset = queryset.order_by(*self.reverse_ordering())
+            queryset = seek(queryset, self.ordering, values, reverse=True)
+
+        object_list = list(queryset[:self.per_page + 1])
+        has_more = len(object_list) > self.per_page
+        object_list = object_list[:self.per_page]
+
+        if direction == 'p':
+            object_list.reverse()
+
+        if not object_list:
+            return CursorPage(object_list, self)
+
+        if direction == 'n':
+            has_next, has_previous = has_more, values is not None
+        else:
+            has_next, has_previous = True, has_more
+
+        next_cursor = previous_cursor = None
+        if has_next:
+            next_cursor = self.encode_cursor('n', object_list[-1])
+        if has_previous:
+            previous_cursor = self.encode_cursor('p', object_list[0])
+
+        return CursorPage(object_list, self, next_cursor, previous_cursor)
+
+
+#: Por debajo de esta cantidad estimada se cuenta exactamente.
+EXACT_COUNT_BELOW = 1000
+
+_EXPLAIN_ROWS = re.compile(r'rows=(\d+)')
+
+
+def estimate_count(queryset):
+    """
+    Retorna la cantidad de filas de *queryset* estimada por el planificador
+    de la base de datos, o None si el motor no la provee.
+    """
+
+    connection = connections[queryset.db]
+    vendor = getattr(connection, 'vendor', None)
+
+    if vendor not in ('postgresql', 'mysql'):
+        return None
+
+    compiler = queryset.query.get_compiler(using=queryset.db)
+    sql, params = compiler.as_sql()
+
+    cursor = connection.cursor()
+    cursor.execute('EXPLAIN ' + sql, params)
+    rows = cursor.fetchall()
+
+    if not rows:
+        return None
+
+    if vendor == 'postgresql':
+        match = _EXPLAIN_ROWS.search(rows[0][0])
+        return int(match.group(1)) if match else None
+
+    columns = [column[0] for column in cursor.description]
+    if 'rows' not in columns:
+        return None
+
+    return int(rows[0][columns.index('rows')] or 0)
+
+
+class NoCountPage(Page):
+    """
+    Página que sabe si existe una página siguiente sin conocer el total de
+    objetos.
+    """
+
+    def __init__(self, object_list, number, paginator, has_next):
+        super(NoCountPage, self).__init__(object_list, number, paginator)
+        self._has_next = has_next
+
+    def has_next(self):
+        return self._has_next
+
+    def has_other_pages(self):
+        return self.has_previous() or self.has_next()
+
+    def start_index(self):
+        if not self.object_list:
+            return 0
+        return (self.number - 1) * self.paginator.per_page + 1
+
+    def end_index(self):
+        return self.start_index() + len(self.object_list) - 1
+
+
+class NoCountPaginator(Paginator):
+    """
+    Paginador que no ejecuta ``COUNT(*)`` para mostrar una página: lee
+    ``per_page + 1`` filas y con la fila extra sabe si existe una página
+    siguiente. No maneja ``orphans``.
+
+    El total solo se calcula si se accede a ``count`` o ``num_pages``. Con
+    ``count='estimate'`` se usa la estimación del planificador de la base de
+    datos y se cuenta exactamente cuando no está disponible o es pequeña.
+    """
+
+    def __init__(self, object_list, per_page, orphans=0,
+                 allow_empty_first_page=True, count='exact'):
+        super(NoCountPaginator, self).__init__(object_list, per_page,
+                orphans=0, allow_empty_first_page=allow_empty_first_page)
+        self.count_mode = count
+
+    def validate_number(self, number):
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('That page number is not an integer')
+
+        if number < 1:
+            raise EmptyPage('That page number is less than 1')
+
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+
+        object_list = list(self.object_list[bottom:bottom + self.per_page + 1])
+        has_next = len(object_list) > self.per_page
+        object_list = object_list[:self.per_page]
+
+        if not object_list and (number > 1 or not self.allow_empty_first_page):
+            raise EmptyPage('That page contains no results')
+
+        return NoCountPage(object_list, number, self, has_next)
+
+    def _get_count(self):
+        if self._count is None:
+            count = None
+            if self.count_mode == 'estimate' and hasattr(self.object_list, 'query'):
+                count = estimate_count(self.object_list)
+                if count is not None and count < EXACT_COUNT_BELOW:
+                    count = None
+
+            if count is None:
+                try:
+                    count = self.object_list.count()
+                except (AttributeError, TypeError):
+                    count = len(self.object_list)
+
+            self._count = count
+
+        return self._count
+    count = property(_get_count)
+
@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+# Copyright 2012 Mandla Web Studio
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+__author__ = 'Jose Maria Zambrana Arze'
+__email__ = 'contact@josezambrana.com'
+__version__ = '0.1'
+__copyright__ = 'Copyright 2012, Mandla Web Studio'
+
+
+import re
+import threading
+
+from time import time
+from functools import update_wrapper
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+from common.cache import CACHE_PREFIX
+
+
+#: Si las vistas registran las consultas sql que ejecutan.
+PROFILE_QUERIES = getattr(settings, 'COMMON_PROFILE_QUERIES', False)
+
+#: Número de consultas más lentas que se guardan por vista.
+SLOWEST_QUERIES = getattr(settings, 'COMMON_PROFILE_SLOWEST_QUERIES', 10)
+
+#: Veces que una misma consulta se repite en una petición para considerarla
+#: un patrón N+1.
+REPEATED_QUERIES = getattr(settings, 'COMMON_PROFILE_REPEATED_QUERIES', 3)
+
+#: Segundos que se guardan las estadísticas en cache.
+PROFILE_TIMEOUT = getattr(settings, 'COMMON_PROFILE_TIMEOUT', 60 * 60 * 24)
+
+_IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+_SPACES = re.compile(r'\s+')
+
+_lock = threading.Lock()
+
+
+def query_shape(sql):
+    """
+    Retorna la forma de la consulta *sql*: el sql sin parámetros, con las
+    listas de ``IN`` reducidas para que consultas con distinto número de
+    valores tengan la misma forma.
+    """
+
+    return _SPACES.sub(' ', _IN_LIST.sub('IN (...)', sql)).strip()
+
+
+class QueryRecorder(object):
+    """
+    Cursor que registra el sql, sin parámetros, y la duración de cada
+    consulta.
+    """
+
+    def __init__(self, cursor, queries):
+        self.cursor = cursor
+        self.queries = queries
+
+    def execute(self, sql, params=()):
+        start = time()
+        try:
+            return self.cursor.execute(sql, params)
+        finally:
+            self.queries.append((sql, time() - start))
+
+    def executemany(self, sql, param_list):
+        start = time()
+        try:
+            return self.cursor.executemany(sql, param_list)
+        finally:
+            self.queries.append((sql, time() - start))
+
+    def __getattr__(self, attr):
+        return getattr(self.cursor, attr)
+
+    def __iter__(self):
+        return iter(self.cursor)
+
+
+def _recording_cursor(connection, queries, use_debug_cursor):
+    debug_cursor = type(connection).make_debug_cursor
+
+    def make_debug_cursor(cursor):
+        # Se mantiene connection.queries si el proyecto lo utiliza.
+        if use_debug_cursor or (use_debug_cursor is None and settings.DEBUG):
+            cursor = debug_cursor(connection, cursor)
+        return QueryRecorder(cursor, queries)
+
+    return make_debug_cursor
+
+
+_PATCHED = ('make_debug_cursor', 'use_debug_cursor')
+
+
+def record_queries(func, *args, **kwargs):
+    """
+    Ejecuta *func* y retorna una tupla con su resultado y la lista de
+    ``(sql, segundos)`` de las consultas que ejecutó en todas las bases de
+    datos.
+    """
+
+    queries = []
+    patched = []
+
+    for alias in connections:
+        connection = connections[alias]
+        patched.append((connection, dict((attr, connection.__dict__[attr])
+                for attr in _PATCHED if attr in connection.__dict__)))
+        connection.make_debug_cursor = _recording_cursor(connection, queries,
+                connection.use_debug_cursor)
+        connection.use_debug_cursor = True
+
+    try:
+        result = func(*args, **kwargs)
+    finally:
+        for connection, state in patched:
+            for attr in _PATCHED:
+                if attr in state:
+                    setattr(connection, attr, state[attr])
+                else:
+                    connection.__dict__.pop(attr, None)
+
+    return result, queries
+
+
+def stats_key(app_name, view_name):
+    """
+    Retorna la llave de las estadísticas de la vista.
+    """
+
+    return '%s:queries:%s:%s' % (CACHE_PREFIX, app_name, view_name)
+
+
+def _index_key():
+    return '%s:queries:views' % CACHE_PREFIX
+
+
+def empty_stats(app_name, view_name):
+    return {
+        'app_name': app_name,
+        'view_name': view_name,
+        'requests': 0,
+        'queries': 0,
+        'time': 0.0,
+        'max_queries': 0,
+        'slowest': [],
+        'repeated': {},
+    }
+
+
+def add_queries(stats, queries):
+    """
+    Suma a *stats* las consultas de una petición.
+    """
+
+    stats['requests'] += 1
+    stats['queries'] += len(queries)
+    stats['time'] += sum(duration for sql, duration in queries)
+    stats['max_queries'] = max(stats['max_queries'], len(queries))
+
+    slowest = stats['slowest'] + [[duration, sql] for sql, duration in queries]
+    slowest.sort(reverse=True)
+    stats['slowest'] = slowest[:SLOWEST_QUERIES]
+
+    counts = {}
+    for sql, duration in queries:
+        shape = query_shape(sql)
+        counts[shape] = counts.get(shape, 0) + 1
+
+    for shape, count in counts.items():
+        if count < REPEATED_QUERIES:
+            continue
+
+        repeated = stats['repeated'].setdefault(shape,
+                {'requests': 0, 'max_count': 0})
+        repeated['requests'] += 1
+        repeated['max_count'] = max(repeated['max_count'], count)
+
+    return stats
+
+
+def save_queries(app_name, view_name, queries):
+    """
+    Acumula las consultas de una petición en las estadísticas de la vista.
+
+    Las estadísticas se guardan en el cache del proyecto para que el
+    comando ``common_queries`` las lea; con un cache compartido se reúnen
+    las de todos los procesos. La actualización no es atómica entre
+    procesos, así que bajo mucha concurrencia los totales son aproximados.
+    """
+
+    key = stats_key(app_name, view_name)
+
+    with _lock:
+        stats = cache.get(key) or empty_stats(app_name, view_name)
+        cache.set(key, add_queries(stats, queries), PROFILE_TIMEOUT)
+
+        views = cache.get(_index_key()) or []
+        if [app_name, view_name] not in views:
+            views.append([app_name, view_name])
+            cache.set(_index_key(), views, PROFILE_TIMEOUT)
+
+
+def get_stats():
+    """
+    Retorna la lista de estadísticas de las vistas registradas, de la que
+    más tiempo pasa en la base de datos a la que menos.
+    """
+
+    views = cache.get(_index_key()) or []
+    keys = [stats_key(app_name, view_name) for app_name, view_name in views]
+    stats = cache.get_many(keys).values()
+    stats.sort(key=lambda item: item['time'], reverse=True)
+    return stats
+
+
+def reset_stats():
+    """
+    Elimina las estadísticas registradas.
+    """
+
+    views = cache.get(_index_key()) or []
+    cache.delete_many([stats_key(app_name, view_name)
+                       for app_name, view_name in views])
+    cache.delete(_index_key())
+
+
+def profiled_view(view, app_name, view_name):
+    """
+    Retorna la vista *view* registrando las consultas de cada petición en
+    las estadísticas de *app_name* y *view_name*. El template se renderiza
+    dentro de la vista para incluir sus consultas; las de las respuestas en
+    streaming no se registran porque se ejecutan al enviarlas.
+    """
+
+    def call(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        if hasattr(response, 'render') and not response.is_rendered:
+            response.render()
+        return response
+
+    def profiled(request, *args, **kwargs):
+        response, queries = record_queries(call, request, *args, **kwargs)
+        save_queries(app_name, view_name, queries)
+        return response
+
+    return update_wrapper(profiled, view)
@@ -0,0 +1,465 @@
+# -*- coding: utf-8 -*-
+# Copyright 2012 Mandla Web Studio
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+__author__ = 'Jose Maria Zambrana Arze'
+__email__ = 'contact@josezambrana.com'
+__version__ = '0.1'
+__copyright__ = 'Copyright 2012, Mandla Web Studio'
+
+
+import re
+import unicodedata
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections, router, transaction
+from django.db.models import Count, Sum
+from django.utils.encoding import force_unicode
+
+
+#: Backend de búsqueda: ``'auto'`` usa el motor de texto completo de la base
+#: de datos si lo tiene (``'sqlite'`` con FTS5, ``'postgresql'``) y si no el
+#: índice invertido de la app (``'index'``).
+SEARCH_BACKEND = getattr(settings, 'COMMON_SEARCH_BACKEND', 'auto')
+
+#: Configuración de texto de postgres para los documentos y las búsquedas.
+SEARCH_CONFIG = getattr(settings, 'COMMON_SEARCH_CONFIG', 'simple')
+
+#: Longitud mínima de las palabras que se indexan.
+MIN_WORD_LENGTH = 2
+#: Longitud máxima de los términos del índice invertido.
+MAX_TERM_LENGTH = 64
+
+_WORDS = re.compile(r'\w+', re.UNICODE)
+
+#: Campos de texto indexados por modelo.
+_registry = {}
+
+
+def register(model, fields=('name',)):
+    """
+    Indexa los campos *fields* de *model*. El índice se actualiza al guardar
+    y eliminar cada objeto.
+    """
+
+    _registry[model] = tuple(fields)
+
+
+def is_registered(model):
+    return model in _registry
+
+
+def get_document(obj):
+    """
+    Retorna el texto indexado de *obj*.
+    """
+
+    return u' '.join(force_unicode(getattr(obj, field) or u'')
+                     for field in _registry[obj.__class__])
+
+
+def tokenize(text):
+    """
+    Retorna las palabras de *text* en minúsculas y sin acentos.
+    """
+
+    text = unicodedata.normalize('NFKD', force_unicode(text))
+    text = u''.join(char for char in text if not unicodedata.combining(char))
+    return [word[:MAX_TERM_LENGTH] for word in _WORDS.findall(text.lower())
+            if len(word) >= MIN_WORD_LENGTH]
+
+
+class SearchBackend(object):
+    """
+    Interfaz de los backends de búsqueda. ``search`` retorna una lista de
+    ``(pk, puntaje)`` de la más relevante a la menos, solo de los objetos de
+    *queryset* si se define.
+    """
+
+    def __init__(self, using):
+        self.using = using
+        self.connection = connections[using]
+        #: Modelos cuyas tablas de búsqueda ya se verificaron en el proceso.
+        self.ready = set()
+
+    def execute(self, sql, params=()):
+        cursor = self.connection.cursor()
+        cursor.execute(sql, params)
+        return cursor
+
+    def setup(self, model):
+        pass
+
+    def ensure(self, model):
+        """
+        Crea las tablas de búsqueda de *model* la primera vez que se usan en
+        el proceso, también en las apps migradas con South que no pasan por
+        syncdb.
+        """
+
+        if model not in self.ready:
+            self.setup(model)
+            self.ready.add(model)
+
+    def restrict(self, queryset):
+        """
+        Retorna el sql y los parámetros de la subconsulta con las llaves
+        primarias de *queryset*, o None si no filtra el modelo.
+        """
+
+        if queryset is None or not queryset.query.where:
+            return None
+
+        query = queryset.order_by().values_list('pk').query
+        return query.get_compiler(using=self.using).as_sql()
+
+    def clear(self, model):
+        raise NotImplementedError
+
+    def index_many(self, objects):
+        raise NotImplementedError
+
+    def remove(self, obj):
+        raise NotImplementedError
+
+    def search(self, model, query, limit, queryset=None):
+        raise NotImplementedError
+
+    def index(self, obj):
+        self.index_many([obj])
+
+
+class IndexBackend(SearchBackend):
+    """
+    Índice invertido en la tabla de ``SearchTerm``: un registro por término
+    y objeto con la cantidad de veces que aparece. Funciona en cualquier
+    base de datos; el puntaje es la suma de las frecuencias de los términos.
+    """
+
+    def get_label(self, model):
+        return '%s.%s' % (model._meta.app_label, model._meta.object_name.lower())
+
+    def clear(self, model):
+        from common.models import SearchTerm
+
+        SearchTerm.objects.using(self.using) \
+                  .filter(model=self.get_label(model)).delete()
+
+    def index_many(self, objects):
+        from common.models import SearchTerm, insert_rows
+
+        if not objects:
+            return
+
+        label = self.get_label(objects[0].__class__)
+        SearchTerm.objects.using(self.using).filter(model=label,
+                object_id__in=[obj.pk for obj in objects]).delete()
+
+        terms = []
+        for obj in objects:
+            counts = {}
+            for word in tokenize(get_document(obj)):
+                counts[word] = counts.get(word, 0) + 1
+            terms.extend(SearchTerm(model=label, object_id=obj.pk, term=word,
+                                    weight=count)
+                         for word, count in counts.iteritems())
+
+        insert_rows(SearchTerm, terms, self.using)
+
+    def remove(self, obj):
+        from common.models import SearchTerm
+
+        SearchTerm.objects.using(self.using).filter(
+                model=self.get_label(obj.__class__), object_id=obj.pk).delete()
+
+    def search(self, model, query, limit, queryset=None):
+        from common.models import SearchTerm
+
+        terms = sorted(set(tokenize(query)))
+        if not terms:
+            return []
+
+        rows = SearchTerm.objects.using(self.using) \
+                .filter(model=self.get_label(model), term__in=terms)
+        if queryset is not None and queryset.query.where:
+            rows = rows.filter(object_id__in=queryset.order_by().values('pk'))
+
+        rows = rows \
+                .values('object_id') \
+                .annotate(score=Sum('weight'), matches=Count('term')) \
+                .filter(matches=len(terms)) \
+                .order_by('-score', 'object_id')[:limit]
+
+        return [(row['object_id'], row['score']) for row in rows]
+
+
+class SqliteBackend(SearchBackend):
+    """
+    Tabla virtual FTS5 por modelo (``<tabla>_fts``) con la llave primaria
+    como ``rowid``, ordenada con ``bm25``.
+    """
+
+    def get_table(self, model):
+        return self.connection.ops.quote_name('%s_fts' % model._meta.db_table)
+
+    def setup(self, model):
+        self.execute("CREATE VIRTUAL TABLE IF NOT EXISTS %s USING "
+                     "fts5(document, tokenize='unicode61 remove_diacritics 1')"
+                     % self.get_table(model))
+        transaction.commit_unless_managed(using=self.using)
+
+    def clear(self, model):
+        self.execute('DELETE FROM %s' % self.get_table(model))
+        transaction.commit_unless_managed(using=self.using)
+
+    def index_many(self, objects):
+        if not objects:
+            return
+
+        table = self.get_table(objects[0].__class__)
+        cursor = self.connection.cursor()
+        cursor.executemany('DELETE FROM %s WHERE rowid = %%s' % table,
+                           [(obj.pk,) for obj in objects])
+        cursor.executemany('INSERT INTO %s (rowid, document) VALUES (%%s, %%s)'
+                           % table, [(obj.pk, get_document(obj))
+                                     for obj in objects])
+        transaction.commit_unless_managed(using=self.using)
+
+    def remove(self, obj):
+        self.execute('DELETE FROM %s WHERE rowid = %%s'
+                     % self.get_table(obj.__class__), (obj.pk,))
+        transaction.commit_unless_managed(using=self.using)
+
+    def search(self, model, query, limit, queryset=None):
+        terms = tokenize(query)
+        if not terms:
+            return []
+
+        match = u' '.join(u'"%s"' % term for term in terms)
+        table = self.get_table(model)
+
+        where, params = '', [match]
+        restriction = self.restrict(queryset)
+        if restriction is not None:
+            where = ' AND rowid IN (%s)' % restriction[0]
+            params.extend(restriction[1])
+
+        cursor = self.execute('SELECT rowid, bm25(%s) FROM %s WHERE %s MATCH %%s%s '
+                              'ORDER BY bm25(%s) LIMIT %%s'
+                              % (table, table, table, where, table),
+                              params + [limit])
+        return [(pk, -rank) for pk, rank in cursor.fetchall()]
+
+
+class PostgresBackend(SearchBackend):
+    """
+    Tabla ``<tabla>_search`` por modelo con el ``tsvector`` de cada objeto y
+    un índice GIN, ordenada con ``ts_rank``.
+    """
+
+    def get_table(self, model):
+        return '%s_search' % model._meta.db_table
+
+    def setup(self, model):
+        table = self.get_table(model)
+        if table in self.connection.introspection.table_names():
+            return
+
+        qn = self.connection.ops.quote_name
+        self.execute('CREATE TABLE %s (id integer PRIMARY KEY, '
+                     'document tsvector NOT NULL)' % qn(table))
+        self.execute('CREATE INDEX %s ON %s USING gin (document)'
+                     % (qn('%s_document' % table), qn(table)))
+        transaction.commit_unless_managed(using=self.using)
+
+    def clear(self, model):
+        self.execute('DELETE FROM %s'
+                     % self.connection.ops.quote_name(self.get_table(model)))
+        transaction.commit_unless_managed(using=self.using)
+
+    def index_many(self, objects):
+        if not objects:
+            return
+
+        table = self.connection.ops.quote_name(
+                self.get_table(objects[0].__class__))
+        cursor = self.connection.cursor()
+        cursor.execute('DELETE FROM %s WHERE id IN (%s)' % (table,
+                       ', '.join(['%s'] * len(objects))),
+                       [obj.pk for obj in objects])
+        cursor.executemany('INSERT INTO %s (id, document) VALUES '
+                           '(%%s, to_tsvector(%%s::regconfig, %%s))' % table,
+                           [(obj.pk, SEARCH_CONFIG, get_document(obj))
+                            for obj in objects])
+        transaction.commit_unless_managed(using=self.using)
+
+    def remove(self, obj):
+        self.execute('DELETE FROM %s WHERE id = %%s'
+                     % self.connection.ops.quote_name(self.get_table(obj.__class__)),
+                     (obj.pk,))
+        transaction.commit_unless_managed(using=self.using)
+
+    def search(self, model, query, limit, queryset=None):
+        if not tokenize(query):
+            return []
+
+        table = self.connection.ops.quote_name(self.get_table(model))
+
+        where, params = '', [SEARCH_CONFIG, query]
+        restriction = self.restrict(queryset)
+        if restriction is not None:
+            where = ' AND id IN (%s)' % restriction[0]
+            params.extend(restriction[1])
+
+        cursor = self.execute('SELECT id, ts_rank(document, query) AS rank '
+                              'FROM %s, plainto_tsquery(%%s::regconfig, %%s) query '
+                              'WHERE document @@ query%s ORDER BY rank DESC, id '
+                              'LIMIT %%s' % (table, where), params + [limit])
+        return cursor.fetchall()
+
+
+BACKENDS = {
+    'index': IndexBackend,
+    'sqlite': SqliteBackend,
+    'postgresql': PostgresBackend,
+}
+
+
+def _has_fts5(connection):
+    try:
+        cursor = connection.cursor()
+        cursor.execute('PRAGMA compile_options')
+        return 'ENABLE_FTS5' in [row[0] for row in cursor.fetchall()]
+    except Exception:
+        return False
+
+
+def _detect_backend(using):
+    connection = connections[using]
+    engine = connection.settings_dict.get('ENGINE', '')
+    vendor = getattr(connection, 'vendor', None)
+
+    if vendor == 'sqlite' or engine.endswith('sqlite3'):
+        return 'sqlite' if _has_fts5(connection) else 'index'
+
+    if vendor == 'postgresql' or 'postgresql' in engine:
+        return 'postgresql'
+
+    return 'index'
+
+
+_backends = {}
+
+
+def get_backend(using):
+    """
+    Retorna el backend de búsqueda de la base de datos *using*.
+    """
+
+    if using not in _backends:
+        name = SEARCH_BACKEND
+        if name == 'auto':
+            name = _detect_backend(using)
+
+        if name not in BACKENDS:
+            raise ImproperlyConfigured(u'Search backend not supported: %s'
+                                       % name)
+        _backends[using] = BACKENDS[name](using)
+
+    return _backends[using]
+
+
+def index_object(obj, using=None):
+    """
+    Actualiza el índice de *obj*.
+    """
+
+    using = using or router.db_for_write(obj.__class__, instance=obj)
+    backend = get_backend(using)
+    backend.ensure(obj.__class__)
+    backend.index(obj)
+
+
+def index_many(objects, using=None):
+    """
+    Actualiza el índice de *objects*, todos del mismo modelo.
+    """
+
+    objects = list(objects)
+    if objects:
+        using = using or router.db_for_write(objects[0].__class__)
+        backend = get_backend(using)
+        backend.ensure(objects[0].__class__)
+        backend.index_many(objects)
+
+
+def remove_object(obj, using=None):
+    """
+    Elimina *obj* del índice.
+    """
+
+    using = using or router.db_for_write(obj.__class__, instance=obj)
+    backend = get_backend(using)
+    backend.ensure(obj.__class__)
+    backend.remove(obj)
+
+
+def search(model, query, limit=1000, using=None, queryset=None):
+    """
+    Retorna hasta *limit* tuplas ``(pk, puntaje)`` de los objetos de *model*
+    que contienen todas las palabras de *query*, del más relevante al menos.
+    Si se define *queryset* solo se buscan sus objetos, en la misma consulta.
+    """
+
+    using = using or router.db_for_read(model)
+    backend = get_backend(using)
+    backend.ensure(model)
+    return backend.search(model, query, limit, queryset)
+
+
+class SearchResults(object):
+    """
+    Secuencia de los resultados de una búsqueda que solo carga los objetos
+    de la porción que se pide, en el orden de relevancia. Cada objeto recibe
+    su puntaje en ``search_score``.
+    """
+
+    def __init__(self, queryset, ranked):
+        self.queryset = queryset
+        self.model = queryset.model
+        self.ranked = ranked
+
+    def __len__(self):
+        return len(self.ranked)
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1 or None][0]
+
+        ranked = self.ranked[index]
+        objects = self.queryset.in_bulk([pk for pk, score in ranked])
+
+        results = []
+        for pk, score in ranked:
+            obj = objects.get(pk)
+            if obj is not None:
+                obj.search_score = score
+                results.append(obj)
+
+        return results
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+# Copyright 2012 Mandla Web Studio
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+__author__ = 'Jose Maria Zambrana Arze'
+__email__ = 'contact@josezambrana.com'
+__version__ = '0.1'
+__copyright__ = 'Copyright 2012, Mandla Web Studio'
+
+
+from operator import itemgetter
+
+from django.conf import settings
+from django.db.models import SubfieldBase
+from django.db.models.query import QuerySet
+
+from common.util import chunked_iterator
+
+
+#: Campos que solo se serializan si se piden explícitamente, por modelo
+#: (``app_label.modelo``).
+EXCLUDE = getattr(settings, 'COMMON_SERIALIZER_EXCLUDE', {
+    'auth.user': ('password',),
+})
+
+class ModelSerializer(object):
+    """
+    Serializador de un modelo a diccionarios listos para codificarse. Los
+    campos, sus atributos y sus conversiones se calculan una sola vez al
+    crear el serializador.
+
+    Las llaves foráneas se emiten por su id (``user_id``), los campos con
+    conversión propia (``DictField``, ``ListField``) con su valor de python y,
+    si el modelo lo pide con ``json_url = True``, la url absoluta en ``url``.
+    Sin *fields* se emiten todos los campos menos los de
+    ``COMMON_SERIALIZER_EXCLUDE``.
+    """
+
+    def __init__(self, model, fields=None, url=True):
+        self.model = model
+        opts = model._meta
+
+        if fields is None:
+            exclude = EXCLUDE.get('%s.%s' % (opts.app_label,
+                                             opts.object_name.lower()), ())
+            model_fields = [opts.pk] + [field for field in opts.fields
+                                        if field is not opts.pk
+                                        and field.name not in exclude]
+        else:
+            model_fields = [opts.pk] + [opts.get_field(name) for name in fields
+                                        if name != opts.pk.name]
+
+        #: Atributos de cada campo en el orden en que se leen.
+        self.attnames = [field.attname for field in model_fields]
+
+        #: Conversiones que se aplican a los valores leídos con values().
+        self.converters = [(index, field.to_python)
+                           for index, field in enumerate(model_fields)
+                           if isinstance(field.__class__, SubfieldBase)]
+
+        self.url = url and getattr(model, 'json_url', False) \
+                and hasattr(model, 'get_absolute_url')
+
+    def serialize(self, obj):
+        """
+        Retorna el diccionario de la instancia *obj*.
+        """
+
+        data = dict((attname, getattr(obj, attname)) for attname in self.attnames)
+        if self.url:
+            data['url'] = obj.get_absolute_url()
+
+        return data
+
+    def serialize_row(self, row):
+        """
+        Retorna el diccionario de una fila leída con ``values_list`` en el
+        orden de ``attnames``.
+        """
+
+        if self.converters:
+            row = list(row)
+            for index, to_python in self.converters:
+                row[index] = to_python(row[index])
+
+        return dict(zip(self.attnames, row))
+
+    def iter_values(self, object_list, chunk_size=500):
+        """
+        Genera los diccionarios de *object_list*. Si es un queryset las filas
+        se leen con ``values_list`` por bloques sin crear instancias del
+        modelo; la url absoluta no se incluye en ese caso.
+        """
+
+        if not isinstance(object_list, QuerySet):
+            for obj in object_list:
+                yield self.serialize(obj)
+            return
+
+        rows = object_list.values_list(*self.attnames)
+        for row in chunked_iterator(rows, chunk_size, key=itemgetter(0)):
+            yield self.serialize_row(row)
+
+
+_serializers = {}
+
+
+def get_serializer(model, fields=None, url=True):
+    """
+    Retorna el serializador de *model* para *fields*, creándolo solo la
+    primera vez.
+    """
+
+    key = (model, tuple(fields) if fields is not None else None, url)
+    if key not in _serializers:
+        _serializers[key] = ModelSerializer(model, fields, url)
+
+    return _serializers[key]
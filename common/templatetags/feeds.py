@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+# Copyright 2012 Mandla Web Studio
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+__author__ = 'Jose Maria Zambrana Arze'
+__email__ = 'contact@josezambrana.com'
+__version__ = '0.1'
+__copyright__ = 'Copyright 2012, Mandla Web Studio'
+
+
+import time
+import datetime
+
+from django import template
+
+register = template.Library()
+
+
+@register.filter(name='rfc3339')
+def rfc3339(value):
+    """
+    Da formato de RFC 3339 en UTC (``2012-01-17T21:56:25Z``) a una fecha,
+    como lo piden los feeds atom. Las fechas sin zona horaria se interpretan
+    en la zona horaria del servidor (``TIME_ZONE``).
+    """
+
+    if not value:
+        return u''
+
+    if value.tzinfo is not None:
+        value = value.replace(tzinfo=None) - value.utcoffset()
+    else:
+        value = datetime.datetime.utcfromtimestamp(time.mktime(value.timetuple()))
+
+    return value.strftime('%Y-%m-%dT%H:%M:%SZ')
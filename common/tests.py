@@ -31,6 +31,7 @@ from django.test.client import RequestFactory
 from django.contrib.sites.models import Site
 from django.contrib.auth.models import User
 from django.conf import settings
+from django.db import DatabaseError
 from django.core.urlresolvers import reverse
 from django.core.urlresolvers import NoReverseMatch
 from django.utils import simplejson
@@ -43,7 +44,14 @@ from common.views import OwnerRequiredMixin
 from common.views import FormView
 from common.views import CreateView
 from common.views import UpdateView
+from common.views import ListView
+from common.views import DetailView
+from common.views import DeleteView
+from common.views import OwnerListView
+from common.views import SearchView
 from common.models import Content
+from common import search
+from common import encoders
 
 
 current_site = Site.objects.get_current()
@@ -142,6 +150,13 @@ class TestBase(TestCase):
         else:
             self._anonymous_user(request)
 
+        return self.call_view(view, request, **kwargs)
+
+    def call_view(self, view, request, **kwargs):
+        """
+        Retorna la respuesta de la vista *view* al request *request*.
+        """
+
         view_call = view.as_view()
         response = view_call(request, **kwargs)
 
@@ -150,6 +165,56 @@ class TestBase(TestCase):
         
         return response
 
+    def captured_queries(self, function, *args, **kwargs):
+        """
+        Retorna las consultas sql que ejecuta *function* y lo que retorna.
+        """
+
+        from django.db import connection
+
+        settings.DEBUG, debug = True, settings.DEBUG
+        connection.queries = []
+        try:
+            result = function(*args, **kwargs)
+            queries = [query['sql'] for query in connection.queries]
+        finally:
+            settings.DEBUG = debug
+
+        return queries, result
+
+    def view_queries(self, view, path='/', data={}, method='get', ajax=False,
+                     username=None, match=None, **kwargs):
+        """
+        Retorna las consultas sql que ejecuta la vista *view*. Si se define
+        *match* solo retorna las consultas que lo contienen.
+        """
+
+        method = 'get' if method.lower() == 'get' else 'post'
+        request_call = getattr(self, 'request_%s%s' % (method, '_ajax' if ajax else ''))
+        request = request_call(path, data=data)
+
+        if username is not None:
+            self._logged_user(request, username=username)
+        else:
+            self._anonymous_user(request)
+
+        queries, response = self.captured_queries(self.call_view, view,
+                                                  request, **kwargs)
+
+        if match is not None:
+            queries = [sql for sql in queries if match in sql]
+
+        return queries
+
+    def assertViewQueries(self, num, view, **kwargs):
+        """
+        Verifica que la vista *view* ejecute *num* consultas sql.
+        """
+
+        queries = self.view_queries(view, **kwargs)
+        self.assertEqual(num, len(queries), '%s queries executed, %s expected:\n%s'
+                         % (len(queries), num, '\n'.join(queries)))
+
     def view_get(self, view, path='/', data={}, **kwargs):
         return self.view_request(view, path, data=data, method='get', ajax=False, **kwargs)
 
@@ -505,6 +570,65 @@ class TestContent(TestBase):
         assert content.slug != old_slug
         assert content.slug != self.content.slug
 
+    def test_content_slug_numbers(self):
+        """
+        Los slugs repetidos se numeran a partir del mayor número usado y no
+        se buscan de nuevo si el nombre no cambia.
+        """
+
+        second = SomeContent.objects.create(name='Test content', user=self.user)
+        third = SomeContent.objects.create(name='Test content', user=self.user)
+        assert second.slug == 'test-content-2'
+        assert third.slug == 'test-content-3'
+
+        # Un nombre que solo comparte el prefijo no cuenta.
+        other = SomeContent.objects.create(name='Test content other', user=self.user)
+        assert other.slug == 'test-content-other'
+
+        from common.models import used_slug_numbers
+        used = used_slug_numbers(SomeContent, ['test-content'])
+        assert used == {'test-content': set([1, 2, 3])}
+
+        def save():
+            second.save()
+        self.assertNumQueries(2, save)
+        assert second.slug == 'test-content-2'
+
+    def test_content_allocate_slugs(self):
+        """
+        Los slugs de muchos contenidos se asignan con una consulta por lote.
+        """
+
+        contents = [SomeContent(name='Test content', user=self.user) for i in range(3)]
+        contents.append(SomeContent(name='Bulk content', user=self.user))
+
+        self.assertNumQueries(1, lambda: SomeContent.allocate_slugs(contents))
+        assert [content.slug for content in contents] == \
+               ['test-content-2', 'test-content-3', 'test-content-4', 'bulk-content']
+
+        SomeContent.create_in_bulk(contents)
+        slugs = SomeContent.objects.values_list('slug', flat=True)
+        assert len(slugs) == len(set(slugs)) == 5
+
+    def test_content_allocate_slugs_colliding_bases(self):
+        """
+        Un slug numerado de una base no se repite como slug de otra base del
+        mismo lote.
+        """
+
+        contents = [SomeContent(name='Test content', user=self.user),
+                    SomeContent(name='Test content', user=self.user),
+                    SomeContent(name='Test content 3', user=self.user)]
+
+        SomeContent.allocate_slugs(contents)
+        slugs = [content.slug for content in contents]
+        assert len(set(slugs)) == 3
+        assert 'test-content' not in slugs
+
+        SomeContent.create_in_bulk(contents)
+        slugs = SomeContent.objects.values_list('slug', flat=True)
+        assert len(slugs) == len(set(slugs)) == 4
+
 
 class WithOwnerRequired(OwnerRequiredMixin, BaseView):
     model = SomeContent
@@ -813,4 +937,1519 @@ class TestUpdateView(TestBase):
         assert content.name == old_name
 
 
+class TStreamListView(ListView):
+    view_name = 'stream-list-view'
+    app_name = 'common'
+    model = SomeContent
+    stream = 'array'
+    stream_chunk_size = 2
+
+
+class TestListViewStream(TestBase):
+    def setUp(self):
+        super(TestListViewStream, self).setUp()
+
+        for i in range(5):
+            SomeContent.objects.create(name='content %s' % i, user=self.user)
+
+    def test_stream_json_array(self):
+        """
+        La vista debe ser capaz de enviar la lista como un arreglo json
+        codificando los objetos por bloques.
+        """
+
+        response = self.view_get(TStreamListView, format='json')
+        assert response['Content-Type'].startswith('application/json')
+
+        rows = simplejson.loads(response.content)
+        assert len(rows) == SomeContent.objects.count()
+        assert set(row['id'] for row in rows) == \
+               set(SomeContent.objects.values_list('id', flat=True))
+
+    def test_stream_ndjson(self):
+        """
+        La vista debe ser capaz de enviar un objeto json por línea.
+        """
+
+        response = self.view_get(TStreamListView, format='ndjson')
+        assert response['Content-Type'].startswith('application/x-ndjson')
+
+        lines = response.content.strip().split('\n')
+        assert len(lines) == SomeContent.objects.count()
+        assert all('name' in simplejson.loads(line) for line in lines)
+
+    def test_chunked_keyset(self):
+        """
+        Los querysets ordenados se deben recorrer por llave, sin OFFSET, y
+        respetando el orden.
+        """
+
+        from common.util import chunked_iterator
+
+        queryset = SomeContent.objects.order_by('-published_at')
+        expected = list(queryset.order_by('-published_at', '-id')
+                                .values_list('id', flat=True))
+
+        queries, ids = self.captured_queries(
+                lambda: [obj.id for obj in chunked_iterator(queryset, 2)])
+        values_queries, values = self.captured_queries(
+                lambda: list(chunked_iterator(queryset.values_list('published_at', 'id'), 2)))
+        queries += values_queries
+
+        assert ids == expected
+        assert [row[1] for row in values] == expected
+        assert not [sql for sql in queries if 'OFFSET' in sql]
+
+
+class TestEncoders(TestBase):
+    """
+    Valida los backends de codificación json.
+    """
+
+    def test_encode_special_values(self):
+        """
+        Todos los backends instalados deben codificar cadenas lazy, fechas,
+        decimales e instancias de modelos.
+        """
+
+        import datetime
+        import decimal
+        from django.utils.translation import ugettext_lazy
+
+        content = SomeContent.objects.create(name='encoded', user=self.user)
+        value = {
+            'message': ugettext_lazy(u'La acción no pudo realizarse'),
+            'date': datetime.datetime(2012, 1, 17, 21, 56, 25),
+            'price': decimal.Decimal('10.50'),
+            'object': content,
+        }
+
+        for name in encoders.available_backends():
+            data = simplejson.loads(encoders.dumps(value, backend=name))
+            assert data['message'] == u'La acción no pudo realizarse'
+            assert data['date'] == '2012-01-17 21:56:25'
+            assert data['price'] == '10.50'
+            assert data['object']['id'] == content.id
+            assert data['object']['slug'] == content.slug
+
+
+class TCachedListView(ListView):
+    view_name = 'cached-list-view'
+    app_name = 'common'
+    model = SomeContent
+    cache_timeout = 60
+    calls = 0
+
+    def get_queryset(self):
+        TCachedListView.calls += 1
+        return super(TCachedListView, self).get_queryset()
+
+    def get_context_data(self, **kwargs):
+        context = super(TCachedListView, self).get_context_data(**kwargs)
+        context['names'] = [content.name for content in context['object_list']]
+        del context['object_list']
+        return context
+
+
+class THeadersCachedListView(TCachedListView):
+    view_name = 'headers-cached-list-view'
+    templates = {
+        'html': 'pagination/basic.html'
+    }
+
+    def render_to_response(self, context, **response_kwargs):
+        response = super(THeadersCachedListView, self).render_to_response(
+                context, **response_kwargs)
+        response['Content-Language'] = 'es'
+        response['X-Names'] = ','.join(context['names'])
+        response.set_cookie('seen', 'yes', max_age=60)
+        return response
+
+
+class TestResponseCache(TestBase):
+    def setUp(self):
+        super(TestResponseCache, self).setUp()
+        from django.core.cache import cache
+        cache.clear()
+        TCachedListView.calls = 0
+        self.content = SomeContent.objects.create(name='cached', user=self.user)
+
+    def test_cached_response(self):
+        """
+        La vista debe reutilizar la respuesta guardada mientras los contenidos
+        no cambien.
+        """
+
+        first = self.view_get_ajax(TCachedListView)
+        second = self.view_get_ajax(TCachedListView)
+        assert first == second
+        assert TCachedListView.calls == 1
+
+        # Otro formato u otro query string generan otra respuesta.
+        self.view_get_ajax(TCachedListView, data={'page': 1})
+        assert TCachedListView.calls == 2
+
+    def test_invalidate_on_save_and_delete(self):
+        """
+        Guardar o eliminar un contenido debe invalidar las respuestas que
+        dependen de su modelo.
+        """
+
+        self.view_get_ajax(TCachedListView)
+
+        self.content.name = 'renamed'
+        self.content.save()
+        response = self.view_get_ajax(TCachedListView)
+        assert response['names'] == ['renamed']
+        assert TCachedListView.calls == 2
+
+        self.content.delete()
+        response = self.view_get_ajax(TCachedListView)
+        assert response['names'] == []
+        assert TCachedListView.calls == 3
+
+    def test_cached_headers(self):
+        """
+        La respuesta guardada debe conservar las cabeceras pero no las
+        cookies de quien la generó.
+        """
+
+        first = self.view_get(THeadersCachedListView, format='html')
+        second = self.view_get(THeadersCachedListView, format='html')
+        assert TCachedListView.calls == 1
+
+        assert second.content == first.content
+        assert second['Content-Type'] == first['Content-Type']
+        assert second['Content-Language'] == 'es'
+        assert second['X-Names'] == 'cached'
+        assert first.cookies['seen'].value == 'yes'
+        assert 'seen' not in second.cookies
+        assert 'Set-Cookie' not in second
+
+    def test_html_cached_per_user(self):
+        """
+        Los formatos con template se guardan por usuario y los formatos de
+        contexto se comparten.
+        """
+
+        User.objects.create(username='other')
+
+        self.view_get(THeadersCachedListView, format='html', username=self.username)
+        self.view_get(THeadersCachedListView, format='html', username='other')
+        assert TCachedListView.calls == 2
+
+        self.view_get(THeadersCachedListView, format='json', username=self.username)
+        self.view_get(THeadersCachedListView, format='json', username='other')
+        assert TCachedListView.calls == 3
+
+
+class TContentListView(ListView):
+    view_name = 'content-list-view'
+    app_name = 'common'
+    model = SomeContent
+    list_validators = True
+    templates = {
+        'html': 'pagination/basic.html'
+    }
+
+
+class TContentDetailView(DetailView):
+    view_name = 'content-detail-view'
+    app_name = 'common'
+    model = SomeContent
+    templates = {
+        'html': 'inc.content.html'
+    }
+
+
+class TestConditionalGet(TestBase):
+    def setUp(self):
+        super(TestConditionalGet, self).setUp()
+        self.content = SomeContent.objects.create(name='conditional', user=self.user)
+
+    def conditional_get(self, view, **kwargs):
+        headers = dict((key, kwargs.pop(key)) for key in kwargs.keys()
+                       if key.startswith('HTTP_'))
+        request = self.request_get('/', **headers)
+        self._anonymous_user(request)
+        response = view.as_view()(request, **kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        return response
+
+    def test_list_not_modified(self):
+        """
+        La lista debe responder 304 mientras sus contenidos no cambien.
+        """
+
+        response = self.conditional_get(TContentListView)
+        assert response.status_code == 200
+        etag = response['ETag']
+
+        response = self.conditional_get(TContentListView, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+
+        SomeContent.objects.create(name='other', user=self.user)
+        response = self.conditional_get(TContentListView, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+
+    def test_list_requires_etag(self):
+        """
+        La lista no debe responder 304 solo por la fecha, que no cambia al
+        eliminar un objeto, ni calcular validadores si no los tiene activos.
+        """
+
+        response = self.conditional_get(TContentListView)
+        last_modified = response['Last-Modified']
+
+        SomeContent.objects.create(name='other', user=self.user).delete()
+        response = self.conditional_get(TContentListView,
+                                        HTTP_IF_MODIFIED_SINCE=last_modified)
+        assert response.status_code == 200
+
+        response = self.conditional_get(TStreamListView, format='json')
+        assert not response.has_header('ETag')
+
+    def test_detail_not_modified(self):
+        """
+        El detalle debe responder 304 según el etag o la fecha de
+        modificación del objeto.
+        """
+
+        response = self.conditional_get(TContentDetailView, pk=self.content.pk)
+        assert response.status_code == 200
+        etag = response['ETag']
+        last_modified = response['Last-Modified']
+
+        response = self.conditional_get(TContentDetailView, pk=self.content.pk,
+                                        HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+
+        response = self.conditional_get(TContentDetailView, pk=self.content.pk,
+                                        HTTP_IF_MODIFIED_SINCE=last_modified)
+        assert response.status_code == 304
+
+        # Otro formato tiene otro etag.
+        response = self.conditional_get(TContentDetailView, pk=self.content.pk,
+                                        format='json', HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+
+
+class TCursorListView(ListView):
+    view_name = 'cursor-list-view'
+    app_name = 'common'
+    model = SomeContent
+    paginate_by = 2
+    paginate_by_cursor = True
+    templates = {
+        'html': 'pagination/basic.html'
+    }
+
+    def get_context_data(self, **kwargs):
+        context = super(TCursorListView, self).get_context_data(**kwargs)
+        context['paginate'] = True
+        return context
+
+
+class TestCursorPagination(TestBase):
+    def setUp(self):
+        super(TestCursorPagination, self).setUp()
+
+        for i in range(5):
+            SomeContent.objects.create(name='content %s' % i, user=self.user)
+
+        self.expected = list(SomeContent.objects.order_by('-published_at', '-id')
+                                                .values_list('id', flat=True))
+
+    def test_walk_pages(self):
+        """
+        La vista debe ser capaz de recorrer todas las páginas hacia adelante y
+        hacia atrás usando los cursores.
+        """
+
+        from common.paginator import CursorPaginator
+
+        paginator = CursorPaginator(SomeContent.objects.all(), 2)
+
+        ids, page = [], paginator.page()
+        assert not page.has_previous()
+        while True:
+            ids.extend(obj.id for obj in page)
+            if not page.has_next():
+                break
+            page = paginator.page(page.next_cursor)
+        assert ids == self.expected
+
+        page = paginator.page(page.previous_cursor)
+        assert [obj.id for obj in page] == self.expected[2:4]
+
+    def test_row_value_seek(self):
+        """
+        La comparación de valores de fila debe seleccionar las mismas filas
+        que la cadena de ``OR``.
+        """
+
+        from django.db import connection
+        from common.paginator import seek, seek_condition, supports_row_values
+
+        ordering = ('-published_at', '-id')
+        queryset = SomeContent.objects.order_by(*ordering)
+        pivot = queryset[2]
+        values = [pivot.published_at, pivot.id]
+
+        for reverse in (False, True):
+            rows = [obj.id for obj in seek(queryset, ordering, values, reverse)]
+            expected = [obj.id for obj in
+                        queryset.filter(seek_condition(ordering, values, reverse))]
+            assert rows == expected
+
+        sql = str(seek(queryset, ordering, values).query)
+        assert (') < (' in sql) == supports_row_values(connection)
+
+    def test_cursor_response(self):
+        """
+        La respuesta json debe incluir los cursores siguiente y anterior, y el
+        html debe enlazarlos.
+        """
+
+        response = self.view_get_ajax(TCursorListView)
+        assert response['prev'] is None
+        assert response['next'] is not None
+
+        response = self.view_get(TCursorListView, data={'cursor': response['next']})
+        self.assertContains(response, '?cursor=')
+
+        from django.http import Http404
+        self.assertRaises(Http404, lambda: self.view_get(TCursorListView,
+                                                         data={'cursor': 'invalid'}))
+
+
+class TestNoCountPaginator(TestBase):
+    def setUp(self):
+        super(TestNoCountPaginator, self).setUp()
+
+        for i in range(5):
+            SomeContent.objects.create(name='content %s' % i, user=self.user)
+
+    def test_pages_without_count(self):
+        """
+        El paginador debe saber si existe una página siguiente sin contar los
+        objetos.
+        """
+
+        from common.paginator import NoCountPaginator
+
+        paginator = NoCountPaginator(SomeContent.objects.order_by('id'), 2)
+
+        queries, page = self.captured_queries(paginator.page, 2)
+
+        assert len(queries) == 1
+        assert 'COUNT' not in queries[0].upper()
+        assert page.has_next() and page.has_previous()
+        assert page.start_index() == 3 and page.end_index() == 4
+
+        page = paginator.page(3)
+        assert not page.has_next()
+        assert len(page.object_list) == 1
+
+        # El total se calcula solo cuando se necesita.
+        assert paginator.count == 5
+
+
+class TestFeeds(TestBase):
+    def setUp(self):
+        super(TestFeeds, self).setUp()
+        from django.core.cache import cache
+        cache.clear()
+
+        for i in range(3):
+            SomeContent.objects.create(name='entry %s' % i, user=self.user)
+
+    def test_atom_and_rss(self):
+        """
+        La lista debe ser capaz de generar feeds atom y rss de sus contenidos.
+        """
+
+        response = self.view_get(TContentListView, format='atom')
+        assert response['Content-Type'].startswith('application/atom+xml')
+        assert response.content.count('<entry>') == 3
+        assert '</feed>' in response.content
+
+        response = self.view_get(TContentListView, format='rss')
+        assert response['Content-Type'].startswith('application/rss+xml')
+        assert response.content.count('<item>') == 3
+        assert '</rss>' in response.content
+
+    def test_entries_cached_by_version(self):
+        """
+        Cada entrada debe renderizarse una vez por versión del contenido.
+        """
+
+        from django.core.cache import cache
+        from common.feeds import entry_cache_key
+
+        content = SomeContent.objects.all()[0]
+        self.view_get(TContentListView, format='atom')
+        key = entry_cache_key('feeds/atom_entry.xml', content)
+        assert cache.get(key) is not None
+
+        cache.set(key, '<entry>cached</entry>')
+        response = self.view_get(TContentListView, format='atom')
+        assert '<entry>cached</entry>' in response.content
+
+    def test_feed_not_modified(self):
+        """
+        El feed debe responder 304 si no cambió la entrada más reciente.
+        """
+
+        request = self.request_get('/')
+        self._anonymous_user(request)
+        response = TContentListView.as_view()(request, format='atom')
+        etag = response['ETag']
+
+        request = self.request_get('/', HTTP_IF_NONE_MATCH=etag)
+        self._anonymous_user(request)
+        response = TContentListView.as_view()(request, format='atom')
+        assert response.status_code == 304
+
+        # Eliminar una entrada que no es la más reciente cambia el etag.
+        SomeContent.objects.order_by('published_at')[0].delete()
+        request = self.request_get('/', HTTP_IF_NONE_MATCH=etag)
+        self._anonymous_user(request)
+        response = TContentListView.as_view()(request, format='atom')
+        assert response.status_code == 200
+
+    def test_entry_key_microseconds(self):
+        """
+        Dos modificaciones en el mismo segundo deben tener llaves distintas.
+        """
+
+        import datetime
+        from common.feeds import entry_cache_key
+
+        content = SomeContent.objects.all()[0]
+        content.updated_at = datetime.datetime(2012, 1, 17, 21, 56, 25, 1000)
+        first = entry_cache_key('feeds/atom_entry.xml', content)
+        content.updated_at = content.updated_at.replace(microsecond=2000)
+        assert entry_cache_key('feeds/atom_entry.xml', content) != first
+
+    def test_atom_dates_in_utc(self):
+        """
+        Las fechas del feed atom deben estar en UTC.
+        """
+
+        import time
+        import datetime
+        from common.templatetags.feeds import rfc3339
+
+        value = datetime.datetime(2012, 1, 17, 21, 56, 25)
+        utc = datetime.datetime.utcfromtimestamp(time.mktime(value.timetuple()))
+        assert rfc3339(value) == utc.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+class TCachedUpdateView(TUpdateView):
+    fragment_cache_timeout = 60
+
+
+class TestFragmentCache(TestBase):
+    def setUp(self):
+        super(TestFragmentCache, self).setUp()
+        from django.core.cache import cache
+        cache.clear()
+
+        self.content = SomeContent.objects.create(name='fragment', user=self.user)
+
+    def test_object_fragment(self):
+        """
+        El html del objeto debe guardarse por versión del objeto.
+        """
+
+        from django.core.cache import cache
+
+        view = TCachedUpdateView(fragment_time_bucket=None)
+        view.object = self.content
+        view.request = self.request_get_ajax('/')
+        self._anonymous_user(view.request)
+        key = view.get_object_fragment_key()
+        cache.set(key, 'cached object')
+
+        response = TCachedUpdateView.as_view(fragment_time_bucket=None)(
+                view.request, pk=self.content.pk)
+        assert simplejson.loads(response.content)['object'] == 'cached object'
 
+        # Al actualizar el objeto cambia la llave.
+        data = {'name': 'fragment updated', 'user': self.user.id, 'slug': 'x'}
+        response = self.view_post_ajax(TCachedUpdateView, data=data, pk=self.content.pk)
+        assert response['success']
+        assert response['object'] != 'cached object'
+        assert 'fragment updated' in response['object']
+
+    def test_object_fragment_per_user_and_time(self):
+        """
+        El html del objeto depende del usuario y de la hora por las fechas
+        relativas.
+        """
+
+        from common import cache as response_cache
+
+        view = TCachedUpdateView()
+        view.object = self.content
+        view.request = self.request_get('/')
+        self._anonymous_user(view.request)
+
+        old_time = response_cache.time
+        response_cache.time = lambda: 1000.0
+        try:
+            anonymous = view.get_object_fragment_key()
+            self._logged_user(view.request)
+            user = view.get_object_fragment_key()
+            assert user != anonymous
+
+            response_cache.time = lambda: 1000.0 + view.fragment_time_bucket
+            assert view.get_object_fragment_key() != user
+        finally:
+            response_cache.time = old_time
+
+    def test_unbound_form_fragment(self):
+        """
+        Solo los formularios sin datos deben guardarse.
+        """
+
+        view = TCachedUpdateView()
+        bound = SomeForm(data={'some_text': 'x'})
+        assert view.get_form_fragment_key(bound) is None
+        assert view.get_form_fragment_key(SomeForm()) is not None
+        assert view.get_form_fragment_key(SomeForm()) == \
+               view.get_form_fragment_key(SomeForm())
+
+
+class TestLeanResponses(TestBase):
+    def test_lean_form(self):
+        """
+        Las respuestas json ligeras no deben incluir el html del formulario y
+        deben retornar los errores por campo.
+        """
+
+        response = self.view_get_ajax(TFormView, data={'lean': '1'})
+        assert response['success']
+        assert 'form' not in response
+
+        response = self.view_post_ajax(TFormView, data={'lean': '1'})
+        assert not response['success']
+        assert 'form' not in response
+        assert 'some_text' in response['errors']
+        assert isinstance(response['errors']['some_text'], list)
+
+    def test_lean_model_form(self):
+        """
+        Las respuestas json ligeras de formularios de modelos deben retornar
+        la llave primaria del objeto sin su html.
+        """
+
+        data = {'name': 'lean content', 'user': self.user.id, 'slug': 'x', 'lean': '1'}
+        response = self.view_post_ajax(TCreateView, data=data)
+        assert response['success']
+        assert 'object' not in response and 'form' not in response
+        assert SomeContent.objects.filter(pk=response['pk']).exists()
+
+
+class TestViewConfig(TestBase):
+    def test_precomputed_config(self):
+        """
+        La configuración de la vista debe resolverse una vez en as_view y
+        respetar los métodos redefinidos.
+        """
+
+        class CustomTitleView(SomeView):
+            def get_title(self):
+                return 'custom'
+
+        config = SomeView.build_view_config({})
+        assert config['view_name'] == 'some-view'
+        assert config['app_name'] == 'common'
+        assert config['title'] == 'some-view'
+        assert config['templates']['atom'] == ['base/atom.xml']
+        assert 'json' in config['formats']
+
+        config = CustomTitleView.build_view_config({}, view_name='other')
+        assert config['view_name'] == 'other'
+        assert 'title' not in config
+
+        view = SomeView.as_view()
+        request = self.request_get('/')
+        self._anonymous_user(request)
+        response = simplejson.loads(view(request, format='json').content)
+        assert response['view_name'] == 'some-view'
+        assert response['title'] == 'some-view'
+
+
+class TDeleteView(DeleteView):
+    model = SomeContent
+
+
+class TestBulkDelete(TestBase):
+    def setUp(self):
+        super(TestBulkDelete, self).setUp()
+
+        self.other = User.objects.create(username='other')
+        self.own = [SomeContent.objects.create(name='own %s' % i, user=self.user)
+                    for i in range(3)]
+        self.foreign = SomeContent.objects.create(name='foreign', user=self.other)
+
+    def test_bulk_delete(self):
+        """
+        La vista debe eliminar en una sola petición todos los objetos del
+        usuario y reportar el resultado de cada uno.
+        """
+
+        pks = [content.pk for content in self.own] + [self.foreign.pk]
+        response = self.view_post_ajax(TDeleteView, data={'pks': pks},
+                                       username=self.username)
+
+        assert not response['success']
+        for content in self.own:
+            assert response['results'][str(content.pk)]
+        assert not response['results'][str(self.foreign.pk)]
+
+        assert not SomeContent.objects.filter(user=self.user).exists()
+        assert SomeContent.objects.filter(pk=self.foreign.pk).exists()
+
+    def test_bulk_delete_constant_queries(self):
+        """
+        La cantidad de consultas no debe depender de la cantidad de objetos.
+        """
+
+        def delete(pks):
+            return self.captured_queries(self.view_post_ajax, TDeleteView,
+                                         data={'pks': pks}, username=self.username)
+
+        few, response = delete([self.own[0].pk])
+        assert response['success']
+
+        many, response = delete([content.pk for content in self.own[1:]])
+        assert response['success']
+        assert len(few) == len(many)
+
+    def test_bulk_requires_opt_in(self):
+        """
+        Las vistas sin acciones en lote deben ignorar ``pks`` y verificar la
+        propiedad del objeto.
+        """
+
+        data = {'name': 'stolen', 'pks': [self.own[0].pk]}
+        response = self.view_post_ajax(TOwnerUpdateView, data=data,
+                                       pk=self.foreign.pk, username=self.username)
+        assert not response['success']
+        assert SomeContent.objects.get(pk=self.foreign.pk).name == 'foreign'
+
+    def test_invalid_pks(self):
+        """
+        Las llaves que no son enteros o que exceden el límite hacen fallar la
+        acción sin eliminar nada.
+        """
+
+        pks = [self.own[0].pk, 'x']
+        response = self.view_post_ajax(TDeleteView, data={'pks': pks},
+                                       username=self.username)
+        assert not response['success']
+        assert response['results'] == {}
+
+        class LimitedDeleteView(TDeleteView):
+            bulk_limit = 2
+
+        pks = [content.pk for content in self.own]
+        response = self.view_post_ajax(LimitedDeleteView, data={'pks': pks},
+                                       username=self.username)
+        assert not response['success']
+        assert SomeContent.objects.filter(user=self.user).count() == 3
+
+
+class TOwnerUpdateView(OwnerRequiredMixin, TUpdateView):
+    pass
+
+
+class TestRequestObjects(TestBase):
+    """
+    Verifica que cada objeto se carga una sola vez por petición.
+    """
+
+    #: Parte de la consulta que carga un contenido completo.
+    object_query = '"common_somecontent"."name", '
+
+    def setUp(self):
+        super(TestRequestObjects, self).setUp()
+        self.content = SomeContent.objects.create(name='memo', user=self.user)
+
+    def test_detail_view(self):
+        self.assertViewQueries(1, TContentDetailView, pk=self.content.pk,
+                               match=self.object_query)
+
+    def test_update_view(self):
+        self.assertViewQueries(1, TOwnerUpdateView, pk=self.content.pk,
+                               username=self.username, ajax=True,
+                               match=self.object_query)
+
+    def test_delete_view(self):
+        self.assertViewQueries(1, TDeleteView, pk=self.content.pk,
+                               username=self.username, ajax=True,
+                               method='post', match=self.object_query)
+        assert not SomeContent.objects.filter(pk=self.content.pk).exists()
+
+
+class TOwnerListView(OwnerListView):
+    view_name = 'owner-list-view'
+    app_name = 'common'
+    model = SomeContent
+
+    def get_context_data(self, **kwargs):
+        context = super(TOwnerListView, self).get_context_data(**kwargs)
+        context['pks'] = [content.pk for content in context.pop('object_list', [])]
+        return context
+
+
+class TCachedOwnerListView(TOwnerListView):
+    view_name = 'cached-owner-list-view'
+    cache_timeout = 60
+
+
+class TestOwnerScope(TestBase):
+    def setUp(self):
+        super(TestOwnerScope, self).setUp()
+
+        self.owner = User.objects.create(username='owner')
+        self.own = SomeContent.objects.create(name='own', user=self.user)
+        self.foreign = SomeContent.objects.create(name='foreign', user=self.owner)
+
+    def test_owner_checked_in_query(self):
+        """
+        La propiedad debe verificarse en la consulta que carga el objeto.
+        """
+
+        queries = self.view_queries(WithOwnerRequired, pk=self.foreign.pk,
+                                    username=self.username, ajax=True,
+                                    match='"common_somecontent"."user_id" = ')
+        assert len(queries) == 1
+
+        response = self.view_get_ajax(WithOwnerRequired, pk=self.foreign.pk,
+                                      username=self.username)
+        assert not response['success']
+
+    def test_owner_list(self):
+        """
+        La lista debe mostrar solo los objetos del usuario identificado.
+        """
+
+        response = self.view_get_ajax(TOwnerListView, username=self.username)
+        assert response['pks'] == [self.own.pk]
+
+        response = self.view_get(TOwnerListView)
+        assert response.status_code == 302
+
+        response = self.view_get_ajax(TOwnerListView)
+        assert not response['success']
+        assert response['redirect_url'].startswith(settings.LOGIN_URL)
+
+    def test_cached_owner_list(self):
+        """
+        La lista guardada en cache no se comparte entre usuarios ni con los
+        anónimos.
+        """
+
+        response = self.view_get_ajax(TCachedOwnerListView)
+        assert not response['success']
+
+        response = self.view_get_ajax(TCachedOwnerListView, username=self.username)
+        assert response['pks'] == [self.own.pk]
+
+        response = self.view_get_ajax(TCachedOwnerListView, username='owner')
+        assert response['pks'] == [self.foreign.pk]
+
+        response = self.view_get_ajax(TCachedOwnerListView, username=self.username)
+        assert response['pks'] == [self.own.pk]
+
+
+class TFieldsListView(TContentListView):
+    json_fields = ('name', 'published_at')
+
+
+class TFieldsDetailView(TContentDetailView):
+    json_fields = ('name', 'published_at')
+
+
+class TestSparseFields(TestBase):
+    def setUp(self):
+        super(TestSparseFields, self).setUp()
+        self.content = SomeContent.objects.create(name='sparse', user=self.user)
+
+    def test_list_fields(self):
+        """
+        La lista debe retornar y consultar solo los campos permitidos que se
+        pidieron.
+        """
+
+        response = self.view_get_ajax(TFieldsListView)
+        assert 'somecontent_list' not in response
+
+        data = {'fields': 'name,slug'}
+        response = self.view_get_ajax(TFieldsListView, data=data)
+        assert response['object_list'] == [{'id': self.content.pk, 'name': 'sparse'}]
+
+        queries = self.view_queries(TFieldsListView, data=data, ajax=True,
+                                    match='"common_somecontent"."name"')
+        assert queries
+        assert not [sql for sql in queries if '"common_somecontent"."slug"' in sql]
+
+    def test_feed_ignores_fields(self):
+        """
+        Los feeds no limitan las columnas de la consulta.
+        """
+
+        def requested_fields(format):
+            view = TFieldsListView()
+            view.request = self.request_get('/', data={'fields': 'name'})
+            view.args, view.kwargs = (), {'format': format}
+            return view.get_requested_fields()
+
+        assert requested_fields('json') == ['name']
+        assert requested_fields('atom') is None
+        assert requested_fields('rss') is None
+
+    def test_detail_fields(self):
+        """
+        El detalle debe retornar solo los campos pedidos.
+        """
+
+        response = self.view_get_ajax(TFieldsDetailView, pk=self.content.pk)
+        assert response['object']['name'] == 'sparse'
+        assert 'somecontent' not in response
+
+        response = self.view_get_ajax(TFieldsDetailView, data={'fields': 'name'},
+                                      pk=self.content.pk)
+        assert response['object'] == {'id': self.content.pk, 'name': 'sparse'}
+
+
+class TValuesListView(TStreamListView):
+    json_values = True
+
+
+class TestModelSerializer(TestBase):
+    def setUp(self):
+        super(TestModelSerializer, self).setUp()
+        self.content = SomeContent.objects.create(name='serialized', user=self.user)
+
+    def test_serialize(self):
+        """
+        El serializador debe emitir los campos, el id de las llaves foráneas
+        y la url absoluta.
+        """
+
+        from common.serializers import get_serializer
+
+        serializer = get_serializer(SomeContent)
+        assert serializer is get_serializer(SomeContent)
+
+        data = serializer.serialize(self.content)
+        assert data['id'] == self.content.pk
+        assert data['user_id'] == self.user.pk
+        assert data['slug'] == self.content.slug
+        assert data['url'] == self.content.get_absolute_url()
+
+        rows = list(serializer.iter_values(SomeContent.objects.all()))
+        assert rows[0]['name'] == 'serialized'
+        assert 'url' not in rows[0]
+
+    def test_encoder_fields(self):
+        """
+        El codificador json no debe incluir los campos excluidos, como la
+        contraseña de los usuarios, ni la url de los modelos que no la piden.
+        """
+
+        from common.serializers import get_serializer
+
+        data = simplejson.loads(encoders.dumps({'user': self.user,
+                                                'content': self.content}))
+        assert data['user']['username'] == self.user.username
+        assert 'password' not in data['user']
+        assert 'url' not in data['user']
+        assert data['content']['url'] == self.content.get_absolute_url()
+
+        data = get_serializer(User, ['username', 'password']).serialize(self.user)
+        assert data['password'] == self.user.password
+
+    def test_values_list_view(self):
+        """
+        La lista debe poder serializar sus filas sin crear instancias.
+        """
+
+        response = self.view_get(TValuesListView, format='ndjson')
+        row = simplejson.loads(response.content.strip())
+        assert row['name'] == 'serialized'
+        assert row['user_id'] == self.user.pk
+
+        response = self.view_get_ajax(TValuesListView)
+        assert response[0]['id'] == self.content.pk
+
+
+class TCompressedListView(TContentListView):
+    compress = True
+
+
+class TCompressedStreamListView(TStreamListView):
+    compress = True
+
+
+class TestCompression(TestBase):
+    def setUp(self):
+        super(TestCompression, self).setUp()
+
+        for i in range(50):
+            SomeContent.objects.create(name='compressed content %s' % i, user=self.user)
+
+    def get(self, view, encoding=None, **kwargs):
+        headers = {'HTTP_ACCEPT_ENCODING': encoding} if encoding else {}
+        request = self.request_get('/', **headers)
+        self._anonymous_user(request)
+        return self.call_view(view, request, **kwargs)
+
+    def test_negotiate_encoding(self):
+        from common.compression import negotiate_encoding
+
+        assert negotiate_encoding(self.request_get('/')) is None
+        request = self.request_get('/', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        assert negotiate_encoding(request) == 'gzip'
+        request = self.request_get('/', HTTP_ACCEPT_ENCODING='gzip;q=0, deflate')
+        assert negotiate_encoding(request) == 'deflate'
+        request = self.request_get('/', HTTP_ACCEPT_ENCODING='identity')
+        assert negotiate_encoding(request) is None
+
+    def test_compressed_responses(self):
+        """
+        Las respuestas deben comprimirse si el cliente lo acepta, también en
+        streaming.
+        """
+
+        import gzip
+        import zlib
+        from StringIO import StringIO
+
+        plain = self.get(TCompressedListView, format='json')
+        assert not plain.has_header('Content-Encoding')
+
+        response = self.get(TCompressedListView, 'gzip', format='json')
+        assert response['Content-Encoding'] == 'gzip'
+        assert 'Accept-Encoding' in response['Vary']
+        content = gzip.GzipFile(fileobj=StringIO(response.content)).read()
+        assert content == plain.content
+
+        plain = self.get(TCompressedStreamListView, format='ndjson')
+        response = self.get(TCompressedStreamListView, 'deflate', format='ndjson')
+        assert response['Content-Encoding'] == 'deflate'
+        assert zlib.decompress(response.content) == plain.content
+
+    def test_compression_disabled(self):
+        """
+        Las vistas no comprimen si no lo habilitan.
+        """
+
+        response = self.get(TContentListView, 'gzip', format='json')
+        assert not response.has_header('Content-Encoding')
+
+    def test_not_rendered_without_encoding(self):
+        """
+        Si el cliente no acepta compresión la respuesta se renderiza fuera de
+        la vista.
+        """
+
+        request = self.request_get('/')
+        self._anonymous_user(request)
+        response = TCompressedListView.as_view()(request, format='html')
+        assert not response.is_rendered
+        assert 'Accept-Encoding' in response['Vary']
+
+    def test_compressed_etag(self):
+        """
+        La respuesta comprimida debe tener un etag débil que sigue validando
+        las peticiones condicionales.
+        """
+
+        plain = self.get(TCompressedListView, format='json')
+        assert not plain['ETag'].startswith('W/')
+        assert 'Accept-Encoding' in plain['Vary']
+
+        response = self.get(TCompressedListView, 'gzip', format='json')
+        assert response['ETag'] == 'W/' + plain['ETag']
+
+        request = self.request_get('/', HTTP_ACCEPT_ENCODING='gzip',
+                                   HTTP_IF_NONE_MATCH=response['ETag'])
+        self._anonymous_user(request)
+        assert self.call_view(TCompressedListView, request, format='json').status_code == 304
+
+
+class TestMsgpack(TestBase):
+    def setUp(self):
+        super(TestMsgpack, self).setUp()
+
+        for i in range(5):
+            SomeContent.objects.create(name=u'contenido msgpack %s' % i, user=self.user)
+
+    def get(self, view, accept=None, **kwargs):
+        headers = {'HTTP_ACCEPT': accept} if accept else {}
+        request = self.request_get('/', **headers)
+        self._anonymous_user(request)
+        return self.call_view(view, request, **kwargs)
+
+    def test_pack_unpack(self):
+        from common import packing
+
+        value = {u'none': None, u'bool': [True, False], u'text': u'ñandú' * 20,
+                 u'ints': [0, 127, 128, -1, -33, 70000, -70000, 2 ** 40],
+                 u'float': 1.5, u'list': range(20)}
+        assert packing.unpackb(packing.packb(value)) == value
+        self.assertRaises(packing.UnpackError, packing.unpackb, '\x92\x01')
+
+    def test_list_response(self):
+        """
+        La respuesta msgpack debe tener los mismos datos que la respuesta json,
+        pedida por la url o por la cabecera Accept.
+        """
+
+        from common import packing
+
+        json_response = self.get(TContentListView, format='json')
+        data = simplejson.loads(json_response.content)
+
+        response = self.get(TContentListView, format='msgpack')
+        assert response['Content-Type'].startswith(packing.MIMETYPE)
+        assert packing.unpackb(response.content) == data
+
+        response = self.get(TContentListView, accept=packing.MIMETYPE)
+        assert response['Content-Type'].startswith(packing.MIMETYPE)
+        assert packing.unpackb(response.content) == data
+
+        response = self.get(TContentListView, accept='text/html')
+        assert response['Content-Type'].startswith('text/html')
+
+    def test_vary_accept(self):
+        """
+        Las respuestas cuyo formato se eligió por la cabecera Accept deben
+        variar según ella.
+        """
+
+        from common import packing
+
+        response = self.get(TContentListView, accept=packing.MIMETYPE)
+        assert 'Accept' in [value.strip() for value in response['Vary'].split(',')]
+
+        response = self.get(TContentListView, accept='text/html')
+        assert 'Accept' in [value.strip() for value in response['Vary'].split(',')]
+
+        response = self.get(TContentListView, format='json')
+        assert 'Accept' not in [value.strip() for value in
+                                response.get('Vary', '').split(',')]
+
+
+class TestServerTiming(TestBase):
+    def setUp(self):
+        super(TestServerTiming, self).setUp()
+        SomeContent.objects.create(name='timed content', user=self.user)
+
+    def get(self, view, **kwargs):
+        request = self.request_get('/')
+        self._anonymous_user(request)
+        return self.call_view(view, request, **kwargs)
+
+    def test_nested_phases(self):
+        from common.timing import Timer
+
+        timer = Timer()
+        with timer.phase('context'):
+            with timer.phase('queryset'):
+                pass
+        timer.start('render')
+        timer.stop('context')
+        timer.stop('render')
+
+        assert timer.names == ['context', 'queryset', 'render']
+        assert 'total;dur=' in timer.header()
+
+    def test_disabled(self):
+        response = self.get(TContentListView, format='json')
+        assert not response.has_header('Server-Timing')
+
+    def test_server_timing_header(self):
+        class TimedListView(TContentListView):
+            server_timing = True
+
+        response = self.get(TimedListView, format='json')
+        metrics = [metric.split(';')[0] for metric in
+                   response['Server-Timing'].split(', ')]
+        for name in ('validators', 'queryset', 'context', 'encode', 'total'):
+            assert name in metrics, metrics
+
+        response = self.get(TimedListView, format='html')
+        assert 'render;dur=' in response['Server-Timing']
+
+    def test_timing_log(self):
+        records = []
+
+        class Handler(logging.Handler):
+            def emit(self, record):
+                records.append(record)
+
+        handler = Handler()
+        logger = logging.getLogger('common.tests.timing')
+        logger.addHandler(handler)
+
+        class LoggedDetailView(TContentDetailView):
+            timing_logger = 'common.tests.timing'
+
+        try:
+            content = SomeContent.objects.get(name='timed content')
+            response = self.get(LoggedDetailView, format='json', pk=content.pk)
+        finally:
+            logger.removeHandler(handler)
+
+        assert not response.has_header('Server-Timing')
+        assert len(records) == 1
+        assert records[0].app_name == 'common'
+        assert records[0].view_name == 'content-detail-view'
+        assert 'object' in records[0].timings
+        assert 'total' in records[0].timings
+
+
+class TProfiledListView(TContentListView):
+    profile_queries = True
+
+    def get_context_data(self, **kwargs):
+        context = super(TProfiledListView, self).get_context_data(**kwargs)
+        context['owners'] = [obj.user.username for obj in context['object_list']]
+        return context
+
+
+class TestQueryProfiler(TestBase):
+    def setUp(self):
+        super(TestQueryProfiler, self).setUp()
+
+        from common import profiling
+        profiling.reset_stats()
+
+        for i in range(5):
+            SomeContent.objects.create(name='profiled %s' % i, user=self.user)
+
+    def test_query_shape(self):
+        from common.profiling import query_shape
+
+        assert query_shape('SELECT * FROM t WHERE id IN (%s, %s, %s)') == \
+               query_shape('SELECT *  FROM t\nWHERE id IN (%s)')
+
+    def test_view_stats(self):
+        """
+        Las consultas de la vista se acumulan por vista y la consulta del
+        usuario de cada objeto se detecta como N+1.
+        """
+
+        from common import profiling
+
+        for i in range(2):
+            request = self.request_get('/')
+            self._anonymous_user(request)
+            self.call_view(TProfiledListView, request, format='json')
+
+        stats = profiling.get_stats()
+        assert len(stats) == 1
+        stats = stats[0]
+        assert (stats['app_name'], stats['view_name']) == \
+               ('common', 'content-list-view')
+        assert stats['requests'] == 2
+        assert stats['max_queries'] >= 5
+        assert stats['slowest']
+
+        shapes = [shape for shape in stats['repeated'] if 'auth_user' in shape]
+        assert len(shapes) == 1
+        assert stats['repeated'][shapes[0]] == {'requests': 2, 'max_count': 5}
+
+        profiling.reset_stats()
+        assert profiling.get_stats() == []
+
+
+class TestModelFormClass(TestBase):
+    def test_cached_form_class(self):
+        from common.views import get_modelform_class
+
+        view = TCreateView()
+        view.object = None
+        form_class = view.get_form_class()
+        assert form_class is view.get_form_class()
+        assert form_class is get_modelform_class(SomeContent)
+
+        class NameCreateView(TCreateView):
+            form_fields = ['name']
+            form_widgets = {'name': forms.Textarea}
+
+        view = NameCreateView()
+        view.object = None
+        form = view.get_form_class()()
+        assert form.fields.keys() == ['name']
+        assert isinstance(form.fields['name'].widget, forms.Textarea)
+        assert view.get_form_class() is not form_class
+
+        view.cache_form_class = False
+        assert view.get_form_class() is not view.get_form_class()
+
+
+class TestContentImport(TestBase):
+    def test_import_csv(self):
+        """
+        Las filas válidas se crean por lotes con slugs únicos y las inválidas
+        se reportan.
+        """
+
+        from StringIO import StringIO
+        from common.importer import import_file
+
+        lines = ['name,user_id']
+        lines += ['Imported content,' for i in range(120)]
+        lines += [',', 'Unknown user,9999']
+        stream = StringIO('\n'.join(lines) + '\n')
+
+        progress = []
+        result = import_file(SomeContent, stream, format='csv', user=self.user,
+                             batch_size=50, progress=lambda r: progress.append(r['rows']))
+
+        assert progress == [50, 100, 122]
+        assert result['created'] == 120
+        assert result['invalid'] == 2
+        assert [line for line, errors in result['errors']] == [121, 122]
+
+        slugs = set(SomeContent.objects.values_list('slug', flat=True))
+        assert len(slugs) == 120
+        assert 'imported-content' in slugs and 'imported-content-120' in slugs
+        assert SomeContent.objects.filter(user=self.user).count() == 120
+
+    def test_import_jsonl_queries(self):
+        """
+        Cada lote ejecuta un número constante de consultas.
+        """
+
+        from StringIO import StringIO
+        from common.importer import import_file
+
+        def run(rows):
+            stream = StringIO('\n'.join('{"name": "jsonl %s", "user": %s}'
+                                        % (i, self.user.id) for i in range(rows)))
+            import_file(SomeContent, stream, format='jsonl', batch_size=rows)
+
+        few, result = self.captured_queries(run, 10)
+        many, result = self.captured_queries(run, 100)
+        assert len(few) == len(many)
+
+    def test_import_jsonl_invalid_lines(self):
+        """
+        Las líneas que no son json o no son un objeto se reportan como
+        inválidas sin interrumpir la importación.
+        """
+
+        from StringIO import StringIO
+        from common.importer import import_file
+
+        lines = ['{"name": "first"}', '{"name": ', '[1, 2]', '{"name": "last"}']
+        result = import_file(SomeContent, StringIO('\n'.join(lines)),
+                             format='jsonl', user=self.user, batch_size=2)
+
+        assert result['rows'] == 4
+        assert result['created'] == 2
+        assert result['invalid'] == 2
+        assert [line for line, errors in result['errors']] == [2, 3]
+        assert set(SomeContent.objects.values_list('name', flat=True)) == \
+               set(['first', 'last'])
+
+    def test_import_keeps_dates(self):
+        """
+        Las fechas de creación y publicación de la fila se conservan y las
+        que faltan toman la fecha de la importación.
+        """
+
+        import datetime
+        from common.importer import import_contents
+
+        rows = [{'name': 'old', 'created_at': '2010-05-01 10:00:00',
+                 'published_at': '2010-05-02 11:30:00'},
+                {'name': 'new'}]
+        result = import_contents(SomeContent, rows, user=self.user)
+        assert result['created'] == 2
+
+        old = SomeContent.objects.get(name='old')
+        assert old.created_at == datetime.datetime(2010, 5, 1, 10, 0)
+        assert old.published_at == datetime.datetime(2010, 5, 2, 11, 30)
+        assert old.updated_at.year > 2010
+
+        new = SomeContent.objects.get(name='new')
+        assert new.created_at.year > 2010
+
+
+class TestContentIndexes(TestBase):
+    def test_index_sql(self):
+        from django.db import connection
+        from common.indexes import index_sql
+
+        statements = index_sql(SomeContent, connection)
+        assert len(statements) == 4
+        assert statements[0].startswith('CREATE UNIQUE INDEX')
+        assert '"user_id", "slug"' in index_sql(SomeContent, connection,
+                                                slug_per_owner=True)[0]
+
+    def test_unique_slug_retry(self):
+        """
+        Si otro contenido toma el slug antes de guardar, la restricción única
+        lo rechaza y el contenido se guarda con otro slug.
+        """
+
+        import datetime
+        from django.db import IntegrityError
+
+        SomeContent.objects.create(name='Race', user=self.user)
+
+        now = datetime.datetime.now()
+        duplicate = SomeContent(name='x', slug='race', user=self.user,
+                created_at=now, updated_at=now, published_at=now)
+        self.assertRaises(IntegrityError, lambda: duplicate.save_base(raw=True))
+
+        content = SomeContent(name='Race', user=self.user)
+        allocate = content.allocate_slug
+        calls = []
+
+        def allocate_taken():
+            calls.append(True)
+            if len(calls) == 1:
+                content.slug = 'race'
+            else:
+                allocate()
+
+        content.allocate_slug = allocate_taken
+        content.save()
+
+        assert len(calls) == 2
+        assert content.slug == 'race-2'
+
+
+class SearchableContent(Content):
+    def get_absolute_url(self):
+        return '/searchable/%s' % self.slug
+
+search.register(SearchableContent, fields=('name',))
+
+
+class TSearchView(SearchView):
+    view_name = 'search-view'
+    app_name = 'common'
+    model = SearchableContent
+    paginate_by = 2
+
+
+class TFilteredSearchView(TSearchView):
+    queryset = SearchableContent.objects.exclude(name=u'Cuna cuna cuna')
+
+
+class TestSearch(TestBase):
+    def setUp(self):
+        super(TestSearch, self).setUp()
+
+        for name in (u'Canción de cuna', u'Cuna de gato', u'Gato con botas',
+                     u'Cuna cuna cuna'):
+            SearchableContent.objects.create(name=name, user=self.user)
+
+    def search(self, query):
+        return [SearchableContent.objects.get(pk=pk).name
+                for pk, score in search.search(SearchableContent, query)]
+
+    def test_tokenize(self):
+        assert search.tokenize(u'¡Canción  de CUNA!') == [u'cancion', u'de', u'cuna']
+
+    def test_index_updates(self):
+        """
+        El índice se actualiza al crear, modificar y eliminar contenidos.
+        """
+
+        assert self.search(u'cuna')[0] == u'Cuna cuna cuna'
+        assert set(self.search(u'cuna')) == set([u'Canción de cuna',
+                u'Cuna de gato', u'Cuna cuna cuna'])
+        assert self.search(u'gato cuna') == [u'Cuna de gato']
+        assert self.search(u'cancion') == [u'Canción de cuna']
+        assert self.search(u'perro') == []
+
+        content = SearchableContent.objects.get(name=u'Gato con botas')
+        content.name = u'Perro con botas'
+        content.save()
+        assert self.search(u'perro') == [u'Perro con botas']
+        assert self.search(u'gato') == [u'Cuna de gato']
+
+        content.delete()
+        assert self.search(u'botas') == []
+
+    def test_search_view(self):
+        response = self.view_get(TSearchView, data={'q': 'cuna'}, format='json')
+        data = simplejson.loads(response.content)
+
+        assert data['query'] == u'cuna'
+        assert len(data['object_list']) == 2
+        assert data['object_list'][0]['name'] == u'Cuna cuna cuna'
+        assert data['next'] == 2
+
+        response = self.view_get(TSearchView, data={'q': 'cuna'}, format='html')
+        assert response.status_code == 200
+        assert u'Cuna cuna cuna' in response.content.decode('utf-8')
+
+    def test_search_view_pagination(self):
+        """
+        Los enlaces de la paginación conservan el texto buscado.
+        """
+
+        response = self.view_get(TSearchView, data={'q': 'cuna'}, format='html')
+        assert 'href="?q=cuna&amp;page=2"' in response.content
+
+        response = self.view_get(TSearchView, data={'q': 'cuna', 'page': 2},
+                                 format='html')
+        assert response.status_code == 200
+        assert 'href="?q=cuna&amp;page=1"' in response.content
+
+    def test_search_view_filtered(self):
+        """
+        El queryset de la vista se aplica en la búsqueda, las páginas y el
+        total no cuentan los objetos excluidos.
+        """
+
+        response = self.view_get(TFilteredSearchView, data={'q': 'cuna'}, format='json')
+        data = simplejson.loads(response.content)
+
+        names = [obj['name'] for obj in data['object_list']]
+        assert set(names) == set([u'Canción de cuna', u'Cuna de gato'])
+        assert not data.get('next')
+
+        queryset = SearchableContent.objects.filter(name__startswith=u'Cuna')
+        ranked = search.search(SearchableContent, u'cuna', limit=1, queryset=queryset)
+        assert len(ranked) == 1
+        assert SearchableContent.objects.get(pk=ranked[0][0]).name == u'Cuna cuna cuna'
+
+    def test_index_error_does_not_fail_save(self):
+        """
+        Un error del índice se registra en el log sin hacer fallar el guardado.
+        """
+
+        def index_object(obj, using=None):
+            raise DatabaseError('no such table')
+
+        original = search.index_object
+        search.index_object = index_object
+        try:
+            content = SearchableContent.objects.create(name=u'Perro sin índice',
+                                                       user=self.user)
+        finally:
+            search.index_object = original
+
+        assert SearchableContent.objects.filter(pk=content.pk).exists()
+        assert self.search(u'perro') == []
+
+    def test_bulk_created_indexed(self):
+        SearchableContent.create_in_bulk([SearchableContent(name=u'Bulk gato %s' % i,
+                                          user=self.user) for i in range(3)])
+        assert len(self.search(u'bulk gato')) == 3
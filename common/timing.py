@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+# Copyright 2012 Mandla Web Studio
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+__author__ = 'Jose Maria Zambrana Arze'
+__email__ = 'contact@josezambrana.com'
+__version__ = '0.1'
+__copyright__ = 'Copyright 2012, Mandla Web Studio'
+
+
+import logging
+
+from time import time
+from functools import update_wrapper
+
+from django.conf import settings
+
+
+#: Si las vistas envían los tiempos de cada fase en la cabecera
+#: ``Server-Timing``.
+SERVER_TIMING = getattr(settings, 'COMMON_SERVER_TIMING', False)
+
+#: Nombre del logger que recibe un registro por petición con los tiempos de
+#: cada fase. None desactiva el registro.
+TIMING_LOGGER = getattr(settings, 'COMMON_TIMING_LOGGER', None)
+
+
+class _NullPhase(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+class NullTimer(object):
+    """
+    Cronómetro que no mide nada. Es el que reciben las vistas cuando la
+    medición está desactivada, así cada fase solo cuesta una llamada.
+    """
+
+    enabled = False
+
+    _phase = _NullPhase()
+
+    def start(self, name):
+        pass
+
+    def stop(self, name):
+        pass
+
+    def phase(self, name):
+        return self._phase
+
+
+NULL_TIMER = NullTimer()
+
+
+class _Phase(object):
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.timer.start(self.name)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.timer.stop(self.name)
+        return False
+
+
+class Timer(object):
+    """
+    Acumula la duración de las fases de una petición. Las fases se pueden
+    anidar y cada una registra solo su tiempo propio, sin el de las fases
+    que contiene.
+    """
+
+    enabled = True
+
+    def __init__(self):
+        self.started = time()
+        self.durations = {}
+        self.names = []
+        self._stack = []
+
+    def _add(self, name, duration):
+        if name not in self.durations:
+            self.durations[name] = 0.0
+            self.names.append(name)
+        self.durations[name] += duration
+
+    def start(self, name):
+        """
+        Inicia la fase *name* y pausa la fase que la contiene.
+        """
+
+        now = time()
+        if self._stack:
+            parent = self._stack[-1]
+            self._add(parent[0], now - parent[1])
+        self._stack.append([name, now])
+
+    def stop(self, name):
+        """
+        Termina la fase *name*, y las que sigan abiertas dentro de ella, y
+        reanuda la fase que la contiene. No hace nada si la fase no esta
+        abierta.
+        """
+
+        if name not in [phase[0] for phase in self._stack]:
+            return
+
+        now = time()
+        while True:
+            current, started = self._stack.pop()
+            self._add(current, now - started)
+            if current == name:
+                break
+
+        if self._stack:
+            self._stack[-1][1] = now
+
+    def phase(self, name):
+        """
+        Retorna un context manager que mide la fase *name*.
+        """
+
+        return _Phase(self, name)
+
+    def total(self):
+        """
+        Retorna los segundos transcurridos desde que se creó el cronómetro.
+        """
+
+        return time() - self.started
+
+    def header(self, total=None):
+        """
+        Retorna el valor de la cabecera ``Server-Timing`` en milisegundos.
+        """
+
+        if total is None:
+            total = self.total()
+
+        metrics = ['%s;dur=%.1f' % (name, self.durations[name] * 1000)
+                   for name in self.names]
+        metrics.append('total;dur=%.1f' % (total * 1000))
+        return ', '.join(metrics)
+
+
+def get_timer(request):
+    """
+    Retorna el cronómetro de la petición *request* o uno que no mide nada
+    si la vista no tiene la medición habilitada.
+    """
+
+    return request.__dict__.get('_common_timer', NULL_TIMER)
+
+
+def start_timer(request):
+    """
+    Crea el cronómetro de la petición *request*.
+    """
+
+    timer = request.__dict__['_common_timer'] = Timer()
+    return timer
+
+
+def finish_timer(request, response, app_name, view_name, header=True,
+                 logger=None):
+    """
+    Termina las fases abiertas de la petición, añade la cabecera
+    ``Server-Timing`` a *response* si *header* es True y envía los tiempos
+    al logger *logger* etiquetados con *app_name* y *view_name*.
+    """
+
+    timer = request.__dict__.pop('_common_timer', None)
+    if timer is None:
+        return response
+
+    while timer._stack:
+        timer.stop(timer._stack[-1][0])
+
+    total = timer.total()
+
+    if header:
+        response['Server-Timing'] = timer.header(total)
+
+    if logger is not None:
+        timings = dict((name, round(duration * 1000, 1))
+                       for name, duration in timer.durations.items())
+        timings['total'] = round(total * 1000, 1)
+
+        logging.getLogger(logger).info('%s:%s %s', app_name, view_name,
+                timer.header(total), extra={
+                    'app_name': app_name,
+                    'view_name': view_name,
+                    'status_code': response.status_code,
+                    'timings': timings,
+                })
+
+    return response
+
+
+def timed_view(view, app_name, view_name, header=True, logger=None):
+    """
+    Retorna la vista *view* midiendo las fases de cada petición.
+    """
+
+    def timed(request, *args, **kwargs):
+        start_timer(request)
+        response = view(request, *args, **kwargs)
+        return finish_timer(request, response, app_name, view_name,
+                            header=header, logger=logger)
+
+    return update_wrapper(timed, view)
@@ -21,9 +21,18 @@ __copyright__ = 'Copyright 2012, Mandla Web Studio'
 
 
 import uuid
+import hashlib
 import logging
 
 from time import time
+from calendar import timegm
+
+from django.db.models.query import QuerySet
+from django.db.models.query import ValuesQuerySet, ValuesListQuerySet
+from django.utils.http import http_date, parse_http_date_safe
+from django.utils.http import parse_etags, quote_etag
+
+from common.paginator import keyset_ordering, seek
 
   
 _generate_uuid = lambda: uuid.uuid4().hex
@@ -64,3 +73,157 @@ def log_time(message, clean=False, indent=2, initial=None,
     return message
 
 
+def keyset_values(object_list, fields):
+    """
+    Retorna una función que obtiene los valores de *fields* de cada elemento
+    de *object_list* (instancias, diccionarios o tuplas), o None si los
+    elementos no los incluyen.
+    """
+
+    if isinstance(object_list, ValuesQuerySet):
+        opts = object_list.model._meta
+        names = list(object_list._fields) or [f.attname for f in opts.fields]
+        if [name for name in fields if name not in names]:
+            return None
+
+        if not isinstance(object_list, ValuesListQuerySet):
+            return lambda item: [item[name] for name in fields]
+
+        if object_list.flat:
+            return lambda item: [item]
+
+        indexes = [names.index(name) for name in fields]
+        return lambda item: [item[index] for index in indexes]
+
+    return lambda item: [getattr(item, name) for name in fields]
+
+
+def chunked_iterator(object_list, chunk_size=500, key=None):
+    """
+    Recorre *object_list* por bloques de *chunk_size* elementos para no cargar
+    en memoria todas las filas al mismo tiempo.
+
+    Los querysets sin límites se recorren por llave (``WHERE (orden) > último``)
+    para que el costo de cada bloque sea constante y las filas no se desplacen
+    si la tabla cambia: por llave primaria si no tienen orden, o por los
+    campos de su orden terminados en la llave primaria. *key* retorna la llave
+    primaria de cada elemento, por defecto ``pk``.
+
+    Los querysets con límites, los ordenados por relaciones, expresiones o
+    campos que aceptan NULL, y los ``values`` que no incluyen los campos del
+    orden se recorren por porciones con OFFSET: el costo de cada bloque crece
+    con la posición y una fila insertada o eliminada durante el recorrido
+    puede repetirse u omitirse.
+    """
+
+    key = key or (lambda item: item.pk)
+
+    if isinstance(object_list, QuerySet):
+        query = object_list.query
+        sliced = query.low_mark or query.high_mark is not None
+
+        if not sliced and not object_list.ordered:
+            last_pk = None
+            while True:
+                chunk = object_list.order_by('pk')
+                if last_pk is not None:
+                    chunk = chunk.filter(pk__gt=last_pk)
+
+                count = 0
+                for item in chunk[:chunk_size].iterator():
+                    count += 1
+                    last_pk = key(item)
+                    yield item
+
+                if count < chunk_size:
+                    return
+
+        ordering = None if sliced else keyset_ordering(object_list)
+        if ordering is not None:
+            get_values = keyset_values(object_list,
+                                       [name.lstrip('-') for name in ordering])
+            if get_values is None:
+                ordering = None
+
+        if ordering is not None:
+            queryset = object_list.order_by(*ordering)
+            values = None
+            while True:
+                chunk = queryset
+                if values is not None:
+                    chunk = seek(queryset, ordering, values)
+
+                count = 0
+                for item in chunk[:chunk_size].iterator():
+                    count += 1
+                    last = item
+                    yield item
+
+                if count < chunk_size:
+                    return
+
+                values = get_values(last)
+
+    start = 0
+    while True:
+        chunk = object_list[start:start + chunk_size]
+        if isinstance(chunk, QuerySet):
+            chunk = chunk.iterator()
+
+        count = 0
+        for item in chunk:
+            count += 1
+            yield item
+
+        if count < chunk_size:
+            return
+
+        start += chunk_size
+
+
+def make_etag(*parts):
+    """
+    Retorna un etag a partir de las partes que identifican la representación
+    de un recurso.
+    """
+
+    return hashlib.md5(repr(parts)).hexdigest()
+
+
+def is_not_modified(request, etag=None, last_modified=None, require_etag=False):
+    """
+    Retorna True si el cliente ya tiene la versión actual del recurso de
+    acuerdo a las cabeceras ``If-None-Match`` e ``If-Modified-Since``. Con
+    *require_etag* la fecha no basta cuando el recurso tiene etag.
+    """
+
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match and etag is not None:
+        etags = parse_etags(if_none_match)
+        return '*' in etags or etag in etags
+
+    if require_etag and etag is not None:
+        return False
+
+    if_modified_since = request.META.get('HTTP_IF_MODIFIED_SINCE')
+    if if_modified_since and last_modified is not None:
+        if_modified_since = parse_http_date_safe(if_modified_since)
+        if if_modified_since is not None:
+            return timegm(last_modified.utctimetuple()) <= if_modified_since
+
+    return False
+
+
+def set_validators(response, etag=None, last_modified=None):
+    """
+    Añade las cabeceras ``ETag`` y ``Last-Modified`` a la respuesta.
+    """
+
+    if etag is not None and not response.has_header('ETag'):
+        response['ETag'] = quote_etag(etag)
+
+    if last_modified is not None and not response.has_header('Last-Modified'):
+        response['Last-Modified'] = http_date(timegm(last_modified.utctimetuple()))
+
+    return response
+
@@ -23,6 +23,7 @@ __copyright__ = 'Copyright 2012, Mandla Web Studio'
 import logging
 
 from django.conf import settings
+from django.contrib.sites.models import Site
 from django.core.urlresolvers import reverse, resolve
 from django.core.exceptions import ImproperlyConfigured
 from django.contrib.auth import REDIRECT_FIELD_NAME
@@ -46,22 +47,76 @@ from django.views.generic.edit import FormMixin
 from django.views.generic.edit import ProcessFormView
 from django.views.generic.edit import BaseFormView
 
-from django.utils import simplejson as json
 from django.utils.translation import ugettext_lazy as _
+from django.utils.translation import get_language
 from django.http import HttpResponse
+from django.http import HttpResponseNotModified
+from django.db import transaction
+from django.db.models import Count, Max
+from django.db.models.query import QuerySet
+from django.db.models.fields import FieldDoesNotExist
 
 from django.shortcuts import redirect
+from django.utils.cache import patch_vary_headers
+
+from common import encoders
+from common import compression
+from common import feeds
+from common import packing
+from common import profiling
+from common import search
+from common import timing
+from common import cache as response_cache
+from common.serializers import get_serializer
+from common.paginator import CursorPaginator, CursorPage, InvalidCursor
+from common.paginator import NoCountPaginator
+from common.util import chunked_iterator
+from common.util import make_etag, is_not_modified, set_validators
 
 
 MIMES = {
     'html': 'text/html',
     'xhtml': 'text/html',
     'json': 'application/json',
+    'msgpack': packing.MIMETYPE,
+    'ndjson': 'application/x-ndjson',
     'atom': 'application/atom+xml',
+    'rss': 'application/rss+xml',
     'xml': 'application/xml'
 }
 
 
+def is_streaming(response):
+    """
+    Retorna True si el contenido de *response* se genera a medida que se
+    envía.
+    """
+
+    return getattr(response, 'streaming', False) or \
+           not getattr(response, '_is_string', True)
+
+
+def inherits_method(cls, name, base):
+    """
+    Retorna True si *cls* utiliza el método *name* definido en *base* sin
+    redefinirlo.
+    """
+
+    return getattr(cls, name).im_func is base.__dict__[name]
+
+
+def has_field(model, name):
+    """
+    Retorna True si *model* tiene un campo llamado *name*.
+    """
+
+    try:
+        model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return False
+    return True
+
+
 class TemplateView(DjangoTemplateView):
     def get_context_data(self, **kwargs):
         return kwargs
@@ -83,10 +138,296 @@ class MultipleFormatResponseMixin(TemplateResponseMixin):
         'html': 'base/base.html',
     }
 
+    #: Formatos que se generan sin template a partir del contexto
+    data_formats = ('json', 'msgpack')
+    #: Formatos que serializan el contexto tal cual, sin fragmentos de la
+    #: petición ni del usuario.
+    context_formats = ('json', 'msgpack')
+    #: Formatos que se pueden pedir con la cabecera Accept cuando la url no
+    #: define el formato.
+    accept_formats = ('msgpack',)
+    #: Si el formato de la respuesta se eligió según la cabecera Accept.
+    negotiated_format = False
+
     #: Determina si se tiene que redireccionar.
     redirect = None
     #: La url donde se tiene que redireccionar.
     redirect_url = None
+
+    #: Segundos que se guarda la respuesta en cache, None desactiva el cache.
+    cache_timeout = None
+    #: Modelos que invalidan la respuesta guardada al cambiar. Por defecto el
+    #: modelo de la vista.
+    cache_models = None
+    #: Si la respuesta guardada depende del usuario identificado. Con None se
+    #: guarda una respuesta por usuario identificado y, para los anónimos,
+    #: una por usuario en los formatos que se renderizan con un template y
+    #: una sola en los formatos de ``context_formats``.
+    cache_per_user = None
+
+    #: Si solo se responde 304 cuando coincide el etag. La fecha de
+    #: modificación de una lista no cambia cuando se eliminan objetos.
+    require_etag = False
+
+    #: Si la respuesta se comprime cuando el cliente lo acepta. Solo las
+    #: respuestas comprimidas se renderizan dentro de la vista.
+    compress = False
+    #: Tamaño mínimo en bytes de las respuestas que se comprimen.
+    compress_min_size = 1024
+    #: Nivel de compresión de zlib, de 1 (rápido) a 9 (pequeño).
+    compress_level = 6
+
+    #: Si la configuración de la vista se resuelve una sola vez en as_view.
+    precompute_config = True
+    #: Configuración resuelta en as_view, compartida por todas las peticiones.
+    _view_config = None
+
+    #: Si la respuesta incluye la cabecera Server-Timing con el tiempo de
+    #: cada fase de la petición.
+    server_timing = timing.SERVER_TIMING
+    #: Nombre del logger que recibe los tiempos de cada petición, None lo
+    #: desactiva.
+    timing_logger = timing.TIMING_LOGGER
+    #: Si se registran las consultas sql de cada petición en las
+    #: estadísticas por vista de ``common.profiling``.
+    profile_queries = profiling.PROFILE_QUERIES
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        """
+        Resuelve la configuración de la vista antes de crear la función que
+        atiende las peticiones, así cada petición solo consulta un
+        diccionario.
+        """
+
+        if initkwargs.get('precompute_config', cls.precompute_config):
+            initkwargs['_view_config'] = cls.build_view_config({}, **initkwargs)
+
+        view = super(MultipleFormatResponseMixin, cls).as_view(**initkwargs)
+
+        server_timing = initkwargs.get('server_timing', cls.server_timing)
+        timing_logger = initkwargs.get('timing_logger', cls.timing_logger)
+        profile_queries = initkwargs.get('profile_queries', cls.profile_queries)
+        if not server_timing and timing_logger is None and not profile_queries:
+            return view
+
+        config = initkwargs.get('_view_config') or {}
+        app_name = config.get('app_name',
+                initkwargs.get('app_name', getattr(cls, 'app_name', None)))
+        view_name = config.get('view_name',
+                initkwargs.get('view_name', getattr(cls, 'view_name', None)))
+
+        if profile_queries:
+            view = profiling.profiled_view(view, app_name, view_name)
+
+        if server_timing or timing_logger is not None:
+            view = timing.timed_view(view, app_name, view_name,
+                                     header=server_timing, logger=timing_logger)
+
+        return view
+
+    @classmethod
+    def build_view_config(cls, config, **initkwargs):
+        """
+        Añade a *config* los templates por formato y los formatos permitidos,
+        si la clase no redefine los métodos que los calculan.
+        """
+
+        parent = super(MultipleFormatResponseMixin, cls)
+        if hasattr(parent, 'build_view_config'):
+            config = parent.build_view_config(config, **initkwargs)
+
+        templates = initkwargs.get('templates', cls.templates)
+        data_formats = initkwargs.get('data_formats', cls.data_formats)
+
+        if inherits_method(cls, 'get_template_names', MultipleFormatResponseMixin):
+            config['templates'] = dict((format, [template])
+                                       for format, template in templates.items())
+
+        if inherits_method(cls, 'get_format', MultipleFormatResponseMixin):
+            config['formats'] = frozenset(templates) | frozenset(data_formats)
+
+        return config
+
+    def dispatch(self, request, *args, **kwargs):
+        """
+        Despacha la petición respondiendo 304 si el cliente tiene la versión
+        actual o utilizando la respuesta guardada en cache si la vista lo
+        tiene habilitado, y comprime la respuesta si el cliente lo acepta.
+        """
+
+        self.request = request
+        self.args = args
+        self.kwargs = kwargs
+
+        timer = self.get_timer()
+
+        if request.method not in ('GET', 'HEAD'):
+            timer.start('context')
+            response = super(MultipleFormatResponseMixin, self).dispatch(request, *args, **kwargs)
+            timer.stop('context')
+            return self.compress_response(self.render_response(response))
+
+        with timer.phase('validators'):
+            etag, last_modified = self.get_validators()
+        if is_not_modified(request, etag, last_modified, self.require_etag):
+            return self.patch_vary(set_validators(HttpResponseNotModified(),
+                                                  etag, last_modified))
+
+        timer.start('context')
+        if self.cache_timeout is None:
+            response = super(MultipleFormatResponseMixin, self).dispatch(request, *args, **kwargs)
+        else:
+            response = self.cached_dispatch(request, *args, **kwargs)
+        timer.stop('context')
+
+        if response.status_code == 200:
+            set_validators(response, etag, last_modified)
+
+        return self.compress_response(self.render_response(self.patch_vary(response)))
+
+    def patch_vary(self, response):
+        """
+        Añade ``Vary: Accept`` si el formato se eligió según la cabecera
+        Accept, para que los caches compartidos no entreguen un formato a
+        quien pidió otro.
+        """
+
+        self.get_format()
+        if self.negotiated_format:
+            patch_vary_headers(response, ('Accept',))
+
+        return response
+
+    def get_timer(self):
+        """
+        Retorna el cronómetro de la petición. Si la vista no mide sus fases
+        es uno que no hace nada.
+        """
+
+        return timing.get_timer(self.request)
+
+    def get_encoding(self):
+        """
+        Retorna la codificación con la que se comprime la respuesta o None si
+        la vista no comprime o el cliente no lo acepta.
+        """
+
+        if not self.compress:
+            return None
+
+        return compression.negotiate_encoding(self.request)
+
+    def render_response(self, response):
+        """
+        Renderiza el template de la respuesta si se va a comprimir o la vista
+        mide sus fases; en otro caso se renderiza después, fuera de la vista,
+        y el middleware todavía puede modificar su contexto.
+        """
+
+        if self.get_encoding() is None and not self.get_timer().enabled:
+            return response
+
+        if hasattr(response, 'render') and not response.is_rendered:
+            with self.get_timer().phase('render'):
+                response.render()
+
+        return response
+
+    def compress_response(self, response):
+        """
+        Comprime la respuesta con la codificación que acepta el cliente si la
+        vista lo tiene habilitado. Si el cliente no acepta ninguna solo se
+        añade ``Vary: Accept-Encoding``, sin renderizar la respuesta.
+        """
+
+        if not self.compress:
+            return response
+
+        response = self.render_response(response)
+
+        with self.get_timer().phase('compress'):
+            return compression.compress_response(self.request, response,
+                    streaming=is_streaming(response),
+                    min_size=self.compress_min_size, level=self.compress_level)
+
+    def cached_dispatch(self, request, *args, **kwargs):
+        """
+        Retorna la respuesta guardada en cache o la genera y la guarda.
+        """
+
+        key = self.get_cache_key()
+        with self.get_timer().phase('cache'):
+            cached = response_cache.get_response(key)
+        if cached is not None:
+            return cached
+
+        response = super(MultipleFormatResponseMixin, self).dispatch(request, *args, **kwargs)
+
+        if response.status_code == 200 and not is_streaming(response):
+            if hasattr(response, 'render') and not response.is_rendered:
+                with self.get_timer().phase('render'):
+                    response.render()
+            response_cache.set_response(key, response, self.cache_timeout)
+
+        return response
+
+    def get_validators(self):
+        """
+        Retorna una tupla ``(etag, last_modified)`` que identifica la versión
+        actual de la respuesta sin necesidad de renderizarla. Por defecto la
+        vista no define validadores.
+        """
+
+        return None, None
+
+    def get_cache_models(self):
+        """
+        Retorna los modelos de los que depende la respuesta guardada.
+        """
+
+        if self.cache_models is not None:
+            return self.cache_models
+
+        model = getattr(self, 'model', None)
+        if model is None and getattr(self, 'queryset', None) is not None:
+            model = self.queryset.model
+
+        return [model] if model is not None else []
+
+    def is_cache_per_user(self):
+        """
+        Retorna True si la respuesta guardada depende del usuario.
+        """
+
+        if self.cache_per_user is not None:
+            return self.cache_per_user
+
+        if self.request.user.is_authenticated():
+            return True
+
+        return not self.is_context_format()
+
+    def get_cache_key(self):
+        """
+        Retorna la llave de la respuesta a partir del nombre de la vista, la
+        app, el formato, los argumentos de la url, el query string y las
+        versiones de los modelos involucrados.
+        """
+
+        app_name = getattr(self, 'app_name', None) or self.__class__.__module__
+        view_name = getattr(self, 'view_name', None) or self.__class__.__name__
+
+        versions = response_cache.get_versions(self.get_cache_models())
+        parts = [sorted(self.kwargs.items()),
+                 self.request.META.get('QUERY_STRING', ''),
+                 sorted(versions.items())]
+
+        if self.is_cache_per_user():
+            parts.append(self.request.user.id)
+
+        return response_cache.response_key(app_name, view_name,
+                                           self.get_format(), *parts)
      
     def get_format(self):
         """
@@ -99,13 +440,44 @@ class MultipleFormatResponseMixin(TemplateResponseMixin):
         if self.request.is_ajax():
             self.format = 'json'
         else:
-            self.format = self.kwargs.get('format', self.default_format)
+            self.format = self.kwargs.get('format')
+            if not self.format:
+                self.negotiated_format = bool(self.accept_formats)
+                self.format = self.get_accept_format() or self.default_format
         
+        if self._view_config is not None and 'formats' in self._view_config:
+            if self.format in self._view_config['formats']:
+                return self.format
+
         # TODO: esto no esta muy coherente.
-        if self.format in self.templates or self.format == 'json':
+        elif self.format in self.templates or self.format in self.data_formats:
             return self.format
         
         raise ImproperlyConfigured(u'Format not allowed: %s ' % self.format)
+
+    def get_accept_format(self):
+        """
+        Retorna el formato de ``accept_formats`` que el cliente pide en la
+        cabecera Accept o None.
+        """
+
+        accept = self.request.META.get('HTTP_ACCEPT')
+        if not accept:
+            return None
+
+        for format in self.accept_formats:
+            if MIMES[format] in accept:
+                return format
+
+        return None
+
+    def is_context_format(self):
+        """
+        Retorna True si la respuesta es el contexto serializado (json o
+        msgpack) en lugar de un template.
+        """
+
+        return self.get_format() in self.context_formats
     
     def get_template_names(self):
         """
@@ -113,6 +485,11 @@ class MultipleFormatResponseMixin(TemplateResponseMixin):
         """
 
         format = self.get_format()
+
+        if self._view_config is not None and 'templates' in self._view_config:
+            templates = self._view_config['templates']
+            if format in templates:
+                return templates[format]
         
         if format not in self.templates:
             raise ImproperlyConfigured('%s have to define a template for '
@@ -138,24 +515,40 @@ class MultipleFormatResponseMixin(TemplateResponseMixin):
         Obtiene la respuesta de la vista en formato json
         """
         
-        json_data = json.dumps(context)
+        with self.get_timer().phase('encode'):
+            json_data = encoders.dumps(context)
         
         return HttpResponse(json_data, 'application/json')
+
+    def get_msgpack_response(self, context):
+        """
+        Obtiene la respuesta de la vista en formato msgpack, a partir del
+        mismo contexto que la respuesta json.
+        """
+
+        with self.get_timer().phase('encode'):
+            content = packing.packb(context)
+
+        return HttpResponse(content, MIMES['msgpack'])
     
     def render_to_response(self, context, **response_kwargs):
         """
         Retorna la respuesta a la llamada de la vista.
         """
-        
+
+        self.get_timer().stop('context')
         self.format = self.get_format()
          
-        if self.format == 'json':
+        if self.format in self.context_formats:
             if self.redirect:
                 context['redirect'] = True
                 context['redirect_url'] = self.get_redirect_url()
             else:
                 context['redirect'] = False
 
+            if self.format == 'msgpack':
+                return self.get_msgpack_response(context)
+
             return self.get_json_response(context)
 
         elif self.format == 'html':
@@ -179,11 +572,48 @@ class BaseViewMixin(object):
     #: Nombre de la app
     app_name = None
 
+    #: Configuración resuelta en as_view, compartida por todas las peticiones.
+    _view_config = None
+
+    @classmethod
+    def build_view_config(cls, config, **initkwargs):
+        """
+        Añade a *config* el nombre de la vista, el de la app y el título si
+        están definidos y la clase no redefine los métodos que los retornan.
+        """
+
+        parent = super(BaseViewMixin, cls)
+        if hasattr(parent, 'build_view_config'):
+            config = parent.build_view_config(config, **initkwargs)
+
+        view_name = initkwargs.get('view_name', cls.view_name)
+        app_name = initkwargs.get('app_name', cls.app_name)
+        title = initkwargs.get('title', cls.title)
+
+        view_name_inherited = inherits_method(cls, 'get_view_name', BaseViewMixin)
+
+        if view_name is not None and view_name_inherited:
+            config['view_name'] = view_name
+
+        if app_name is not None and inherits_method(cls, 'get_app_name', BaseViewMixin):
+            config['app_name'] = app_name
+
+        if inherits_method(cls, 'get_title', BaseViewMixin):
+            if title is not None:
+                config['title'] = title
+            elif view_name is not None and view_name_inherited:
+                config['title'] = view_name
+
+        return config
+
     def get_view_name(self):
         """
         Retorna el nombre de la vista.
         """
 
+        if self._view_config is not None and 'view_name' in self._view_config:
+            return self._view_config['view_name']
+
         if self.view_name is not None:
             return self.view_name
         
@@ -195,6 +625,9 @@ class BaseViewMixin(object):
         Retorna el título de la página.
         """
 
+        if self._view_config is not None and 'title' in self._view_config:
+            return self._view_config['title']
+
         if self.title is not None:
             return self.title
 
@@ -208,6 +641,9 @@ class BaseViewMixin(object):
         """
         Retorna el nombre de la app.
         """
+
+        if self._view_config is not None and 'app_name' in self._view_config:
+            return self._view_config['app_name']
         
         if self.app_name is not None:
             return self.app_name
@@ -227,7 +663,7 @@ class BaseViewMixin(object):
             'title': self.get_title(),
         })
 
-        if self.get_format() != 'json':
+        if not self.is_context_format():
             context.update({
                 'request': self.request,
                 'user': self.request.user
@@ -267,6 +703,65 @@ class ActionResponseMixin(MultipleFormatResponseMixin):
     fail_url = None
     #: Si la acción se realizo con éxito o no.
     success = None
+
+    #: Si las respuestas json llevan solo datos estructurados, sin html.
+    lean = False
+    #: Parámetro con el que el cliente pide respuestas json ligeras.
+    lean_param = 'lean'
+
+    #: Si la vista acepta acciones en lote. Solo las vistas que implementan
+    #: ``bulk_action`` y verifican la propiedad de todos los objetos lo
+    #: activan; en las demás el parámetro ``bulk_param`` se ignora.
+    bulk_enabled = False
+    #: Parámetro con la lista de llaves primarias de una acción en lote.
+    bulk_param = 'pks'
+    #: Cantidad máxima de objetos de una acción en lote.
+    bulk_limit = 100
+
+    def get_bulk_pks(self):
+        """
+        Retorna la lista de llaves primarias de una acción en lote o None si
+        la petición es sobre un solo objeto. Si alguna llave no es un entero
+        o son más de ``bulk_limit`` retorna una lista vacía y la acción
+        falla sin tocar ningún objeto.
+        """
+
+        if not self.bulk_enabled or self.request.method != 'POST' \
+                or self.bulk_param not in self.request.POST:
+            return None
+
+        pks = []
+        for pk in self.request.POST.getlist(self.bulk_param):
+            try:
+                pk = int(pk)
+            except (TypeError, ValueError):
+                self.fail_message = _(u'La lista de contenidos no es válida')
+                return []
+
+            if pk not in pks:
+                pks.append(pk)
+
+        if len(pks) > self.bulk_limit:
+            self.fail_message = _(u'No puedes modificar más de %s contenidos '
+                                  u'a la vez') % self.bulk_limit
+            return []
+
+        return pks
+
+    def is_lean(self):
+        """
+        Retorna True si la respuesta json no debe incluir fragmentos html.
+        """
+
+        if not self.is_context_format():
+            return False
+
+        if self.lean:
+            return True
+
+        value = self.request.GET.get(self.lean_param) or \
+                self.request.POST.get(self.lean_param)
+        return value not in (None, '', '0', 'false')
     
     def get_context_data(self, success=True, **context):
         """
@@ -388,6 +883,9 @@ class LoginRequiredMixin(ActionResponseMixin):
     """
     Mixin para todas las vistas que necesitas al usuario identificado.
     """
+
+    #: La respuesta depende del usuario, se guarda una por usuario.
+    cache_per_user = True
     
     def dispatch(self, request, *args, **kwargs):
         """
@@ -398,8 +896,11 @@ class LoginRequiredMixin(ActionResponseMixin):
         self.request = request
         self.args = args
         self.kwargs = kwargs
-        
-        if not request.user.is_authenticated():
+
+        with self.get_timer().phase('auth'):
+            authenticated = request.user.is_authenticated()
+
+        if not authenticated:
             url = '%s?%s=%s' % (settings.LOGIN_URL, REDIRECT_FIELD_NAME, request.get_full_path())
             return self.fail_response(message=_(u'Necesitas identificarte para continuar.'),
                                       redirect=True, 
@@ -408,19 +909,92 @@ class LoginRequiredMixin(ActionResponseMixin):
         return super(LoginRequiredMixin, self).dispatch(request, **kwargs)
 
 
-class OwnerRequiredMixin(LoginRequiredMixin, SingleObjectMixin):
+def get_request_objects(request):
+    """
+    Retorna el mapa de objetos cargados durante la petición *request*.
+    """
+
+    return request.__dict__.setdefault('_common_objects', {})
+
+
+def clear_request_objects(request):
+    """
+    Olvida los objetos cargados durante la petición, por ejemplo después de
+    eliminarlos.
+    """
+
+    request.__dict__.pop('_common_objects', None)
+
+
+class SingleObjectMemoMixin(SingleObjectMixin):
+    """
+    Mixin que carga cada objeto a lo más una vez por petición, aunque
+    ``get_object`` se llame desde varios puntos de la vista.
+    """
+
+    def get_object(self, queryset=None):
+        if queryset is None:
+            queryset = self.get_queryset()
+
+        pk = self.kwargs.get(getattr(self, 'pk_url_kwarg', 'pk'))
+        slug = self.kwargs.get(getattr(self, 'slug_url_kwarg', 'slug'))
+
+        if pk is not None:
+            lookup = queryset.filter(pk=pk)
+        elif slug is not None:
+            lookup = queryset.filter(**{self.get_slug_field(): slug})
+        else:
+            return super(SingleObjectMemoMixin, self).get_object(queryset)
+
+        sql, params = lookup.query.get_compiler(using=lookup.db).as_sql()
+        key = (lookup.model, lookup.db, sql, tuple(params))
+
+        objects = get_request_objects(self.request)
+        if key not in objects:
+            with timing.get_timer(self.request).phase('object'):
+                objects[key] = super(SingleObjectMemoMixin, self).get_object(queryset)
+
+        return objects[key]
+
+
+class OwnerRequiredMixin(LoginRequiredMixin, SingleObjectMemoMixin):
     """
     Mixin para verificar la propiedad de un usuario sobre un objeto.
+
+    La propiedad se verifica en la misma consulta que carga el objeto: el
+    queryset de la vista se limita a los objetos del usuario identificado.
     """
 
-    def get_object(self):
+    #: Campo del modelo que referencia al usuario propietario.
+    owner_field = 'user'
+
+    def get_queryset(self):
+        """
+        Retorna el queryset limitado a los objetos del usuario identificado.
+        """
+
+        queryset = super(OwnerRequiredMixin, self).get_queryset()
+        if self.request.user.is_authenticated():
+            queryset = queryset.filter(**{self.owner_field: self.request.user})
+
+        return queryset
+
+    def get_object(self, queryset=None):
         if hasattr(self, 'object') and self.object is not None:
             return self.object
         else:
-            return super(OwnerRequiredMixin, self).get_object()
+            return super(OwnerRequiredMixin, self).get_object(queryset)
 
     def is_owner(self, content, user): 
-        return content.user_id == user.id
+        return getattr(content, '%s_id' % self.owner_field) == user.id
+
+    def get_owned_queryset(self, pks):
+        """
+        Retorna los objetos de *pks* que pertenecen al usuario, verificando la
+        propiedad de todos en una sola consulta.
+        """
+
+        return self.get_queryset().filter(pk__in=pks)
     
     def dispatch(self, request, *args, **kwargs):
         """
@@ -434,11 +1008,18 @@ class OwnerRequiredMixin(LoginRequiredMixin, SingleObjectMixin):
 
         if not request.user.is_authenticated():
             return super(OwnerRequiredMixin, self).dispatch(request, **kwargs)
+
+        # En las acciones en lote la propiedad se verifica sobre todos los
+        # objetos a la vez.
+        if self.get_bulk_pks() is not None:
+            return super(OwnerRequiredMixin, self).dispatch(request, **kwargs)
         
         try:
-            self.object = self.get_object()
+            with self.get_timer().phase('auth'):
+                self.object = self.get_object()
         except Http404:
-            return self.fail_response(_(u'El contenido no existe'), redirect=True, 
+            return self.fail_response(_(u'El contenido no existe o no eres el '
+                                        u'propietario'), redirect=True, 
                              redirect_url=reverse('error'))
          
         if not self.is_owner(self.object, self.request.user):
@@ -454,6 +1035,14 @@ class BaseFormMixin(ActionResponseMixin):
     """
 
     template_form = 'forms/form.html'
+
+    #: Segundos que se guardan los fragmentos html de las respuestas json.
+    #: None desactiva el cache de fragmentos.
+    fragment_cache_timeout = None
+    #: Segundos que se reutiliza el html del objeto aunque no cambie, porque
+    #: sus templates suelen mostrar fechas relativas (``humanize_datetime``).
+    #: None si el template no depende de la hora.
+    fragment_time_bucket = 60
     
     def get_form_class(self):
         if self.form_class is not None:
@@ -465,11 +1054,43 @@ class BaseFormMixin(ActionResponseMixin):
     def get_context_data(self, *args, **kwargs):
         context = super(BaseFormMixin, self).get_context_data(*args, **kwargs)
         
-        if self.get_format() == 'json':
-            context['form'] = render_to_string(self.template_form, context)
+        if self.is_lean():
+            form = context.pop('form', None)
+            if form is not None and getattr(form, 'is_bound', False) and form.errors:
+                context['errors'] = self.error_to_dict(form)
+
+        elif self.is_context_format():
+            key = self.get_form_fragment_key(context.get('form'))
+            context['form'] = response_cache.render_fragment(self.template_form,
+                    context, key, self.fragment_cache_timeout)
         
         return context
 
+    def get_form_fragment_key(self, form):
+        """
+        Retorna la llave del html del formulario o None si no se puede
+        guardar. Solo se guardan los formularios sin datos, identificados por
+        su clase, el idioma, los valores iniciales y la versión de la
+        instancia que editan.
+        """
+
+        if self.fragment_cache_timeout is None or form is None \
+                or not hasattr(form, 'is_bound') or form.is_bound:
+            return None
+
+        parts = [form.__class__.__module__, form.__class__.__name__,
+                 get_language(), form.prefix, sorted(form.initial.items())]
+
+        instance = getattr(form, 'instance', None)
+        if instance is not None and instance.pk is not None:
+            version = response_cache.object_version(instance)
+            if version is None:
+                return None
+            parts.extend([instance._meta.app_label,
+                          instance._meta.object_name, instance.pk, version])
+
+        return response_cache.fragment_key(self.template_form, *parts)
+
     def get_success_url(self):
         return self.get_success_redirect_url()
 
@@ -498,6 +1119,15 @@ class BaseFormMixin(ActionResponseMixin):
         
         return message
 
+    @classmethod
+    def error_to_dict(cls, form):
+        """
+        Retorna los mensajes de error de un formulario agrupados por campo.
+        """
+
+        return dict((key, [unicode(error) for error in errors])
+                    for key, errors in form.errors.items())
+
 
 class FormView(BaseViewMixin, BaseFormMixin, BaseFormView):
     """
@@ -509,12 +1139,62 @@ class FormView(BaseViewMixin, BaseFormMixin, BaseFormView):
     }
 
 
-class ModelFormMixin(BaseFormMixin, SingleObjectMixin):
+def make_modelform_class(model, fields=None, exclude=None, widgets=None):
+    """
+    Genera la clase ModelForm de *model* con los campos *fields*, sin los
+    campos *exclude* y con los widgets *widgets*.
+    """
+
+    attrs = {'model': model}
+    if fields is not None:
+        attrs['fields'] = fields
+    if exclude is not None:
+        attrs['exclude'] = exclude
+    if widgets:
+        attrs['widgets'] = widgets
+
+    meta = type('Meta', (object,), attrs)
+    return type('%sForm' % model.__name__, (model_forms.ModelForm,),
+                {'Meta': meta})
+
+
+_form_classes = {}
+
+
+def get_modelform_class(model, fields=None, exclude=None, widgets=None):
+    """
+    Retorna la clase de ``make_modelform_class`` generándola una sola vez
+    por proceso para cada combinación de argumentos.
+    """
+
+    key = (model,
+           tuple(fields) if fields is not None else None,
+           tuple(exclude) if exclude is not None else None,
+           tuple(sorted(widgets.items())) if widgets else None)
+
+    form_class = _form_classes.get(key)
+    if form_class is None:
+        form_class = _form_classes[key] = make_modelform_class(model,
+                fields=fields, exclude=exclude, widgets=widgets)
+
+    return form_class
+
+
+class ModelFormMixin(BaseFormMixin, SingleObjectMemoMixin):
     """
     Vista para mostrar y procesar formularios para crear objetos.
     """
 
     template_object = None
+
+    #: Campos del formulario generado cuando no se define ``form_class``.
+    form_fields = None
+    #: Campos que se excluyen del formulario generado.
+    form_exclude = None
+    #: Widgets por campo del formulario generado.
+    form_widgets = None
+    #: Si el formulario generado se reutiliza entre peticiones.
+    cache_form_class = True
     
     def get_form_kwargs(self):
         kwargs = super(ModelFormMixin, self).get_form_kwargs()
@@ -537,7 +1217,10 @@ class ModelFormMixin(BaseFormMixin, SingleObjectMixin):
                 # from that
                 model = self.get_queryset().model
 
-            return model_forms.modelform_factory(model)
+            factory = get_modelform_class if self.cache_form_class \
+                      else make_modelform_class
+            return factory(model, fields=self.form_fields,
+                    exclude=self.form_exclude, widgets=self.form_widgets)
 
     def get_success_redirect_url(self):
         try:
@@ -558,19 +1241,50 @@ class ModelFormMixin(BaseFormMixin, SingleObjectMixin):
             raise ImproperlyConfigured('%s have to define a template_object'
                                        % self.__class__.__name__)
     
+    def get_object_fragment_key(self):
+        """
+        Retorna la llave del html del objeto, identificado por el template, su
+        llave primaria, su versión y el usuario, que el template recibe en el
+        contexto. Con ``fragment_time_bucket`` la llave cambia además cada
+        intervalo para que las fechas relativas no queden desactualizadas.
+        """
+
+        if self.fragment_cache_timeout is None:
+            return None
+
+        version = response_cache.object_version(self.object)
+        if version is None:
+            return None
+
+        opts = self.object._meta
+        parts = [opts.app_label, opts.object_name, self.object.pk, version,
+                 self.request.user.id]
+        if self.fragment_time_bucket:
+            parts.append(response_cache.time_bucket(self.fragment_time_bucket))
+
+        return response_cache.fragment_key(self.get_template_object(), *parts)
+
     def get_context_data(self, success=True, **kwargs):
         context = super(ModelFormMixin, self).get_context_data(success=success, **kwargs)
         
         if hasattr(self, 'object'):
             context['object'] = self.object
 
-            if self.get_format() == 'json' and self.object is not None:
+            if self.is_lean():
+                if self.object is not None:
+                    del context['object']
+                    context['pk'] = self.object.pk
+
+            elif self.is_context_format() and self.object is not None:
                 # Generamos el html del objeto.
                 # Añadimos el request y el usuario pero luego lo eliminamos para
                 # que se compatible con json
                 context['user'] = self.request.user
                 context['request'] = self.request
-                context['object'] = render_to_string(self.get_template_object(), context)
+                context['object'] = response_cache.render_fragment(
+                        self.get_template_object(), context,
+                        self.get_object_fragment_key(),
+                        self.fragment_cache_timeout)
                 del context['user']
                 del context['request']
 
@@ -623,6 +1337,14 @@ class ActionView(ActionResponseMixin, TemplateView):
     
     def action(self, request, **kwargs):
         raise NotImplementedError
+
+    def bulk_action(self, request, pks, **kwargs):
+        """
+        Ejecuta la acción sobre los objetos *pks* y retorna un diccionario con
+        el resultado de cada uno.
+        """
+
+        raise NotImplementedError
     
     def get_context_data(self, success=True, **context):
         """
@@ -641,6 +1363,10 @@ class ActionView(ActionResponseMixin, TemplateView):
         Ejecuta la acción.
         """
         
+        pks = self.get_bulk_pks()
+        if pks is not None:
+            return self.bulk_response(self.bulk_action(request, pks, **kwargs))
+
         # Ejecutamos la acción
         success = self.action(request, **kwargs)
 
@@ -655,25 +1381,603 @@ class ActionView(ActionResponseMixin, TemplateView):
         else:
             return self.fail_response()
 
+    def bulk_response(self, results):
+        """
+        Retorna la respuesta de una acción en lote con el resultado de cada
+        objeto. La acción es exitosa si lo fue para todos los objetos.
+        """
+
+        success = bool(results) and all(results.values())
+
+        if self.get_format() == 'html':
+            self.redirect = True
+            self.redirect_url = self.get_redirect_url(success)
+
+        results = dict((unicode(pk), result) for pk, result in results.items())
+        return self.action_response(success=success, results=results)
 
-class ListView(BaseViewMixin, MultipleFormatResponseMixin, DjangoListView):
+
+class SparseFieldsMixin(object):
+    """
+    Mixin que permite al cliente pedir solo algunos campos de los objetos en
+    los formatos de datos con ``?fields=name,slug``. Los campos se limitan
+    también en la consulta, así las columnas que no se piden nunca se leen.
+    """
+
+    #: Campos que el cliente puede pedir. None desactiva el parámetro.
+    json_fields = None
+    #: Nombre del parámetro con la lista de campos.
+    fields_param = 'fields'
+    #: Formatos que aceptan el parámetro. Los feeds no: sus templates usan
+    #: todos los campos y cada columna diferida sería una consulta más.
+    fields_formats = ('json', 'msgpack', 'ndjson')
+
+    def get_requested_fields(self):
+        """
+        Retorna los campos pedidos que están permitidos o None si se tienen
+        que retornar todos.
+        """
+
+        if hasattr(self, '_requested_fields'):
+            return self._requested_fields
+
+        fields = None
+        value = self.request.GET.get(self.fields_param)
+        if self.json_fields is not None and value \
+                and self.get_format() in self.fields_formats:
+            fields = []
+            for name in value.split(','):
+                name = name.strip()
+                if name in self.json_fields and name not in fields:
+                    fields.append(name)
+            fields = fields or None
+
+        self._requested_fields = fields
+        return fields
+
+    def narrow_queryset(self, queryset):
+        """
+        Limita las columnas de *queryset* a los campos pedidos.
+        """
+
+        fields = self.get_requested_fields()
+        if fields is None:
+            return queryset
+
+        return queryset.only(*fields)
+
+    def serialize_fields(self, obj, fields):
+        """
+        Retorna un diccionario con la llave primaria y los campos *fields* de
+        *obj*.
+        """
+
+        return get_serializer(obj.__class__, fields, url=False).serialize(obj)
+
+
+class ListView(BaseViewMixin, MultipleFormatResponseMixin, SparseFieldsMixin,
+               DjangoListView):
     """
     Clase base de las vistas que muestran una lista de objetos.
     """
-    pass
 
+    data_formats = ('json', 'msgpack', 'ndjson', 'atom', 'rss')
+
+    #: Modo de streaming para el formato json: ``None`` (todo el contexto de
+    #: una vez), ``'array'`` (un arreglo json) o ``'ndjson'`` (un objeto por
+    #: línea). El formato ``ndjson`` siempre se envía en streaming.
+    stream = None
+    #: Cantidad de filas que se leen de la base de datos por bloque. Las
+    #: filas se leen por llave sobre los campos del orden; si el orden usa
+    #: relaciones, expresiones o campos que aceptan NULL se leen con OFFSET,
+    #: ver ``common.util.chunked_iterator``.
+    stream_chunk_size = 500
+
+    #: Si los formatos de datos leen las filas con ``values_list`` sin crear
+    #: instancias del modelo. La url absoluta no se incluye en ese caso.
+    json_values = False
+
+    #: Campo con la fecha de modificación de los objetos, se usa para
+    #: responder 304 a las peticiones condicionales.
+    last_modified_field = 'updated_at'
+    #: Si la lista calcula sus validadores para responder 304. Cuesta una
+    #: consulta con ``MAX`` y ``COUNT`` por petición, por eso solo se activa
+    #: en las listas que los clientes consultan repetidamente. Los feeds
+    #: siempre los calculan.
+    list_validators = False
+    require_etag = True
+
+    #: Si se pagina por cursor en lugar de usar números de página.
+    paginate_by_cursor = False
+    #: Orden sobre el que se busca la página cuando se pagina por cursor.
+    cursor_ordering = ('-published_at', '-id')
+    #: Nombre del parámetro que contiene el cursor.
+    cursor_kwarg = 'cursor'
+
+    #: Si se pagina sin ejecutar ``COUNT(*)``, leyendo una fila de más.
+    paginate_without_count = False
+    #: Cómo se calcula el total cuando se pagina sin contar y la página lo
+    #: necesita: ``'estimate'`` o ``'exact'``.
+    paginate_count = 'exact'
+
+    def get_paginator(self, queryset, per_page, orphans=0,
+                      allow_empty_first_page=True):
+        """
+        Retorna el paginador que no cuenta las filas si la vista lo tiene
+        habilitado.
+        """
+
+        if not self.paginate_without_count:
+            return super(ListView, self).get_paginator(queryset, per_page,
+                    orphans=orphans, allow_empty_first_page=allow_empty_first_page)
+
+        return NoCountPaginator(queryset, per_page,
+                                allow_empty_first_page=allow_empty_first_page,
+                                count=self.paginate_count)
+
+    def paginate_queryset(self, queryset, page_size):
+        """
+        Pagina el queryset por cursor si la vista lo tiene habilitado.
+        """
+
+        with self.get_timer().phase('queryset'):
+            if not self.paginate_by_cursor:
+                return super(ListView, self).paginate_queryset(queryset, page_size)
+
+            paginator = CursorPaginator(queryset, page_size,
+                                        ordering=self.cursor_ordering)
+            cursor = self.kwargs.get(self.cursor_kwarg) or \
+                     self.request.GET.get(self.cursor_kwarg)
+
+            try:
+                page = paginator.page(cursor)
+            except InvalidCursor:
+                raise Http404(_(u'Cursor inválido'))
+
+            return (paginator, page, page.object_list, page.has_other_pages())
+
+    def get_context_data(self, **kwargs):
+        """
+        En los formatos de datos reemplaza el paginador por las referencias a
+        la página siguiente y la anterior.
+        """
+
+        context = super(ListView, self).get_context_data(**kwargs)
+
+        # Al medir las fases se evalúa aquí la página para que sus consultas
+        # no se cuenten como tiempo del template o de la codificación.
+        timer = self.get_timer()
+        object_list = context.get('object_list')
+        if timer.enabled and isinstance(object_list, QuerySet) \
+                and self.get_stream_mode() is None:
+            with timer.phase('queryset'):
+                len(object_list)
+
+        if self.get_format() in self.data_formats:
+            # El alias de la lista repetiría cada objeto en la respuesta.
+            name = self.get_context_object_name(self.object_list)
+            if name != 'object_list':
+                context.pop(name, None)
+
+            if self.get_requested_fields() is not None or self.json_values:
+                if self.get_stream_mode() is None:
+                    context['object_list'] = list(self.iter_serialized(context['object_list']))
+
+            context.pop('paginator', None)
+            page = context.pop('page_obj', None)
+
+            context['next'] = context['prev'] = None
+            if isinstance(page, CursorPage):
+                context['next'] = page.next_cursor
+                context['prev'] = page.previous_cursor
+            elif page is not None:
+                if page.has_next():
+                    context['next'] = page.next_page_number()
+                if page.has_previous():
+                    context['prev'] = page.previous_page_number()
+
+        return context
+
+    #: Templates del documento y de cada entrada de los feeds. Si la vista
+    #: define un template para el formato en ``templates`` se usa ese.
+    feed_templates = {
+        'atom': ('feeds/atom.xml', 'feeds/atom_entry.xml'),
+        'rss': ('feeds/rss.xml', 'feeds/rss_item.xml'),
+    }
+    #: Cantidad de entradas del feed.
+    feed_limit = 20
+    #: Orden de las entradas del feed.
+    feed_ordering = ('-published_at', '-id')
+
+    def is_feed(self):
+        """
+        Retorna True si la respuesta se genera con el motor de feeds.
+        """
+
+        format = self.get_format()
+        return format in self.feed_templates and format not in self.templates
+
+    def get_queryset(self):
+        return self.narrow_queryset(super(ListView, self).get_queryset())
+
+    def get_paginate_by(self, queryset):
+        if self.is_feed():
+            return None
+
+        return super(ListView, self).get_paginate_by(queryset)
+
+    def get_feed_queryset(self):
+        """
+        Retorna las entradas del feed, sin paginar.
+        """
+
+        queryset = self.get_queryset().order_by(*self.feed_ordering)
+        if has_field(queryset.model, 'user'):
+            queryset = queryset.select_related('user')
+
+        return queryset[:self.feed_limit]
+
+    def get_feed_response(self, context):
+        """
+        Retorna el feed generado en streaming. Cada entrada se renderiza una
+        sola vez por versión del objeto.
+        """
+
+        format = self.get_format()
+        template_name, entry_template_name = self.feed_templates[format]
+
+        context = {
+            'title': context.get('title'),
+            'feed_url': self.request.build_absolute_uri(),
+            'updated_at': getattr(self, 'feed_updated_at', None),
+            'domain': Site.objects.get_current().domain,
+        }
+
+        content = feeds.stream_feed(template_name, entry_template_name,
+                                    self.get_feed_queryset(), context,
+                                    field=self.last_modified_field)
+
+        return HttpResponse(content, MIMES[format])
+
+    def get_feed_validators(self):
+        """
+        Retorna los validadores del feed a partir de la llave y la fecha de
+        modificación de sus entradas, con una consulta indexada que lee solo
+        ``feed_limit`` filas. El etag cambia cuando una entrada se modifica,
+        se publica o se elimina.
+        """
+
+        field = self.last_modified_field
+        queryset = self.get_queryset()
+
+        if field is None or not has_field(queryset.model, field):
+            return None, None
+
+        entries = list(queryset.order_by(*self.feed_ordering)
+                               .values_list('pk', field)[:self.feed_limit])
+        if not entries:
+            return None, None
+
+        self.feed_updated_at = max(updated_at for pk, updated_at in entries)
+        etag = make_etag(self.get_format(), entries, sorted(self.kwargs.items()),
+                         self.request.META.get('QUERY_STRING', ''))
+
+        return etag, self.feed_updated_at
+
+    def get_validators(self):
+        """
+        Retorna el etag y la fecha de última modificación de la lista a partir
+        del ``MAX`` de la fecha de modificación y la cantidad de objetos, en
+        una sola consulta, si la vista tiene ``list_validators``.
+        """
+
+        if self.is_feed():
+            return self.get_feed_validators()
+
+        if not self.list_validators:
+            return None, None
+
+        queryset = self.get_queryset()
+        field = self.last_modified_field
+
+        if field is None or not has_field(queryset.model, field):
+            return None, None
+
+        result = queryset.aggregate(last_modified=Max(field), count=Count('pk'))
+        etag = make_etag(self.get_format(), result['last_modified'],
+                         result['count'], sorted(self.kwargs.items()),
+                         self.request.META.get('QUERY_STRING', ''),
+                         self.request.user.id)
+
+        return etag, result['last_modified']
+
+    def get_stream_mode(self):
+        """
+        Retorna el modo de streaming de acuerdo al formato de la respuesta.
+        """
+
+        format = self.get_format()
+
+        if format == 'ndjson':
+            return 'ndjson'
+
+        if format == 'json' and self.stream is not None:
+            if self.stream not in ('array', 'ndjson'):
+                raise ImproperlyConfigured(u'Stream mode not allowed: %s'
+                        % self.stream)
+            return self.stream
+
+        return None
+
+    def get_object_serializer(self):
+        """
+        Retorna el serializador de los objetos de la lista.
+        """
+
+        fields = self.get_requested_fields()
+        return get_serializer(self.object_list.model, fields,
+                              url=fields is None)
 
-class DetailView(BaseViewMixin, MultipleFormatResponseMixin, DjangoDetailView):
+    def iter_serialized(self, object_list, chunk_size=None):
+        """
+        Genera los diccionarios de los objetos de *object_list*, por bloques
+        y sin crear instancias si la vista usa ``json_values``.
+        """
+
+        chunk_size = chunk_size or self.stream_chunk_size
+
+        if self.json_values:
+            return self.get_object_serializer().iter_values(object_list, chunk_size)
+
+        return (self.serialize_object(obj)
+                for obj in chunked_iterator(object_list, chunk_size))
+
+    def serialize_object(self, obj):
+        """
+        Retorna un diccionario con los datos de *obj* listo para codificarse
+        en json.
+        """
+
+        fields = self.get_requested_fields()
+        if fields is not None:
+            return self.serialize_fields(obj, fields)
+
+        return encoders.serialize_model(obj)
+
+    def iter_json_array(self, object_list):
+        """
+        Genera un arreglo json bien formado a partir de los diccionarios de
+        *object_list*, fila por fila.
+        """
+
+        yield '['
+        separator = ''
+        for data in object_list:
+            yield separator + encoders.dumps(data)
+            separator = ','
+        yield ']'
+
+    def iter_ndjson(self, object_list):
+        """
+        Genera un objeto json por línea a partir de los diccionarios de
+        *object_list*.
+        """
+
+        for data in object_list:
+            yield encoders.dumps(data) + '\n'
+
+    def get_stream_response(self, context, mode):
+        """
+        Retorna una respuesta que codifica los objetos a medida que se leen de
+        la base de datos, sin construir el documento completo en memoria.
+        """
+
+        object_list = self.iter_serialized(context['object_list'])
+
+        if mode == 'ndjson':
+            content = self.iter_ndjson(object_list)
+        else:
+            content = self.iter_json_array(object_list)
+
+        mimetype = MIMES['ndjson'] if mode == 'ndjson' else MIMES['json']
+        return HttpResponse(content, mimetype)
+
+    def render_to_response(self, context, **response_kwargs):
+        self.get_timer().stop('context')
+
+        if self.is_feed():
+            return self.get_feed_response(context)
+
+        mode = self.get_stream_mode()
+        if mode is not None:
+            return self.get_stream_response(context, mode)
+
+        return super(ListView, self).render_to_response(context, **response_kwargs)
+
+
+class SearchView(ListView):
+    """
+    Clase base de las vistas que buscan en los campos de texto registrados
+    en ``common.search`` y muestran los objetos del más relevante al menos.
+    Solo se buscan los objetos del queryset de la vista, en la misma consulta
+    de la búsqueda, para que las páginas y el total no cuenten los demás.
+    """
+
+    data_formats = ('json', 'msgpack')
+
+    templates = {
+        'html': 'search/results.html',
+    }
+
+    paginate_by = 20
+
+    #: Los resultados cambian con el índice, no se responde 304.
+    last_modified_field = None
+
+    #: Parámetro con el texto que se busca.
+    search_param = 'q'
+    #: Cantidad máxima de resultados ordenados por relevancia.
+    search_limit = 1000
+
+    def get_search_query(self):
+        """
+        Retorna el texto que se busca.
+        """
+
+        return self.request.GET.get(self.search_param, '').strip()
+
+    def get_queryset(self):
+        """
+        Retorna los resultados de la búsqueda; solo se cargan los objetos de
+        la página que se muestra.
+        """
+
+        queryset = super(SearchView, self).get_queryset()
+        query = self.get_search_query()
+
+        ranked = []
+        if query:
+            ranked = search.search(queryset.model, query,
+                                   limit=self.search_limit, using=queryset.db,
+                                   queryset=queryset)
+
+        return search.SearchResults(queryset, ranked)
+
+    def get_validators(self):
+        return None, None
+
+    def get_context_data(self, **kwargs):
+        """
+        Añade el texto buscado y el query string que conservan los enlaces de
+        la paginación, sin la página ni el cursor.
+        """
+
+        context = super(SearchView, self).get_context_data(**kwargs)
+        context['query'] = self.get_search_query()
+
+        if self.get_format() in self.templates:
+            params = self.request.GET.copy()
+            for param in ('page', self.cursor_kwarg):
+                params.pop(param, None)
+
+            context['paginate'] = context.get('is_paginated', False)
+            context['page_query'] = params.urlencode()
+
+        return context
+
+
+class OwnerListView(LoginRequiredMixin, ListView):
+    """
+    Clase base de las vistas que muestran la lista de objetos del usuario
+    identificado. La propiedad se filtra en la consulta de la lista.
+    """
+
+    #: Campo del modelo que referencia al usuario propietario.
+    owner_field = 'user'
+
+    def get_context_data(self, **kwargs):
+        """
+        Si el usuario no está identificado retorna el contexto de la acción
+        fallida de ``LoginRequiredMixin``, en otro caso el de la lista.
+        """
+
+        if self.success is False:
+            return LoginRequiredMixin.get_context_data(self, success=False, **kwargs)
+
+        return ListView.get_context_data(self, **kwargs)
+
+    def render_to_response(self, context, **response_kwargs):
+        """
+        La respuesta fallida se envía en json a los formatos de datos y como
+        una redirección a la página de identificación a los demás, sin pasar
+        por los feeds ni el streaming de la lista.
+        """
+
+        if self.success is False:
+            if self.is_context_format():
+                return MultipleFormatResponseMixin.render_to_response(
+                        self, context, **response_kwargs)
+            return redirect(self.get_redirect_url())
+
+        return super(OwnerListView, self).render_to_response(context, **response_kwargs)
+
+    def get_queryset(self):
+        queryset = super(OwnerListView, self).get_queryset()
+        return queryset.filter(**{self.owner_field: self.request.user})
+
+
+class DetailView(BaseViewMixin, MultipleFormatResponseMixin, SparseFieldsMixin,
+                 SingleObjectMemoMixin, DjangoDetailView):
     """
     Clase base de as vistas que muestran un objeto a detalle.
     """
-    pass
+
+    def get_queryset(self):
+        return self.narrow_queryset(super(DetailView, self).get_queryset())
+
+    def get_context_data(self, **kwargs):
+        """
+        En los formatos de datos el objeto solo se incluye como ``object``, y
+        si el cliente pidió solo algunos campos, con esos campos.
+        """
+
+        context = super(DetailView, self).get_context_data(**kwargs)
+
+        if self.get_format() in self.data_formats:
+            name = self.get_context_object_name(self.object)
+            if name != 'object':
+                context.pop(name, None)
+
+        fields = self.get_requested_fields()
+        if fields is not None:
+            context['object'] = self.serialize_fields(self.object, fields)
+
+        return context
+
+    #: Campo con la fecha de modificación del objeto, se usa para responder
+    #: 304 a las peticiones condicionales.
+    last_modified_field = 'updated_at'
+
+    def get_validators(self):
+        """
+        Retorna el etag y la fecha de última modificación del objeto leyendo
+        solo su fecha de modificación.
+        """
+
+        queryset = self.get_queryset()
+        field = self.last_modified_field
+
+        if field is None or not has_field(queryset.model, field):
+            return None, None
+
+        pk = self.kwargs.get(getattr(self, 'pk_url_kwarg', 'pk'))
+        slug = self.kwargs.get(getattr(self, 'slug_url_kwarg', 'slug'))
+
+        if pk is not None:
+            queryset = queryset.filter(pk=pk)
+        elif slug is not None:
+            queryset = queryset.filter(**{self.get_slug_field(): slug})
+        else:
+            return None, None
+
+        values = list(queryset.values_list('pk', field)[:1])
+        if not values:
+            return None, None
+
+        pk, last_modified = values[0]
+        etag = make_etag(self.get_format(), pk, last_modified,
+                         self.request.META.get('QUERY_STRING', ''),
+                         self.request.user.id)
+
+        return etag, last_modified
 
 
 class DeleteView(OwnerRequiredMixin, ActionView):
     """
     Clase base para eliminar un objeto.
     """
+
+    bulk_enabled = True
     
     def action(self, request, **kwargs):
         """
@@ -683,10 +1987,34 @@ class DeleteView(OwnerRequiredMixin, ActionView):
         try:
             content = self.get_object()
             content.delete()
+            clear_request_objects(request)
             return True
         except Http404:
             self.fail_message = _(u'El contenido no existe')
             return False
+
+    def bulk_action(self, request, pks, **kwargs):
+        """
+        Elimina en una sola transacción los objetos de *pks* que pertenecen
+        al usuario.
+        """
+
+        if not pks:
+            return {}
+
+        queryset = self.get_owned_queryset(pks)
+
+        with transaction.commit_on_success():
+            owned = set(unicode(pk) for pk in queryset.values_list('pk', flat=True))
+            if owned:
+                self.get_queryset().filter(pk__in=owned).delete()
+                clear_request_objects(request)
+
+        if len(owned) < len(pks):
+            self.fail_message = _(u'Algunos contenidos no existen o no eres el '
+                                  u'propietario')
+
+        return dict((pk, unicode(pk) in owned) for pk in pks)
             
 
 class FlashView(BaseView):